@@ -122,6 +122,18 @@ _RELAY_SIGTERM_TO_MAIN = flags.DEFINE_bool(
     "If True, grain workers will relay SIGTERM to the main process.",
 )
 
+_PERSISTENT_POOL_MAX_WORKERS = flags.DEFINE_integer(
+    "grain_py_persistent_pool_max_workers",
+    0,
+    (
+        "Maximum number of worker processes in the process-wide persistent"
+        " pool used by pipelines with"
+        " `MultiprocessingOptions.use_persistent_pool`, counting both leased"
+        " and idle workers. Idle workers are shut down to make room for new"
+        " ones. 0 means no limit."
+    ),
+)
+
 _GRAIN_FLAGS = (
     _INTERLEAVED_SHUFFLE,
     _INTERLEAVED_SHUFFLE_BLOCK_SIZE,
@@ -134,6 +146,7 @@ _GRAIN_FLAGS = (
     _DEBUG_MODE,
     _DATASET_VISUALIZATION_OUTPUT_DIR,
     _RELAY_SIGTERM_TO_MAIN,
+    _PERSISTENT_POOL_MAX_WORKERS,
 )
 
 _grain_experiment_metric = monitoring.Metric(
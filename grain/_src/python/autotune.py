@@ -0,0 +1,184 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tuning of prefetching parameters from runtime measurements.
+
+`ReadAutotuner` picks the number of reader threads and the number of elements
+read ahead for the thread pools prefetching elements from a data source or a
+`MapDataset`. It's used when `ReadOptions.autotune` is enabled.
+
+The number of threads follows from Little's law: to produce one chunk of
+elements every time the consumer finishes one, there need to be about
+`chunk latency / consumer time per chunk` chunks in flight. Twice as many chunks
+are read ahead so that the threads stay busy while the consumer drains a chunk.
+The read ahead chunks never take more than `ReadOptions.autotune_memory_budget`
+bytes on average.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+import math
+import threading
+import time
+from typing import Any, TypeVar
+
+from grain._src.core import tree
+from grain._src.python import options
+from grain._src.python import record
+from grain._src.python import shared_memory_array
+import numpy as np
+
+T = TypeVar("T")
+
+# Upper bound on the number of threads used for reading with autotuning.
+_MAX_NUM_THREADS = 256
+# Number of consumed chunks after which the parameters are re-tuned.
+_TUNING_INTERVAL = 8
+# Weight of the latest measurement in the moving averages.
+_AVERAGE_WEIGHT = 0.2
+
+
+def element_nbytes(element: Any) -> int:
+  """Returns the number of bytes held by arrays and strings in `element`.
+
+  Arrays passed through shared memory as `SharedMemoryArrayMetadata` are
+  counted too.
+  """
+  if isinstance(element, record.Record):
+    element = element.data
+  nbytes = 0
+  for leaf in tree.flatten(element):
+    if isinstance(leaf, np.ndarray):
+      nbytes += leaf.nbytes
+    elif isinstance(leaf, shared_memory_array.SharedMemoryArrayMetadata):
+      nbytes += math.prod(leaf.shape) * np.dtype(leaf.dtype).itemsize
+    elif isinstance(leaf, (bytes, bytearray, str)):
+      nbytes += len(leaf)
+  return nbytes
+
+
+def _update_average(average: float | None, value: float) -> float:
+  if average is None:
+    return value
+  return average + _AVERAGE_WEIGHT * (value - average)
+
+
+class ReadAutotuner:
+  """Tunes the number of reader threads and chunks read ahead.
+
+  Usage:
+    autotuner = ReadAutotuner(read_options, chunk_size)
+    executor = ThreadPoolExecutor(autotuner.max_num_threads)
+    # Keep `autotuner.num_chunks_ahead` chunks submitted.
+    future = executor.submit(autotuner.wrap(read_chunk), start)
+    ...
+    start_time = time.perf_counter()
+    chunk = future.result()
+    autotuner.record_chunk(chunk, time.perf_counter() - start_time)
+
+  The executor may start up to `max_num_threads` threads, but only
+  `num_threads` of them read concurrently.
+  """
+
+  def __init__(self, read_options: options.ReadOptions, chunk_size: int):
+    self._chunk_size = chunk_size
+    self._memory_budget = read_options.autotune_memory_budget
+    self._max_num_threads = max(read_options.num_threads, _MAX_NUM_THREADS)
+    self._num_threads = read_options.num_threads
+    self._num_chunks_ahead = max(
+        1, -(-read_options.prefetch_buffer_size // chunk_size)
+    )
+    self._num_running = 0
+    self._condition = threading.Condition()
+    # Moving averages of the time to read a chunk, the time the consumer spends
+    # on a chunk outside of waiting for it, and the size of an element.
+    self._chunk_latency = None
+    self._consumer_time = None
+    self._element_nbytes = None
+    self._last_record_time = None
+    self._chunks_since_tuning = 0
+
+  @property
+  def max_num_threads(self) -> int:
+    return self._max_num_threads
+
+  @property
+  def num_threads(self) -> int:
+    return self._num_threads
+
+  @property
+  def num_chunks_ahead(self) -> int:
+    return self._num_chunks_ahead
+
+  def wrap(self, fn: Callable[..., T]) -> Callable[..., T]:
+    """Limits concurrent calls of `fn` to `num_threads` and measures them."""
+
+    def wrapped(*args, **kwargs) -> T:
+      with self._condition:
+        while self._num_running >= self._num_threads:
+          self._condition.wait()
+        self._num_running += 1
+      start_time = time.perf_counter()
+      try:
+        return fn(*args, **kwargs)
+      finally:
+        latency = time.perf_counter() - start_time
+        with self._condition:
+          self._num_running -= 1
+          self._chunk_latency = _update_average(self._chunk_latency, latency)
+          self._condition.notify()
+
+    return wrapped
+
+  def record_chunk(self, chunk: Sequence[Any], wait_time: float) -> None:
+    """Records that the consumer waited `wait_time` seconds for `chunk`."""
+    now = time.perf_counter()
+    if chunk:
+      # Sampling the first element is enough to estimate the size.
+      self._element_nbytes = _update_average(
+          self._element_nbytes, element_nbytes(chunk[0])
+      )
+    if self._last_record_time is not None:
+      self._consumer_time = _update_average(
+          self._consumer_time,
+          max(now - self._last_record_time - wait_time, 0.0),
+      )
+    self._last_record_time = now
+    self._chunks_since_tuning += 1
+    if self._chunks_since_tuning >= _TUNING_INTERVAL:
+      self._chunks_since_tuning = 0
+      self._tune()
+
+  def _tune(self) -> None:
+    with self._condition:
+      chunk_latency = self._chunk_latency
+    if chunk_latency is None or self._consumer_time is None:
+      return
+    wanted_threads = math.ceil(
+        chunk_latency / max(self._consumer_time, 1e-6)
+    )
+    # Grow gradually, an outlier shouldn't start hundreds of threads at once.
+    num_threads = max(1, min(wanted_threads, 2 * self._num_threads))
+    max_chunks_ahead = self._max_num_threads * 2
+    if self._element_nbytes:
+      max_chunks_ahead = min(
+          max_chunks_ahead,
+          int(self._memory_budget // (self._element_nbytes * self._chunk_size)),
+      )
+    max_chunks_ahead = max(max_chunks_ahead, 1)
+    num_threads = min(num_threads, self._max_num_threads, max_chunks_ahead)
+    with self._condition:
+      self._num_threads = num_threads
+      self._num_chunks_ahead = min(2 * num_threads, max_chunks_ahead)
+      self._condition.notify_all()
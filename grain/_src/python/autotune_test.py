@@ -0,0 +1,128 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for autotuning of prefetching parameters."""
+
+import threading
+import time
+
+from absl.testing import absltest
+from concurrent import futures
+from grain._src.python import autotune
+from grain._src.python import options
+from grain._src.python import record
+import numpy as np
+
+
+class ElementNbytesTest(absltest.TestCase):
+
+  def test_counts_arrays_and_strings(self):
+    element = {
+        "a": np.zeros(10, dtype=np.int32),
+        "b": b"xyz",
+        "c": "hello",
+        "d": 5,
+    }
+    self.assertEqual(autotune.element_nbytes(element), 48)
+
+  def test_counts_record_data(self):
+    element = record.Record(
+        record.RecordMetadata(index=0), np.zeros(3, dtype=np.int64)
+    )
+    self.assertEqual(autotune.element_nbytes(element), 24)
+
+
+class ReadAutotunerTest(absltest.TestCase):
+
+  def _make_autotuner(self, **kwargs) -> autotune.ReadAutotuner:
+    read_options = options.ReadOptions(
+        num_threads=2, prefetch_buffer_size=8, autotune=True, **kwargs
+    )
+    return autotune.ReadAutotuner(read_options, chunk_size=2)
+
+  def _consume(
+      self,
+      autotuner: autotune.ReadAutotuner,
+      *,
+      read_time: float,
+      consumer_time: float,
+      element: np.ndarray,
+      num_chunks: int = autotune._TUNING_INTERVAL,
+  ):
+    read_chunk = autotuner.wrap(lambda: time.sleep(read_time))
+    for _ in range(num_chunks):
+      read_chunk()
+      autotuner.record_chunk([element, element], wait_time=read_time)
+      time.sleep(consumer_time)
+
+  def test_initial_values(self):
+    autotuner = self._make_autotuner()
+    self.assertEqual(autotuner.num_threads, 2)
+    self.assertEqual(autotuner.num_chunks_ahead, 4)
+    self.assertGreaterEqual(autotuner.max_num_threads, 2)
+
+  def test_adds_threads_for_slow_reads(self):
+    autotuner = self._make_autotuner()
+    self._consume(
+        autotuner, read_time=0.01, consumer_time=0.0, element=np.zeros(4)
+    )
+    self.assertEqual(autotuner.num_threads, 4)
+    self.assertEqual(autotuner.num_chunks_ahead, 8)
+
+  def test_removes_threads_for_slow_consumer(self):
+    autotuner = self._make_autotuner()
+    self._consume(
+        autotuner, read_time=0.0, consumer_time=0.01, element=np.zeros(4)
+    )
+    self.assertEqual(autotuner.num_threads, 1)
+    self.assertEqual(autotuner.num_chunks_ahead, 2)
+
+  def test_respects_memory_budget(self):
+    autotuner = self._make_autotuner(autotune_memory_budget=1000)
+    self._consume(
+        autotuner,
+        read_time=0.01,
+        consumer_time=0.0,
+        element=np.zeros(100, dtype=np.uint8),
+        num_chunks=4 * autotune._TUNING_INTERVAL,
+    )
+    # At most 1000 bytes / (2 elements * 100 bytes) chunks fit into the budget.
+    self.assertEqual(autotuner.num_chunks_ahead, 5)
+    self.assertLessEqual(autotuner.num_threads, 5)
+
+  def test_wrap_limits_concurrency(self):
+    autotuner = autotune.ReadAutotuner(
+        options.ReadOptions(num_threads=1, autotune=True), chunk_size=1
+    )
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def read_chunk(i):
+      nonlocal running, max_running
+      with lock:
+        running += 1
+        max_running = max(max_running, running)
+      time.sleep(0.01)
+      with lock:
+        running -= 1
+      return i
+
+    with futures.ThreadPoolExecutor(4) as executor:
+      results = list(executor.map(autotuner.wrap(read_chunk), range(8)))
+    self.assertEqual(results, list(range(8)))
+    self.assertEqual(max_running, 1)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -12,24 +12,88 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """This module provides a PyGrain CheckpointHandler for integration with Orbax."""
+from concurrent import futures
 import dataclasses
 import json
+import threading
+import time
 from typing import Any, Optional, TypeVar
 
+from absl import logging
 from etils import epath
+from grain._src.core import monitoring as grain_monitoring
 from grain._src.python import data_loader
 from grain._src.python.dataset import dataset
 import jax
 
+from grain._src.core import monitoring
+
+_save_blocking_time_metric = monitoring.EventMetric(
+    "/grain/python/checkpoint/save_blocking_time",
+    monitoring.Metadata(
+        description=(
+            "Time the thread calling PyGrainCheckpointHandler.async_save() was"
+            " blocked."
+        ),
+        units=monitoring.Units.NANOSECONDS,
+    ),
+    root=grain_monitoring.get_monitoring_root(),
+)
+
 IteratorType = TypeVar(
     "IteratorType", data_loader.PyGrainDatasetIterator, dataset.DatasetIterator
 )
 
 
-# Ipmlements orbax.checkpoint.CheckpointHandler.
+# Checkpoints store `{_FORMAT_VERSION_KEY: version, _STATE_KEY: state}` as
+# compact JSON. Checkpoints written by older versions store the bare state as
+# indented JSON.
+_FORMAT_VERSION_KEY = "grain_checkpoint_format_version"
+_STATE_KEY = "state"
+_FORMAT_VERSION = 1
+
+
+def _checkpoint_filename(directory: epath.Path) -> epath.Path:
+  return (
+      directory
+      / f"process_{jax.process_index()}-of-{jax.process_count()}.json"
+  )
+
+
+def _write_state(directory: epath.Path, state: Any) -> None:
+  """Encodes the state returned by `get_state` and writes it to `directory`."""
+  if isinstance(state, bytes):
+    # `PyGrainDatasetIterator` states are JSON already.
+    state = state.decode()
+  else:
+    state = json.dumps(state)
+  _checkpoint_filename(directory).write_text(
+      f'{{"{_FORMAT_VERSION_KEY}": {_FORMAT_VERSION}, "{_STATE_KEY}": {state}}}'
+  )
+
+
+def _read_state(filename: epath.Path) -> Any:
+  """Reads the state written by `_write_state` or by older versions."""
+  checkpoint = json.loads(filename.read_text())
+  if not isinstance(checkpoint, dict) or _FORMAT_VERSION_KEY not in checkpoint:
+    return checkpoint
+  version = checkpoint[_FORMAT_VERSION_KEY]
+  if version > _FORMAT_VERSION:
+    raise ValueError(
+        f"Checkpoint {filename} has format version {version}, the latest"
+        f" supported version is {_FORMAT_VERSION}."
+    )
+  return checkpoint[_STATE_KEY]
+
+
+# Implements orbax.checkpoint.AsyncCheckpointHandler.
 class PyGrainCheckpointHandler:
   """Orbax CheckpointHandler for PyGrain iterators."""
 
+  def __init__(self):
+    self._executor = None
+    self._executor_lock = threading.Lock()
+
   def save(
       self,
       directory: epath.Path,
@@ -40,15 +104,51 @@ class PyGrainCheckpointHandler:
   ):
     """Saves the given iterator to the checkpoint in `directory`."""
     item = item or args.item  # pytype:disable=attribute-error
-    if isinstance(item, dataset.DatasetIterator):
-      state = json.dumps(item.get_state(), indent=4)
-    else:
-      state = item.get_state().decode()
-    filename = (
-        directory
-        / f"process_{jax.process_index()}-of-{jax.process_count()}.json"
+    _write_state(directory, item.get_state())
+
+  async def async_save(
+      self,
+      directory: epath.Path,
+      item: Optional[IteratorType] = None,
+      args: Any = None,
+  ) -> list[futures.Future[None]]:
+    """Saves the given iterator to `directory` in the background.
+
+    Only the snapshot of the state returned by `get_state` is taken on the
+    calling thread. The state is encoded and written on a background thread,
+    Orbax waits for the returned futures before finalizing the checkpoint. The
+    time the caller was blocked is reported by the
+    `/grain/python/checkpoint/save_blocking_time` metric.
+
+    Args:
+      directory: Directory to save the checkpoint to.
+      item: Iterator to save, for the older Orbax API.
+      args: Orbax `CheckpointArgs` with the iterator to save.
+
+    Returns:
+      Futures of the background writes.
+    """
+    start_time = time.perf_counter_ns()
+    item = item or args.item  # pytype:disable=attribute-error
+    state = item.get_state()
+    future = self._get_executor().submit(_write_state, directory, state)
+    blocking_time_ns = time.perf_counter_ns() - start_time
+    _save_blocking_time_metric.Record(blocking_time_ns)
+    logging.info(
+        "Took a snapshot of the iterator state for the checkpoint in %s in"
+        " %.3f ms.",
+        directory,
+        blocking_time_ns / 1e6,
     )
-    filename.write_text(state)
+    return [future]
+
+  def _get_executor(self) -> futures.ThreadPoolExecutor:
+    with self._executor_lock:
+      if self._executor is None:
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="grain_checkpoint"
+        )
+      return self._executor
 
   def restore(
       self,
@@ -58,17 +158,12 @@ class PyGrainCheckpointHandler:
   ) -> IteratorType:
     """Restores the given iterator from the checkpoint in `directory`."""
     item = item or args.item  # pytype:disable=attribute-error
-    filename = (
-        directory
-        / f"process_{jax.process_index()}-of-{jax.process_count()}.json"
-    )
+    filename = _checkpoint_filename(directory)
     if not filename.exists():
       raise ValueError(f"File {filename} does not exist.")
-    state = filename.read_text()
-    if isinstance(item, dataset.DatasetIterator):
-      state = json.loads(state)
-    else:
-      state = state.encode()
+    state = _read_state(filename)
+    if not isinstance(item, dataset.DatasetIterator):
+      state = json.dumps(state).encode()
     item.set_state(state)
     return item
 
@@ -87,7 +182,11 @@ class PyGrainCheckpointHandler:
     pass
 
   def close(self):
-    pass
+    """Waits for pending background saves."""
+    with self._executor_lock:
+      if self._executor is not None:
+        self._executor.shutdown(wait=True)
+        self._executor = None
 
   @classmethod
   def typestr(cls):
@@ -109,5 +208,9 @@ try:
   class PyGrainCheckpointRestore(ocp.args.CheckpointArgs):
     item: Any
 
+  # Lets Orbax's `AsyncCheckpointer` use `async_save` without making Orbax a
+  # dependency.
+  ocp.AsyncCheckpointHandler.register(PyGrainCheckpointHandler)
+
 except (ImportError, TypeError, AttributeError):
   pass
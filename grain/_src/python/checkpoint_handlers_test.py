@@ -0,0 +1,129 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the Orbax checkpoint handler."""
+
+import asyncio
+import json
+
+from absl.testing import absltest
+from etils import epath
+from grain._src.core import sharding
+from grain._src.python import checkpoint_handlers
+from grain._src.python import data_loader
+from grain._src.python import samplers
+from grain._src.python.data_sources import RangeDataSource
+from grain._src.python.dataset import dataset
+
+
+def _make_dataset_iterator() -> dataset.DatasetIterator[int]:
+  return dataset.MapDataset.range(10).to_iter_dataset().__iter__()
+
+
+def _make_data_loader_iterator() -> data_loader.PyGrainDatasetIterator:
+  data_source = RangeDataSource(start=0, stop=10, step=1)
+  sampler = samplers.SequentialSampler(
+      num_records=len(data_source), shard_options=sharding.NoSharding()
+  )
+  return iter(
+      data_loader.DataLoader(data_source=data_source, sampler=sampler)
+  )
+
+
+class PyGrainCheckpointHandlerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = epath.Path(self.create_tempdir().full_path)
+    self.handler = checkpoint_handlers.PyGrainCheckpointHandler()
+    self.addCleanup(self.handler.close)
+
+  def test_save_and_restore(self):
+    for make_iterator in (_make_dataset_iterator, _make_data_loader_iterator):
+      with self.subTest(make_iterator.__name__):
+        iterator = make_iterator()
+        self.assertEqual([next(iterator) for _ in range(3)], [0, 1, 2])
+        self.handler.save(self.directory, item=iterator)
+        restored = self.handler.restore(self.directory, item=make_iterator())
+        self.assertEqual(list(restored), list(range(3, 10)))
+
+  def test_async_save_snapshots_state(self):
+    for make_iterator in (_make_dataset_iterator, _make_data_loader_iterator):
+      with self.subTest(make_iterator.__name__):
+        iterator = make_iterator()
+        self.assertEqual([next(iterator) for _ in range(3)], [0, 1, 2])
+        save_futures = asyncio.run(
+            self.handler.async_save(self.directory, item=iterator)
+        )
+        # Advancing the iterator doesn't change the saved state.
+        self.assertEqual(next(iterator), 3)
+        for future in save_futures:
+          future.result()
+        restored = self.handler.restore(self.directory, item=make_iterator())
+        self.assertEqual(list(restored), list(range(3, 10)))
+
+  def test_close_waits_for_async_save(self):
+    iterator = _make_dataset_iterator()
+    next(iterator)
+    asyncio.run(self.handler.async_save(self.directory, item=iterator))
+    self.handler.close()
+    restored = self.handler.restore(
+        self.directory, item=_make_dataset_iterator()
+    )
+    self.assertEqual(next(restored), 1)
+
+  def test_saves_format_version(self):
+    iterator = _make_dataset_iterator()
+    next(iterator)
+    self.handler.save(self.directory, item=iterator)
+    checkpoint = (self.directory / "process_0-of-1.json").read_text()
+    self.assertEqual(
+        json.loads(checkpoint),
+        {"grain_checkpoint_format_version": 1, "state": {"next_index": 1}},
+    )
+
+  def test_restores_json_checkpoint(self):
+    # Older versions saved the bare state as indented JSON.
+    (self.directory / "process_0-of-1.json").write_text(
+        json.dumps({"next_index": 4}, indent=4)
+    )
+    restored = self.handler.restore(
+        self.directory, item=_make_dataset_iterator()
+    )
+    self.assertEqual(list(restored), list(range(4, 10)))
+
+  def test_restores_json_data_loader_checkpoint(self):
+    iterator = _make_data_loader_iterator()
+    self.assertEqual([next(iterator) for _ in range(3)], [0, 1, 2])
+    (self.directory / "process_0-of-1.json").write_text(
+        json.dumps(json.loads(iterator.get_state()), indent=4)
+    )
+    restored = self.handler.restore(
+        self.directory, item=_make_data_loader_iterator()
+    )
+    self.assertEqual(list(restored), list(range(3, 10)))
+
+  def test_restore_fails_with_newer_format_version(self):
+    (self.directory / "process_0-of-1.json").write_text(
+        json.dumps({"grain_checkpoint_format_version": 2, "state": {}})
+    )
+    with self.assertRaisesRegex(ValueError, "format version 2"):
+      self.handler.restore(self.directory, item=_make_dataset_iterator())
+
+  def test_restore_fails_without_checkpoint(self):
+    with self.assertRaisesRegex(ValueError, "does not exist"):
+      self.handler.restore(self.directory, item=_make_dataset_iterator())
+
+
+if __name__ == "__main__":
+  absltest.main()
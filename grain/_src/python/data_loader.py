@@ -35,6 +35,7 @@ from grain._src.core import transforms
 from grain._src.core import tree
 from grain._src.core import usage_logging
 import multiprocessing as mp
+from grain._src.python import autotune
 from grain._src.python import grain_pool
 from grain._src.python import options
 from grain._src.python import record
@@ -139,6 +140,11 @@ class CopyNumPyArrayToSharedMemory(transforms.MapTransform):
 
   def map(self, element: Any) -> Any:
     def copy_if_applied(element: Any) -> Any:
+      if isinstance(element, SharedMemoryArray):
+        # The array may have been allocated in shared memory already.
+        metadata = element.export_metadata()
+        if metadata is not None:
+          return metadata
       if (
           not isinstance(element, np.ndarray)
           or element.dtype.hasobject
@@ -167,6 +173,12 @@ class DataLoader:
       shard_options: sharding.ShardOptions | None = None,
       read_options: options.ReadOptions | None = None,
       enable_profiling: bool = False,
+      deterministic: bool = True,
+      use_persistent_pool: bool = False,
+      start_method: str = "spawn",
+      forkserver_preload: Sequence[str] = (),
+      autotune: bool = False,
+      max_buffered_bytes: int | None = None,
   ):
     """Loads and transforms input data.
 
@@ -186,6 +198,22 @@ class DataLoader:
       read_options: Options to use for reading. See ReadOptions.
       enable_profiling: If True, profiling info is logged. Note, it only
         supports worker_count >= 1 at the moment.
+      deterministic: If False, output batches are taken from whichever worker
+        has one ready instead of reading the workers in round-robin order. See
+        MultiprocessingOptions.
+      use_persistent_pool: If True, worker processes are leased from a
+        process-wide pool and reused by later DataLoaders with the same options
+        instead of being shut down. See MultiprocessingOptions.
+      start_method: Method used to start the worker processes, e.g. "spawn" or
+        "forkserver". See MultiprocessingOptions.
+      forkserver_preload: Modules to import in the forkserver before forking
+        workers. See MultiprocessingOptions.
+      autotune: If True, the number of batches each worker buffers is tuned at
+        runtime based on how long the consumer waits for them. The number of
+        workers is not tuned. See MultiprocessingOptions.
+      max_buffered_bytes: If set, limits the total size in bytes of the output
+        batches buffered by the workers and the main process. See
+        MultiprocessingOptions.
     """
     usage_logging.log_event("PyGrainDataLoader", tag_3="PyGrain")
     _api_usage_counter.Increment("DataLoader")
@@ -220,6 +248,12 @@ class DataLoader:
         num_workers=worker_count,
         per_worker_buffer_size=worker_buffer_size,
         enable_profiling=enable_profiling,
+        deterministic=deterministic,
+        use_persistent_pool=use_persistent_pool,
+        start_method=start_method,
+        forkserver_preload=tuple(forkserver_preload),
+        autotune=autotune,
+        max_buffered_bytes=max_buffered_bytes,
     )
     self._shard_options = shard_options
     if self._shard_options is None:
@@ -296,33 +330,66 @@ class DataLoader:
     # background.
     # The main thread simply gets elements from the buffer and waits for them
     # to be available.
-    next_index = last_seen_index + self._global_num_workers
+    # Each thread task resolves a chunk of consecutive sampler indices of this
+    # worker and reads the corresponding records with a single bulk read if
+    # the data source supports it.
+    stride = self._global_num_workers
+    next_index = last_seen_index + stride
 
     buffer = collections.deque()
-    buffer_size = self._read_options.prefetch_buffer_size
+    chunk_size = options.read_chunk_size(self._read_options)
+    buffer_size = -(-self._read_options.prefetch_buffer_size // chunk_size)
 
-    def prefetch_element(index: int) -> record.Record:
-      metadata = self._sampler[index]
-      data = self._data_source[metadata.record_key]
-      return record.Record(metadata=metadata, data=data)
+    def prefetch_chunk(start: int) -> list[record.Record]:
+      stop = start + chunk_size * stride
+      if hasattr(self._sampler, "get_batch"):
+        metadata = self._sampler.get_batch(start, stop, stride).to_metadata()
+      else:
+        metadata = []
+        for index in range(start, stop, stride):
+          try:
+            metadata.append(self._sampler[index])
+          except IndexError:
+            # End of sampler.
+            break
+      record_keys = [m.record_key for m in metadata]
+      if hasattr(self._data_source, "__getitems__"):
+        data = self._data_source.__getitems__(record_keys)
+      else:
+        data = [self._data_source[key] for key in record_keys]
+      return [record.Record(metadata=m, data=d) for m, d in zip(metadata, data)]
 
-    with futures.ThreadPoolExecutor(self._read_options.num_threads) as executor:
+    num_threads = self._read_options.num_threads
+    autotuner = None
+    if self._read_options.autotune:
+      autotuner = autotune.ReadAutotuner(self._read_options, chunk_size)
+      num_threads = autotuner.max_num_threads
+      prefetch_chunk = autotuner.wrap(prefetch_chunk)
+
+    with futures.ThreadPoolExecutor(num_threads) as executor:
       # Fill the buffer initially.
       while len(buffer) < buffer_size:
-        buffer.append(executor.submit(prefetch_element, next_index))
-        next_index += self._global_num_workers
+        buffer.append(executor.submit(prefetch_chunk, next_index))
+        next_index += chunk_size * stride
 
-      # Iterate until we get an IndexError. The IndexError indicates that we
-      # reached the end of the Sampler.
+      # Iterate until we get a partial chunk or an IndexError. Both indicate
+      # that we reached the end of the Sampler.
       while True:
+        start_time = time.perf_counter()
         try:
-          element = buffer.popleft().result()
+          chunk = buffer.popleft().result()
         except IndexError:
           # End of sampler.
           return
-        yield element
-        buffer.append(executor.submit(prefetch_element, next_index))
-        next_index += self._global_num_workers
+        if autotuner is not None:
+          autotuner.record_chunk(chunk, time.perf_counter() - start_time)
+          buffer_size = autotuner.num_chunks_ahead
+        yield from chunk
+        if len(chunk) < chunk_size:
+          return
+        while len(buffer) < buffer_size:
+          buffer.append(executor.submit(prefetch_chunk, next_index))
+          next_index += chunk_size * stride
 
   def _read_and_transform_data(
       self, last_seen_index: int
@@ -333,6 +400,66 @@ class DataLoader:
       iterator = _apply_transform(operation, iterator)
     return iterator
 
+  def _reshard_state(self, state: _IteratorState) -> _IteratorState:
+    """Converts a state saved with a different number of workers.
+
+    Worker `i` of a shard reads every `global_num_workers`-th record of the
+    shard starting at the `i`-th one and the workers' elements are consumed in
+    round-robin order. Let `position` be the index of a record in the sequence
+    of records read by this shard. The state can be converted without skipping
+    or repeating records if the records consumed by the workers are exactly
+    the ones with positions up to some `P`, i.e. if the last seen positions of
+    all workers are within `num_workers` of each other. This always holds
+    without operations that change the number of elements, such as batching
+    or filtering. With them it holds once every worker has produced the same
+    number of elements since the start.
+
+    Args:
+      state: State saved by a `DataLoader` with a different `worker_count`.
+
+    Returns:
+      The state for this `DataLoader`, which continues with the record at
+      position `P`.
+
+    Raises:
+      ValueError: If the state cannot be converted without skipping or
+        repeating records.
+    """
+    num_workers = self._multiprocessing_options.num_workers
+    if state[_WORKER_COUNT] == num_workers:
+      return state
+    shard_index = self._shard_options.shard_index  # pytype: disable=attribute-error
+    shard_count = self._shard_options.shard_count  # pytype: disable=attribute-error
+    last_seen_indices = state[_LAST_SEEN_INDICES]
+    positions = [
+        (index - shard_index) // shard_count
+        for index in last_seen_indices.values()
+    ]
+    if max(positions) - min(positions) >= len(last_seen_indices):
+      raise ValueError(
+          "Cannot restore the checkpoint with a different worker count: the"
+          " workers consumed different numbers of records. This happens with"
+          " operations that change the number of elements, such as batching or"
+          " filtering, if the checkpoint was taken before every worker"
+          " produced the same number of elements.\n"
+          f"worker count in checkpoint: {state[_WORKER_COUNT]}\n"
+          f"worker count in dataloader: {num_workers}\n"
+          f"last seen indices in checkpoint: {last_seen_indices}"
+      )
+    next_position = max(positions) + 1
+    # Worker `i` starts reading at position `next_position + i`.
+    local_num_workers = self._local_num_workers
+    return {
+        **state,
+        _LAST_SEEN_INDICES: {
+            str(i): shard_index
+            + (next_position - local_num_workers + i) * shard_count
+            for i in range(local_num_workers)
+        },
+        _LAST_WORKER_INDEX: -1,
+        _WORKER_COUNT: num_workers,
+    }
+
   def _validate_state(self, state: _IteratorState):
     """Validates that loaded state matches data loader definition."""
     # state can be None if Iterator never progressed before checkpointing.
@@ -361,13 +488,6 @@ class DataLoader:
       )
 
 
-def _iterator_with_context(
-    iterator: contextlib.AbstractContextManager[Iterator[_T]],
-) -> Iterator[_T]:
-  with iterator as it:
-    yield from it
-
-
 class GetElementProducerFn(grain_pool.GetElementProducerFn):
   """Implements `grain_pool.GetElementProducerFn`."""
 
@@ -391,8 +511,8 @@ class PyGrainDatasetIterator(collections.abc.Iterator[_T]):
   """DataLoader iterator providing get/set state functionality.
 
   This is the only iterator we expose to users. It wraps underlying
-  MultipleProcessIterator. In order to set state, it recreates the underlying
-  iterator fresh with a new state.
+  MultipleProcessIterator. In order to set state, it resets the underlying
+  iterator with a new state reusing the worker processes.
 
   Checkpointing for PyGrainDatasetIterator:
   PyGrainDatasetIterator uses GrainPool, which distributes RecordMetadata from
@@ -413,7 +533,6 @@ class PyGrainDatasetIterator(collections.abc.Iterator[_T]):
     self._data_loader._validate_state(state)
     self._state = state
     self._raw_iterator = None
-    self._iterator = None
 
   def __iter__(self) -> PyGrainDatasetIterator[_T]:
     return self
@@ -425,34 +544,33 @@ class PyGrainDatasetIterator(collections.abc.Iterator[_T]):
       self._raw_iterator = self._data_loader._read_and_transform_data(  # pylint: disable=protected-access
           self._state[_LAST_SEEN_INDICES]["0"]
       )
-      self._iterator = self._raw_iterator
     else:
-      state = self._state
-      # Custom DataLoader can avoid pickling the `self._data_loader` object here
-      # by e.g. making `_read_and_transform_data` a property.
-      read_and_transform_data = self._data_loader._read_and_transform_data  # pylint: disable=protected-access
-
-      get_element_producer_fn = GetElementProducerFn(
-          state, read_and_transform_data
-      )
-
-      worker_index_to_start_reading = (
-          state[_LAST_WORKER_INDEX] + 1
-      ) % self._data_loader.multiprocessing_options.num_workers
-
+      # The iterator stops the worker processes at the end of iteration or
+      # once deleted.
       self._raw_iterator = grain_pool.MultiProcessIterator(
-          get_element_producer_fn,
+          self._get_element_producer_fn(),
           self._data_loader.multiprocessing_options,
-          worker_index_to_start_reading,
+          self._worker_index_to_start_reading(),
       )
-      self._iterator = _iterator_with_context(self._raw_iterator)
+      self._raw_iterator.start_prefetch()
+
+  def _get_element_producer_fn(self) -> GetElementProducerFn:
+    # Custom DataLoader can avoid pickling the `self._data_loader` object here
+    # by e.g. making `_read_and_transform_data` a property.
+    read_and_transform_data = self._data_loader._read_and_transform_data  # pylint: disable=protected-access
+    return GetElementProducerFn(self._state, read_and_transform_data)
+
+  def _worker_index_to_start_reading(self) -> int:
+    return (
+        self._state[_LAST_WORKER_INDEX] + 1
+    ) % self._data_loader.multiprocessing_options.num_workers
 
   def __next__(self) -> _T:
     start_time = time.time_ns()
-    if self._iterator is None:
+    if self._raw_iterator is None:
       self._create_iterator()
 
-    result_record = next(self._iterator)
+    result_record = next(self._raw_iterator)
 
     if isinstance(self._raw_iterator, grain_pool.MultiProcessIterator):
       last_worker_index = self._raw_iterator.get_last_worker_index()
@@ -466,23 +584,35 @@ class PyGrainDatasetIterator(collections.abc.Iterator[_T]):
     return result_record.data
 
   def get_state(self) -> bytes:
-    return json.dumps(self._state, indent=4).encode()
+    return json.dumps(self._state).encode()
 
   def set_state(self, state: bytes):
     """Sets the state for the underlying iterator.
 
     Note that state is an implementation detail and can change in the future.
+    A state saved with a different `worker_count` is converted if possible,
+    see `DataLoader._reshard_state`.
+
     Args:
       state: state to restore the underlying iterator to.
     """
     state = json.loads(state.decode())
-    self._data_loader._validate_state(state)  # pylint: disable=protected-access
+    # pylint: disable=protected-access
+    state = self._data_loader._reshard_state(state)
+    self._data_loader._validate_state(state)
+    # pylint: enable=protected-access
     self._state: _IteratorState = state
-    self._raw_iterator = None
-    self._iterator = None
+    if isinstance(self._raw_iterator, grain_pool.MultiProcessIterator):
+      # Reuse the running worker processes.
+      self._raw_iterator.reset(
+          self._get_element_producer_fn(),
+          self._worker_index_to_start_reading(),
+      )
+    else:
+      self._raw_iterator = None
 
   def __str__(self):
-    return f"PyGrainDatasetIterator(state={self.get_state().decode()})"
+    return f"PyGrainDatasetIterator(state={json.dumps(self._state, indent=4)})"
 
 
 def _apply_transform(
@@ -14,6 +14,7 @@
 """Tests for data loader."""
 
 from collections.abc import Sequence
+import json
 import pathlib
 import sys
 from typing import Union
@@ -26,6 +27,8 @@ from grain._src.core import sharding
 from grain._src.core import transforms
 import multiprocessing as mp
 from grain._src.python import data_loader as data_loader_lib
+from grain._src.python import grain_pool
+from grain._src.python import options
 from grain._src.python import samplers
 from grain._src.python import shared_memory_array
 from grain._src.python.data_sources import ArrayRecordDataSource
@@ -107,6 +110,18 @@ class RandomTripletSource:
     }
 
 
+class BulkReadRangeSource(RangeDataSource):
+  """Range source that records the keys of its bulk reads."""
+
+  def __init__(self, start: int, stop: int, step: int):
+    super().__init__(start, stop, step)
+    self.bulk_reads = []
+
+  def __getitems__(self, record_keys):
+    self.bulk_reads.append(list(record_keys))
+    return [self[key] for key in record_keys]
+
+
 class CopyNumPyArrayToSharedMemoryTest(absltest.TestCase):
 
   def test_copy_numpy_array_to_shared_memory(self):
@@ -127,6 +142,14 @@ class CopyNumPyArrayToSharedMemoryTest(absltest.TestCase):
         result[1], shared_memory_array.SharedMemoryArrayMetadata
     )
 
+  def test_shared_memory_array_is_not_copied(self):
+    element = shared_memory_array.SharedMemoryArray((5,), np.int64)
+    element[:] = np.arange(5)
+    transform = data_loader_lib.CopyNumPyArrayToSharedMemory()
+    result = transform.map(element)
+    self.assertEqual(result, element.metadata)
+    result.close_and_unlink_shm()
+
   def test_copy_skipped_non_numpy_array(self):
     element = "randomstring"
     transform = data_loader_lib.CopyNumPyArrayToSharedMemory()
@@ -260,6 +283,48 @@ class DataLoaderTest(parameterized.TestCase):
     actual = list(data_loader)
     np.testing.assert_equal(actual, expected)
 
+  def test_data_loader_reads_chunks_in_bulk(self):
+    data_source = BulkReadRangeSource(start=0, stop=100, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(data_source), shard_options=sharding.NoSharding()
+    )
+    data_loader = data_loader_lib.DataLoader(
+        data_source=data_source,
+        sampler=sampler,
+        read_options=options.ReadOptions(num_threads=2, prefetch_buffer_size=40),
+    )
+    data_loader_iterator = iter(data_loader)
+    actual = [next(data_loader_iterator) for _ in range(15)]
+    state = data_loader_iterator.get_state()
+    # Restoring in the middle of a chunk continues with the next element.
+    data_loader_iterator.set_state(state)
+    actual.extend(data_loader_iterator)
+    self.assertEqual(actual, list(range(100)))
+    self.assertNotEmpty(data_source.bulk_reads)
+    self.assertTrue(all(len(keys) <= 10 for keys in data_source.bulk_reads))
+    self.assertIn(list(range(10)), data_source.bulk_reads)
+
+  @parameterized.parameters(0, 2)
+  def test_data_loader_with_read_autotune(self, worker_count: int):
+    data_source = RangeDataSource(start=0, stop=1000, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(data_source), shard_options=sharding.NoSharding()
+    )
+    data_loader = data_loader_lib.DataLoader(
+        data_source=data_source,
+        sampler=sampler,
+        worker_count=worker_count,
+        read_options=options.ReadOptions(
+            num_threads=2, prefetch_buffer_size=8, autotune=True
+        ),
+    )
+    data_loader_iterator = iter(data_loader)
+    actual = [next(data_loader_iterator) for _ in range(500)]
+    state = data_loader_iterator.get_state()
+    data_loader_iterator.set_state(state)
+    actual.extend(data_loader_iterator)
+    self.assertEqual(actual, list(range(1000)))
+
   def test_data_loader_in_memory_data_source(self):
     data_source = InMemoryDataSource([0, 1, 2, 3, 4, 5, 6, 7])
 
@@ -636,6 +701,167 @@ class DataLoaderTest(parameterized.TestCase):
       actual.append(item)
     np.testing.assert_equal(actual, expected)
 
+  @parameterized.parameters((2, 3), (3, 0), (0, 2), (3, 2))
+  def test_data_loader_restores_with_different_worker_count(
+      self, num_workers: int, restored_num_workers: int
+  ):
+    def create_data_loader(worker_count: int) -> data_loader_lib.DataLoader:
+      range_data_source = RangeDataSource(start=0, stop=30, step=1)
+      sampler = samplers.SequentialSampler(
+          num_records=len(range_data_source),
+          shard_options=sharding.NoSharding(),
+      )
+      return data_loader_lib.DataLoader(
+          data_source=range_data_source,
+          sampler=sampler,
+          operations=[PlusOne()],
+          worker_count=worker_count,
+      )
+
+    data_loader_iterator = iter(create_data_loader(num_workers))
+    actual = [next(data_loader_iterator) for _ in range(7)]
+    state = data_loader_iterator.get_state()
+    restored_iterator = iter(create_data_loader(restored_num_workers))
+    restored_iterator.set_state(state)
+    actual.extend(restored_iterator)
+    self.assertEqual(actual, list(range(1, 31)))
+    # The converted state is saved with the new worker count.
+    self.assertEqual(
+        json.loads(restored_iterator.get_state())["worker_count"],
+        restored_num_workers,
+    )
+
+  def test_data_loader_restores_indented_json_state(self):
+    data_loader_iterator = iter(self.create_checkpointing_dataloader(2))
+    next(data_loader_iterator)
+    state = data_loader_iterator.get_state()
+    expected = list(data_loader_iterator)
+    # Older versions saved the state as indented JSON.
+    indented_state = json.dumps(json.loads(state), indent=4).encode()
+    self.assertLess(len(state), len(indented_state))
+    restored_iterator = iter(self.create_checkpointing_dataloader(2))
+    restored_iterator.set_state(indented_state)
+    np.testing.assert_equal(list(restored_iterator), expected)
+
+  def test_data_loader_restore_with_different_worker_count_fails(self):
+    data_loader_iterator = iter(self.create_checkpointing_dataloader(2))
+    next(data_loader_iterator)
+    state = data_loader_iterator.get_state()
+    restored_iterator = iter(self.create_checkpointing_dataloader(3))
+    with self.assertRaisesRegex(
+        ValueError, "workers consumed different numbers of records"
+    ):
+      restored_iterator.set_state(state)
+
+  def test_data_loader_checkpointing_non_deterministic(self):
+    range_data_source = RangeDataSource(start=0, stop=60, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(range_data_source), shard_options=sharding.NoSharding()
+    )
+    data_loader = data_loader_lib.DataLoader(
+        data_source=range_data_source,
+        sampler=sampler,
+        worker_count=3,
+        deterministic=False,
+    )
+    data_loader_iterator = iter(data_loader)
+    values = [next(data_loader_iterator) for _ in range(20)]
+    state = data_loader_iterator.get_state()
+    remaining_values = list(data_loader_iterator)
+    self.assertCountEqual(values + remaining_values, range(60))
+    # The order of elements can differ but the restored iterator produces
+    # exactly the remaining elements.
+    data_loader_iterator.set_state(state)
+    self.assertCountEqual(list(data_loader_iterator), remaining_values)
+
+  def test_data_loader_set_state_reuses_worker_processes(self):
+    data_loader_iterator = iter(self.create_checkpointing_dataloader(2))
+    first_batch = next(data_loader_iterator)
+    state = data_loader_iterator.get_state()
+    second_batch = next(data_loader_iterator)
+    pids = [
+        p.pid
+        for p in data_loader_iterator._raw_iterator._grain_pool[0].processes
+    ]
+    data_loader_iterator.set_state(state)
+    np.testing.assert_equal(next(data_loader_iterator), second_batch)
+    self.assertEqual(
+        [
+            p.pid
+            for p in data_loader_iterator._raw_iterator._grain_pool[0].processes
+        ],
+        pids,
+    )
+    np.testing.assert_equal(first_batch, [2, 4])
+
+  def test_data_loader_set_state_after_end_of_iteration(self):
+    data_loader_iterator = iter(self.create_checkpointing_dataloader(2))
+    next(data_loader_iterator)
+    state = data_loader_iterator.get_state()
+    expected = list(data_loader_iterator)
+    # The worker processes are stopped at the end of iteration.
+    self.assertEmpty(data_loader_iterator._raw_iterator._grain_pool)
+    data_loader_iterator.set_state(state)
+    np.testing.assert_equal(list(data_loader_iterator), expected)
+
+  def test_data_loaders_share_persistent_pool(self):
+    self.addCleanup(grain_pool._persistent_pool.shutdown)
+    range_data_source = RangeDataSource(start=0, stop=8, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(range_data_source), shard_options=sharding.NoSharding()
+    )
+    pids = []
+    for _ in range(2):
+      data_loader_iterator = iter(
+          data_loader_lib.DataLoader(
+              data_source=range_data_source,
+              sampler=sampler,
+              worker_count=2,
+              use_persistent_pool=True,
+          )
+      )
+      self.assertEqual(next(data_loader_iterator), 0)
+      pids.append([
+          p.pid
+          for p in data_loader_iterator._raw_iterator._grain_pool[0].processes
+      ])
+      self.assertEqual(list(data_loader_iterator), list(range(1, 8)))
+    self.assertEqual(pids[0], pids[1])
+
+  def test_data_loader_with_forkserver(self):
+    range_data_source = RangeDataSource(start=0, stop=8, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(range_data_source), shard_options=sharding.NoSharding()
+    )
+    data_loader = data_loader_lib.DataLoader(
+        data_source=range_data_source,
+        sampler=sampler,
+        operations=[PlusOne()],
+        worker_count=2,
+        start_method="forkserver",
+        forkserver_preload=["numpy"],
+    )
+    self.assertEqual(list(data_loader), list(range(1, 9)))
+
+  def test_data_loader_with_autotune(self):
+    range_data_source = RangeDataSource(start=0, stop=100, step=1)
+    sampler = samplers.SequentialSampler(
+        num_records=len(range_data_source), shard_options=sharding.NoSharding()
+    )
+    data_loader = data_loader_lib.DataLoader(
+        data_source=range_data_source,
+        sampler=sampler,
+        operations=[PlusOne()],
+        worker_count=2,
+        autotune=True,
+    )
+    iterator = iter(data_loader)
+    self.assertEqual([next(iterator) for _ in range(10)], list(range(1, 11)))
+    state = iterator.get_state()
+    self.assertEqual(list(iterator), list(range(11, 101)))
+    iterator.set_state(state)
+    self.assertEqual(list(iterator), list(range(11, 101)))
+
   def test_batch_transform_mapped_to_batch_operation(self):
     # Map transforms elements to be [1, 2, 3, 4, 5, 6, 7, 8]
     # Filter keeps only even elements [2, 4, 6, 8]
@@ -86,6 +86,15 @@ class ArrayRecordDataSource(array_record.ArrayRecordDataSource):
     _bytes_read_counter.IncrementBy(len(data), "ArrayRecordDataSource")
     return data
 
+  def __getitems__(
+      self, record_keys: Sequence[SupportsIndex]
+  ) -> Sequence[bytes]:
+    records = super().__getitems__(record_keys)
+    _bytes_read_counter.IncrementBy(
+        sum(len(record) for record in records), "ArrayRecordDataSource"
+    )
+    return records
+
 
 @typing.runtime_checkable
 class RandomAccessDataSource(Protocol, Generic[T]):
@@ -93,6 +102,10 @@ class RandomAccessDataSource(Protocol, Generic[T]):
 
   Note that `__repr__` has to be additionally implemented to make checkpointing
   work with this source.
+
+  Sources can optionally implement `__getitems__(record_keys)` returning the
+  records for a sequence of keys in the same order. Dataset transformations use
+  it to read many records in a single call when it is available.
   """
 
   def __len__(self) -> int:
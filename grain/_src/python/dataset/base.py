@@ -26,7 +26,11 @@ T = TypeVar("T")
 
 @typing.runtime_checkable
 class RandomAccessDataSource(Protocol[T]):
-  """Interface for datasets where storage supports efficient random access."""
+  """Interface for datasets where storage supports efficient random access.
+
+  Sources may additionally implement `__getitems__(indices)` returning a list
+  of records for the given indices to support bulk reads.
+  """
 
   def __len__(self):
     ...
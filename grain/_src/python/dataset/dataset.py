@@ -285,6 +285,21 @@ class MapDataset(_Dataset, Generic[T], metaclass=_MapDatasetMeta):
   def __getitem__(self, index):
     """Returns the element for the index or None if missing."""
 
+  def __getitems__(self, indices: Sequence[int]) -> Sequence[T | None]:
+    """Returns elements for the indices, None for the missing ones.
+
+    Equivalent to `[self[i] for i in indices]`. Transformations override this
+    to pass the indices down to their parents in bulk so that data sources
+    implementing `__getitems__` can read many records in a single call.
+
+    Args:
+      indices: Integer indices of the elements to return.
+
+    Returns:
+      A list of elements in the order of `indices`.
+    """
+    return [self.__getitem__(index) for index in indices]
+
   def batch(
       self,
       batch_size: int,
@@ -676,7 +691,9 @@ class MapDataset(_Dataset, Generic[T], metaclass=_MapDatasetMeta):
     return self.to_iter_dataset().__iter__()
 
   def _initialize_stats(
-      self, execution_tracking_mode: dataset_stats.ExecutionTrackingMode
+      self,
+      execution_tracking_mode: dataset_stats.ExecutionTrackingMode,
+      sample_every_n: int = 1,
   ) -> dataset_stats.Stats:
     """Eagerly initializes the stats object with given execution tracking mode.
 
@@ -689,6 +706,7 @@ class MapDataset(_Dataset, Generic[T], metaclass=_MapDatasetMeta):
     Args:
       execution_tracking_mode: The execution tracking mode to use for the stats
         object.
+      sample_every_n: Only every n-th element produced in each thread is timed.
 
     Returns:
       The initialized stats object.
@@ -698,10 +716,14 @@ class MapDataset(_Dataset, Generic[T], metaclass=_MapDatasetMeta):
     parents_stats = []
     if hasattr(self, "_parents"):
       for p in self._parents:
-        parents_stats.append(p._initialize_stats(execution_tracking_mode))  # pylint: disable=protected-access
+        parents_stats.append(
+            p._initialize_stats(execution_tracking_mode, sample_every_n)  # pylint: disable=protected-access
+        )
     self._stats = dataset_stats.make_stats(
         dataset_stats.StatsConfig(
-            name=str(self), transform_mutates_spec=self._MUTATES_ELEMENT_SPEC
+            name=str(self),
+            transform_mutates_spec=self._MUTATES_ELEMENT_SPEC,
+            sample_every_n=sample_every_n,
         ),
         parents_stats,
         execution_tracking_mode=execution_tracking_mode,
@@ -1151,13 +1173,16 @@ class DatasetIterator(Iterator[T], abc.ABC):
     if hasattr(self, "_parents"):
       for p in self._parents:
         parents_stats.append(p._stats)  # pylint: disable=protected-access
+    options = self._options_with_default
     return dataset_stats.make_stats(
         dataset_stats.StatsConfig(
             name=str(self),
             transform_mutates_spec=self._MUTATES_ELEMENT_SPEC,
+            log_summary=True,
+            sample_every_n=options.execution_tracking_sample_every_n,
         ),
         parents_stats,
-        execution_tracking_mode=self._options_with_default.execution_tracking_mode,
+        execution_tracking_mode=options.execution_tracking_mode,
     )
 
 
@@ -1178,6 +1203,9 @@ class _WithSeedMapDataset(MapDataset[T]):
       return self.slice(index)
     return self._parent[index]
 
+  def __getitems__(self, indices):
+    return self._parent.__getitems__(indices)
+
   def __str__(self):
     return "WithOptionsMapDataset"
 
@@ -1222,6 +1250,32 @@ class DatasetOptions:
       etc. can be managed through various modes. If `DISABLED`, no statistics
       are collected.If `STAGE_TIMING`, the time it takes to process each
       transormation is collected. See `ExecutionTrackingMode` for more details.
+    execution_tracking_sample_every_n: With `STAGE_TIMING`, only every n-th
+      element produced by each thread of a transformation is timed, which
+      reduces the overhead of tracking for pipelines with many cheap elements.
+      The number of produced elements is still exact and the total processing
+      time is extrapolated from the timed elements.
+    max_buffered_bytes: If set, each thread prefetching stage of the pipeline
+      stops reading ahead once its buffered elements take more than this many
+      bytes. Only NumPy arrays and strings are counted. The bytes buffered by
+      the stages are reported by the `/grain/python/buffered_bytes` gauge. See
+      `MultiprocessingOptions.max_buffered_bytes` for the buffers of worker
+      processes.
+    minimize_restore_replay: If True, restoring a checkpoint recomputes fewer
+      elements buffered by stateful transformations. Single-bin packing
+      records the state of its parent whenever it has no buffered elements
+      instead of every 100 elements, at the cost of more frequent `get_state`
+      calls on the parent, and only recomputes the partial pack buffered when
+      the checkpoint was saved. Window shuffle only reads the elements of the
+      window that were not consumed yet by seeking its parent if the parent is
+      a `MapDataset.to_iter_dataset()`, possibly followed by `map`s, that
+      yields an element for every index, i.e. with `allow_nones=True` or of a
+      source or range that is only shuffled, sliced or repeated.
+      Flat map records the state of its parent once all outputs of an element
+      are consumed and only re-runs the flat map if the checkpoint was saved
+      while splitting an element. Buffered elements are not stored in
+      checkpoints, so first-fit packing still recomputes the batch being
+      packed.
   """
 
   filter_warn_threshold_ratio: float | None | _Default[float] = _Default(0.9)
@@ -1230,6 +1284,9 @@ class DatasetOptions:
       dataset_stats.ExecutionTrackingMode
       | _Default[dataset_stats.ExecutionTrackingMode]
   ) = _Default(dataset_stats.ExecutionTrackingMode.DISABLED)
+  execution_tracking_sample_every_n: int | _Default[int] = _Default(1)
+  max_buffered_bytes: int | None | _Default[None] = _Default(None)
+  minimize_restore_replay: bool | _Default[bool] = _Default(False)
 
   # Internal fields.
 
@@ -1327,6 +1384,31 @@ _ConsistentDatasetType = TypeVar(
 )
 
 
+def get_execution_summary(
+    ds_iter: DatasetIterator,
+) -> dataset_stats.ExecutionSummary:
+  """Returns the execution statistics of the pipeline producing `ds_iter`.
+
+  Args:
+    ds_iter: Iterator of a pipeline with `DatasetOptions.execution_tracking_mode`
+      set to `STAGE_TIMING`.
+
+  Returns:
+    Processing times and numbers of elements produced by each transformation.
+
+  Raises:
+    ValueError: If the execution of the pipeline is not tracked.
+  """
+  summary = ds_iter._stats.get_execution_summary()  # pylint: disable=protected-access
+  if summary is None:
+    raise ValueError(
+        "Execution statistics are not collected for the pipeline. Set"
+        " `DatasetOptions(execution_tracking_mode=STAGE_TIMING)` to collect"
+        " them."
+    )
+  return summary
+
+
 def apply_transformations(
     ds: _ConsistentDatasetType,
     transformations: transforms.Transformation | transforms.Transformations,
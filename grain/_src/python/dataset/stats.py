@@ -72,12 +72,58 @@ _COLUMN_NAME_OVERRIDES = types.MappingProxyType({
     "max_processing_time_ns": "max processing time",
     "total_processing_time_ns": "total processing time",
     "num_produced_elements": "num produced elements",
+    "num_produced_bytes": "num produced bytes",
     "output_spec": "output spec",
 })
 
 _MAX_COLUMN_WIDTH = 30
 _MAX_ROW_LINES = 5
 
+# Shared context manager returned when no time is recorded.
+_NOOP_CONTEXT = contextlib.nullcontext()
+
+
+@dataclasses.dataclass(slots=True, kw_only=True)
+class ExecutionSummary:
+  """Execution statistics of the transformations in a pipeline.
+
+  Attributes:
+    nodes: Statistics of each transformation by node id. The output node has id
+      0. Transformations executed in `mp_prefetch` worker processes are inputs
+      of the `mp_prefetch` node, their statistics are aggregated over the
+      workers.
+  """
+
+  @dataclasses.dataclass(slots=True, kw_only=True)
+  class Node:
+    """Execution statistics of a single transformation."""
+
+    id: int = 0
+    name: str = ""
+    # Ids of the nodes producing the inputs of this node.
+    inputs: list[int] = dataclasses.field(default_factory=list)
+    min_processing_time_ns: int = sys.maxsize
+    max_processing_time_ns: int = 0
+    total_processing_time_ns: int = 0
+    num_produced_elements: int = 0
+    # Total size of the arrays in the produced elements. Only recorded for the
+    # elements sent from `mp_prefetch` workers.
+    num_produced_bytes: int = 0
+    output_spec: str = ""
+    is_output: bool = False
+    # Statistics of this transformation in each `mp_prefetch` worker by worker
+    # index.
+    worker_nodes: dict[int, ExecutionSummary.Node] = dataclasses.field(
+        default_factory=dict
+    )
+
+  nodes: dict[int, ExecutionSummary.Node] = dataclasses.field(
+      default_factory=dict
+  )
+
+  def __str__(self) -> str:
+    return _pretty_format_summary(self)
+
 
 def _pretty_format_ns(value: int) -> str:
   """Pretty formats a time value in nanoseconds to human readable value."""
@@ -92,7 +138,7 @@ def _pretty_format_ns(value: int) -> str:
 
 
 def _get_avg_processing_time_ns(
-    summary: execution_summary_pb2.ExecutionSummary,
+    summary: ExecutionSummary,
     node_id: int,
 ) -> int:
   """Returns the average processing time in nanoseconds for the given node."""
@@ -105,15 +151,19 @@ def _get_avg_processing_time_ns(
 
 
 def _pretty_format_summary(
-    summary: execution_summary_pb2.ExecutionSummary,
+    summary: ExecutionSummary,
 ) -> str:
   """Returns Execution Stats Summary for the dataset pipeline in tabular format."""
   tabular_summary = []
-  col_names = [key for key in summary.nodes[0].DESCRIPTOR.fields_by_name.keys()]
+  col_names = [f.name for f in dataclasses.fields(ExecutionSummary.Node)]
   # Remove the columns `output_spec` and `is_output` as they are available in
   # the visualization graph.
   col_names.remove("output_spec")
   col_names.remove("is_output")
+  # Per-worker statistics are aggregated in the rows of the nodes.
+  col_names.remove("worker_nodes")
+  if not any(node.num_produced_bytes for node in summary.nodes.values()):
+    col_names.remove("num_produced_bytes")
   # Insert the average processing time column after the max processing time
   # column.
   index = col_names.index("max_processing_time_ns")
@@ -294,6 +344,8 @@ class StatsConfig:
   transform_mutates_spec: bool = True
   # Whether to log the execution summary.
   log_summary: bool = False
+  # Only every `sample_every_n`-th element produced in each thread is timed.
+  sample_every_n: int = 1
 
 
 class Stats(abc.ABC):
@@ -322,7 +374,7 @@ class Stats(abc.ABC):
 
   @contextlib.contextmanager
   @abc.abstractmethod
-  def record_self_time(self, offset_ns: float = 0):
+  def record_self_time(self, offset_ns: float = 0, num_elements: int = 1):
     """Records time spent in this node's transfromation.
 
     Thread-safe.
@@ -350,6 +402,8 @@ class Stats(abc.ABC):
     Args:
       offset_ns: (Optional.) A offset to add to the self time measured by this
         function. Default to 0.
+      num_elements: (Optional.) Number of elements produced in the block, e.g.
+        by `__getitems__`. Default to 1.
     """
     ...
 
@@ -394,6 +448,30 @@ class Stats(abc.ABC):
     """
     ...
 
+  def get_execution_summary(self) -> ExecutionSummary | None:
+    """Returns the execution summary of the pipeline if it's collected.
+
+    Thread-safe.
+    """
+    return None
+
+  def record_worker_summary(
+      self, worker_index: int, summary: ExecutionSummary
+  ) -> None:
+    """Records the execution summary of the pipeline in a worker process.
+
+    The latest summary of each worker is added to the execution summary of the
+    pipeline as inputs of this node. Does nothing if the execution summary is
+    not collected.
+
+    Thread-safe.
+
+    Args:
+      worker_index: Index of the worker that produced the summary.
+      summary: Cumulative execution summary of the worker's pipeline.
+    """
+    del worker_index, summary
+
   def _visualize_dataset_graph(self):
     """Generates Dataset visualization graph."""
     # TODO:Save the graph to a dot file for advanced visualization.
@@ -433,9 +511,8 @@ class Stats(abc.ABC):
 class _NoopStats(Stats):
   """Default implementation for statistics collection that does nothing."""
 
-  @contextlib.contextmanager
-  def record_self_time(self, offset_ns: int = 0):
-    yield
+  def record_self_time(self, offset_ns: int = 0, num_elements: int = 1):
+    return _NOOP_CONTEXT
 
   def record_output_spec(self, element: T) -> T:
     return element
@@ -453,11 +530,10 @@ class _VisualizationStats(Stats):
     self._reported_lock = threading.Lock()
 
   def __reduce__(self):
-    return _VisualizationStats, (self._config.name, self._parents)
+    return _VisualizationStats, (self._config, self._parents)
 
-  @contextlib.contextmanager
-  def record_self_time(self, offset_ns: int = 0):
-    yield
+  def record_self_time(self, offset_ns: int = 0, num_elements: int = 1):
+    return _NOOP_CONTEXT
 
   def record_output_spec(self, element: T) -> T:
     # Visualize the dataset graph once last node had seen a non-None element.
@@ -476,27 +552,87 @@ class _VisualizationStats(Stats):
     logging.info("Grain Dataset graph:\n\n%s", self._visualize_dataset_graph())
 
 
+class _ThreadStats:
+  """Cumulative self times of the elements produced by a single thread.
+
+  Only written by the thread producing the elements. The values are cumulative
+  and never reset, so the reporting thread can read them without a lock: a read
+  racing with an update is at most one element behind.
+  """
+
+  __slots__ = (
+      "num_calls",
+      "num_elements",
+      "num_timed_elements",
+      "total_time_ns",
+      "min_time_ns",
+      "max_time_ns",
+  )
+
+  def __init__(self):
+    self.num_calls = 0
+    self.num_elements = 0
+    self.num_timed_elements = 0
+    self.total_time_ns = 0
+    self.min_time_ns = sys.maxsize
+    self.max_time_ns = 0
+
+
+class _SelfTimeRecorder:
+  """Context manager recording the self time of a block producing elements."""
+
+  __slots__ = ("_thread_stats", "_offset_ns", "_num_elements", "_start_ns")
+
+  def __init__(
+      self, thread_stats: _ThreadStats, offset_ns: int, num_elements: int
+  ):
+    self._thread_stats = thread_stats
+    self._offset_ns = offset_ns
+    self._num_elements = num_elements
+
+  def __enter__(self):
+    self._start_ns = time.perf_counter_ns()
+
+  def __exit__(self, *args):
+    time_ns = time.perf_counter_ns() - self._start_ns + self._offset_ns
+    thread_stats = self._thread_stats
+    thread_stats.num_timed_elements += self._num_elements
+    thread_stats.total_time_ns += time_ns
+    # Elements produced together are attributed the same self time.
+    if self._num_elements != 1:
+      time_ns //= self._num_elements
+    if time_ns < thread_stats.min_time_ns:
+      thread_stats.min_time_ns = time_ns
+    if time_ns > thread_stats.max_time_ns:
+      thread_stats.max_time_ns = time_ns
+
+
 class _ExecutionStats(_VisualizationStats):
   """Execution time statistics for transformations."""
 
   def __init__(self, config: StatsConfig, parents: Sequence[Stats]):
     super().__init__(config, parents)
-    # Note that the buffer is intentionally not guarded by a lock to avoid lock
-    # contention. Thread-safe operations are expected to only do atomic actions
-    # on the buffer (such as `append`) making it safe due to GIL. See details in
-    # https://docs.python.org/3/faq/library.html#what-kinds-of-global-value-mutation-are-thread-safe
-    # The buffer is popped from a single(!) background reporting thread.
-    self._self_times_buffer = []
+    # Each thread producing elements records into its own `_ThreadStats` to
+    # avoid lock contention and per-element allocations. `report` aggregates
+    # them.
+    self._local = threading.local()
+    self._threads_stats: list[_ThreadStats] = []
+    self._threads_stats_lock = threading.Lock()
     self._reporting_thread = None
     self._logging_thread = None
     self._reporting_thread_init_lock = threading.Lock()
     self._logging_thread_init_lock = threading.Lock()
-    self._summary = execution_summary_pb2.ExecutionSummary.Node(
-        min_processing_time_ns=sys.maxsize,
-        max_processing_time_ns=0,
-    )
+    self._summary = ExecutionSummary.Node()
+    # Reports come from the reporting thread and `get_execution_summary`.
+    self._report_lock = threading.Lock()
+    # Values of the previous report, used to report the average self time
+    # during the reporting interval.
+    self._reported_num_timed_elements = 0
+    self._reported_total_time_ns = 0
     self._last_update_time = 0
     self._last_report_time = 0
+    self._worker_summaries: dict[int, ExecutionSummary] = {}
+    self._worker_summaries_lock = threading.Lock()
 
   def __reduce__(self):
     return _ExecutionStats, (self._config, self._parents)
@@ -505,6 +641,7 @@ class _ExecutionStats(_VisualizationStats):
     return time.time() - self._last_update_time < _REPORTING_TIMEOUT_SEC
 
   def _reporting_loop(self):
+    self._last_update_time = time.time()
     while self._should_report():
       time.sleep(_REPORTING_PERIOD_SEC)
       # A node can be marked as non-output after the corresponding
@@ -512,7 +649,10 @@ class _ExecutionStats(_VisualizationStats):
       # initialization time.
       if not self._is_output:
         return
+      num_produced_elements = self._summary.num_produced_elements
       self.report()
+      if self._summary.num_produced_elements > num_produced_elements:
+        self._last_update_time = time.time()
 
   def _logging_execution_summary_loop(self):
     """Logs the execution summary periodically."""
@@ -538,7 +678,7 @@ class _ExecutionStats(_VisualizationStats):
 
   def _build_execution_summary(
       self,
-      execution_summary: execution_summary_pb2.ExecutionSummary,
+      execution_summary: ExecutionSummary,
       node_id: int,
   ):
     """Computes the stats summary for the whole dataset pipeline."""
@@ -548,8 +688,9 @@ class _ExecutionStats(_VisualizationStats):
     self._summary.name = self._config.name
     self._summary.output_spec = str(self.output_spec)
     self._summary.is_output = self._is_output
-    execution_summary.nodes.get_or_create(node_id)
-    execution_summary.nodes[node_id].CopyFrom(self._summary)
+    execution_summary.nodes[node_id] = dataclasses.replace(
+        self._summary, inputs=[]
+    )
     current_node_id = node_id
     for p in self._parents:
       node_id += 1
@@ -557,61 +698,162 @@ class _ExecutionStats(_VisualizationStats):
       # pytype: disable=attribute-error
       _, node_id = p._build_execution_summary(execution_summary, node_id)  # pylint: disable=protected-access
       # pytype: enable=attribute-error
+    with self._worker_summaries_lock:
+      worker_summaries = dict(self._worker_summaries)
+    if worker_summaries:
+      node_id += 1
+      execution_summary.nodes[current_node_id].inputs.append(node_id)
+      node_id = _add_worker_summaries(
+          execution_summary, worker_summaries, node_id
+      )
     return execution_summary, node_id
 
-  def _get_execution_summary(self) -> execution_summary_pb2.ExecutionSummary:
+  def _get_execution_summary(self) -> ExecutionSummary:
     """Returns ExecutionStats Summary for the dataset pipeline."""
-    execution_summary = execution_summary_pb2.ExecutionSummary()
+    self.report()
+    execution_summary = ExecutionSummary()
     result, _ = self._build_execution_summary(execution_summary, 0)
     return result
 
-  @contextlib.contextmanager
-  def record_self_time(self, offset_ns: int = 0):
-    start_time = time.perf_counter_ns()
+  def get_execution_summary(self) -> ExecutionSummary:
+    return self._get_execution_summary()
+
+  def record_worker_summary(
+      self, worker_index: int, summary: ExecutionSummary
+  ) -> None:
+    with self._worker_summaries_lock:
+      self._worker_summaries[worker_index] = summary
+
+  def _register_thread(self) -> _ThreadStats:
+    thread_stats = _ThreadStats()
+    self._local.stats = thread_stats
+    with self._threads_stats_lock:
+      self._threads_stats.append(thread_stats)
+    return thread_stats
+
+  def _start_reporting_threads(self):
+    if self._reporting_thread is None:
+      with self._reporting_thread_init_lock:
+        # Check above together with update would not be atomic -- another
+        # thread may have started the reporting thread.
+        if self._reporting_thread is None:
+          self._reporting_thread = threading.Thread(
+              target=self._reporting_loop, daemon=True
+          )
+          self._reporting_thread.start()
+    if self._config.log_summary and self._logging_thread is None:
+      with self._logging_thread_init_lock:
+        if self._logging_thread is None:
+          self._logging_thread = threading.Thread(
+              target=self._logging_execution_summary_loop, daemon=True
+          )
+          self._logging_thread.start()
+
+  def record_self_time(self, offset_ns: int = 0, num_elements: int = 1):
     try:
-      yield
-    finally:
-      self._self_times_buffer.append(
-          time.perf_counter_ns() - start_time + offset_ns
-      )
+      thread_stats = self._local.stats
+    except AttributeError:
+      thread_stats = self._register_thread()
       if self._is_output:
-        # We avoid acquiring `_reporting_thread_init_lock` here to avoid lock
-        # contention.
-        self._last_update_time = time.time()
-        if self._reporting_thread is None:
-          with self._reporting_thread_init_lock:
-            # Check above together with update would not be atomic -- another
-            # thread may have started the reporting thread.
-            if self._reporting_thread is None:
-              self._reporting_thread = threading.Thread(
-                  target=self._reporting_loop, daemon=True
-              )
-              self._reporting_thread.start()
-        if self._config.log_summary and self._logging_thread is None:
-          with self._logging_thread_init_lock:
-            if self._logging_thread is None:
-              self._logging_thread = threading.Thread(
-                  target=self._logging_execution_summary_loop, daemon=True
-              )
-              self._logging_thread.start()
+        self._start_reporting_threads()
+    thread_stats.num_elements += num_elements
+    thread_stats.num_calls += 1
+    if not num_elements or thread_stats.num_calls % self._config.sample_every_n:
+      return _NOOP_CONTEXT
+    return _SelfTimeRecorder(thread_stats, offset_ns, num_elements)
 
   def report(self):
-    while self._self_times_buffer:
-      # Each record in _self_times_buffer corresponds to a single element.
-      self._summary.num_produced_elements += 1
-      # Execution Summary must be cummulative from the beginning.
-      self_time_ns = self._self_times_buffer.pop()
-      self._summary.min_processing_time_ns = min(
-          self._summary.min_processing_time_ns, self_time_ns
-      )
-      self._summary.max_processing_time_ns = max(
-          self._summary.max_processing_time_ns, self_time_ns
-      )
-      self._summary.total_processing_time_ns += self_time_ns
-      _self_time_ms_histogram.Record(self_time_ns, self._config.name)
+    with self._report_lock:
+      self._report_self()
     for p in self._parents:
       p.report()
 
+  def _report_self(self):
+    """Aggregates the threads' stats into the summary and the metrics."""
+    num_elements = 0
+    num_timed_elements = 0
+    total_time_ns = 0
+    min_time_ns = sys.maxsize
+    max_time_ns = 0
+    with self._threads_stats_lock:
+      threads_stats = list(self._threads_stats)
+    for thread_stats in threads_stats:
+      num_elements += thread_stats.num_elements
+      num_timed_elements += thread_stats.num_timed_elements
+      total_time_ns += thread_stats.total_time_ns
+      min_time_ns = min(min_time_ns, thread_stats.min_time_ns)
+      max_time_ns = max(max_time_ns, thread_stats.max_time_ns)
+    # Execution Summary must be cummulative from the beginning.
+    self._summary.num_produced_elements = num_elements
+    if num_timed_elements:
+      self._summary.min_processing_time_ns = min_time_ns
+      self._summary.max_processing_time_ns = max_time_ns
+      # Extrapolates the sampled self times to all elements.
+      self._summary.total_processing_time_ns = (
+          total_time_ns * num_elements // num_timed_elements
+      )
+    if num_timed_elements > self._reported_num_timed_elements:
+      _self_time_ms_histogram.Record(
+          (total_time_ns - self._reported_total_time_ns)
+          / (num_timed_elements - self._reported_num_timed_elements)
+          / 1e6,
+          self._config.name,
+      )
+      self._reported_num_timed_elements = num_timed_elements
+      self._reported_total_time_ns = total_time_ns
+
+
+def _add_worker_summaries(
+    execution_summary: ExecutionSummary,
+    worker_summaries: dict[int, ExecutionSummary],
+    first_node_id: int,
+) -> int:
+  """Adds the nodes of the workers' pipelines aggregated over the workers.
+
+  All workers execute the same pipeline, so the nodes with the same id in the
+  workers' summaries are statistics of the same transformation.
+
+  Args:
+    execution_summary: Summary to add the nodes to.
+    worker_summaries: Execution summaries of the workers by worker index.
+    first_node_id: Id of the output node of the workers' pipeline in
+      `execution_summary`.
+
+  Returns:
+    The largest id of the added nodes.
+  """
+  last_node_id = first_node_id
+  for worker_index, worker_summary in sorted(worker_summaries.items()):
+    for worker_node in worker_summary.nodes.values():
+      node_id = first_node_id + worker_node.id
+      worker_node = dataclasses.replace(
+          worker_node,
+          id=node_id,
+          inputs=[first_node_id + i for i in worker_node.inputs],
+          is_output=False,
+      )
+      node = execution_summary.nodes.get(node_id)
+      if node is None:
+        node = ExecutionSummary.Node(
+            id=node_id,
+            name=worker_node.name,
+            inputs=list(worker_node.inputs),
+            output_spec=worker_node.output_spec,
+        )
+        execution_summary.nodes[node_id] = node
+        last_node_id = max(last_node_id, node_id)
+      node.min_processing_time_ns = min(
+          node.min_processing_time_ns, worker_node.min_processing_time_ns
+      )
+      node.max_processing_time_ns = max(
+          node.max_processing_time_ns, worker_node.max_processing_time_ns
+      )
+      node.total_processing_time_ns += worker_node.total_processing_time_ns
+      node.num_produced_elements += worker_node.num_produced_elements
+      node.num_produced_bytes += worker_node.num_produced_bytes
+      node.worker_nodes[worker_index] = worker_node
+  return last_node_id
+
 
 def make_stats(
     config: StatsConfig,
@@ -619,4 +861,6 @@ def make_stats(
     execution_tracking_mode: ExecutionTrackingMode = ExecutionTrackingMode.DISABLED,
 ) -> Stats:
   """Produces statistics instance according to the current execution mode."""
+  if execution_tracking_mode == ExecutionTrackingMode.STAGE_TIMING:
+    return _ExecutionStats(config, parents=parents)
   return _NoopStats(config, parents=parents)
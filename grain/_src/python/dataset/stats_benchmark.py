@@ -0,0 +1,100 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the overhead of execution tracking per element and stage.
+
+The pipeline is `--depth` cheap maps, half of them on the `MapDataset` and half
+on the iterator, read without prefetch threads so that the measured time is the
+time spent producing elements in the main thread.
+
+Usage:
+  python -m grain._src.python.dataset.stats_benchmark \
+      --depth=10 --num_elements=200000
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from grain._src.python import options
+from grain._src.python.dataset import dataset
+from grain._src.python.dataset import stats
+
+_DEPTH = flags.DEFINE_integer(
+    "depth", 10, "Number of map transformations in the pipeline."
+)
+_NUM_ELEMENTS = flags.DEFINE_integer(
+    "num_elements", 200_000, "Number of elements read from the pipeline."
+)
+_NUM_REPEATS = flags.DEFINE_integer(
+    "num_repeats", 5, "Number of measurements, the fastest one is reported."
+)
+
+
+def _add_one(x: int) -> int:
+  return x + 1
+
+
+def _make_dataset(
+    ds_options: dataset.DatasetOptions,
+) -> dataset.IterDataset[int]:
+  ds = dataset.MapDataset.range(_NUM_ELEMENTS.value)
+  for _ in range(_DEPTH.value // 2):
+    ds = ds.map(_add_one)
+  ds = ds.to_iter_dataset(options.ReadOptions(prefetch_buffer_size=0))
+  for _ in range(_DEPTH.value - _DEPTH.value // 2):
+    ds = ds.map(_add_one)
+  return dataset.WithOptionsIterDataset(ds, ds_options)
+
+
+def _measure(ds: dataset.IterDataset[int]) -> float:
+  """Returns the fastest time to read `ds` in nanoseconds per element."""
+  best = float("inf")
+  for _ in range(_NUM_REPEATS.value):
+    start = time.perf_counter_ns()
+    for _ in ds:
+      pass
+    best = min(best, time.perf_counter_ns() - start)
+  return best / _NUM_ELEMENTS.value
+
+
+def main(argv):
+  del argv
+  configs = {
+      "DISABLED": dataset.DatasetOptions(),
+      "STAGE_TIMING": dataset.DatasetOptions(
+          execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING
+      ),
+      "STAGE_TIMING 1/10": dataset.DatasetOptions(
+          execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING,
+          execution_tracking_sample_every_n=10,
+      ),
+      "STAGE_TIMING 1/100": dataset.DatasetOptions(
+          execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING,
+          execution_tracking_sample_every_n=100,
+      ),
+  }
+  baseline = None
+  for name, ds_options in configs.items():
+    ns_per_element = _measure(_make_dataset(ds_options))
+    if baseline is None:
+      baseline = ns_per_element
+    overhead = (ns_per_element - baseline) / (_DEPTH.value + 1)
+    print(
+        f"{name:>18}: {ns_per_element:8.0f} ns/element,"
+        f" overhead {overhead:6.0f} ns/element/stage"
+    )
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -232,5 +232,186 @@ class NoopStatsTest(absltest.TestCase):
     s = s._parents[0]
     s.report()
 
+
+_make_execution_stats = functools.partial(
+    stats.make_stats,
+    execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING,
+)
+
+
+class ExecutionStatsTest(absltest.TestCase):
+
+  def test_make_stats(self):
+    s = _make_stats_tree(_make_execution_stats)
+    _for_each_node(
+        lambda node: self.assertIsInstance(node, stats._ExecutionStats), [s]
+    )
+
+  def test_record_self_time(self):
+    s = _make_stats_tree(_make_execution_stats)
+    for offset_ns in (1_000, 5_000_000, 3_000):
+      with s.record_self_time(offset_ns=offset_ns):
+        pass
+    summary = s.get_execution_summary().nodes[0]
+    self.assertEqual(summary.num_produced_elements, 3)
+    self.assertBetween(summary.min_processing_time_ns, 1_000, 2_000_000)
+    self.assertBetween(summary.max_processing_time_ns, 5_000_000, 7_000_000)
+    self.assertBetween(
+        summary.total_processing_time_ns, 5_004_000, 9_000_000
+    )
+
+  def test_record_self_time_of_multiple_elements(self):
+    s = _make_stats_tree(_make_execution_stats)
+    with s.record_self_time(offset_ns=8_000_000, num_elements=4):
+      pass
+    summary = s.get_execution_summary().nodes[0]
+    self.assertEqual(summary.num_produced_elements, 4)
+    self.assertBetween(summary.min_processing_time_ns, 2_000_000, 3_000_000)
+    self.assertBetween(summary.total_processing_time_ns, 8_000_000, 10_000_000)
+
+  def test_record_self_time_in_multiple_threads(self):
+    s = _make_stats_tree(_make_execution_stats)
+    node = s._parents[0]
+
+    def record():
+      for _ in range(1000):
+        with node.record_self_time():
+          pass
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    self.assertLen(node._threads_stats, 4)
+    summary = s.get_execution_summary()
+    self.assertEqual(summary.nodes[1].name, "left")
+    self.assertEqual(summary.nodes[1].num_produced_elements, 4000)
+    self.assertEqual(summary.nodes[0].num_produced_elements, 0)
+
+  def test_samples_elements(self):
+    s = stats.make_stats(
+        stats.StatsConfig(name="root", sample_every_n=3),
+        [],
+        execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING,
+    )
+    for _ in range(9):
+      with s.record_self_time(offset_ns=1_000_000):
+        pass
+    thread_stats = s._threads_stats[0]
+    self.assertEqual(thread_stats.num_elements, 9)
+    self.assertEqual(thread_stats.num_timed_elements, 3)
+    summary = s.get_execution_summary().nodes[0]
+    self.assertEqual(summary.num_produced_elements, 9)
+    # The total is extrapolated from the timed elements.
+    self.assertBetween(summary.total_processing_time_ns, 9_000_000, 12_000_000)
+
+  def test_report_records_average_self_time(self):
+    s = _make_stats_tree(_make_execution_stats)
+    with mock.patch.object(stats._self_time_ms_histogram, "Record") as record:
+      with s.record_self_time(offset_ns=2_000_000):
+        pass
+      with s.record_self_time(offset_ns=4_000_000):
+        pass
+      s.report()
+      # Nothing new to report.
+      s.report()
+    record.assert_called_once()
+    self_time_ms, name = record.call_args.args
+    self.assertBetween(self_time_ms, 3, 4)
+    self.assertEqual(name, "root")
+
+  def test_picklable(self):
+    s = _make_stats_tree(_make_execution_stats)
+    with s.record_self_time():
+      pass
+    s = cloudpickle.loads(cloudpickle.dumps(s))
+    self.assertIsInstance(s, stats._ExecutionStats)
+    summary = s.get_execution_summary()
+    self.assertEqual(summary.nodes[0].num_produced_elements, 0)
+
+  def test_get_execution_summary_of_pipeline(self):
+    ds = (
+        dataset.MapDataset.range(10)
+        .map(_identity)
+        .to_iter_dataset()
+        .map(_identity)
+        .filter(lambda x: x % 2)
+    )
+    ds = dataset.WithOptionsIterDataset(
+        ds,
+        dataset.DatasetOptions(
+            execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING
+        ),
+    )
+    ds_iter = ds.__iter__()
+    self.assertEqual(list(ds_iter), [1, 3, 5, 7, 9])
+    summary = dataset.get_execution_summary(ds_iter)
+    self.assertEqual(
+        [node.num_produced_elements for node in summary.nodes.values()],
+        [5, 10, 10, 10, 10],
+    )
+    self.assertTrue(summary.nodes[0].is_output)
+    self.assertEqual(summary.nodes[0].inputs, [1])
+    self.assertIn("FilterDatasetIterator", str(summary))
+
+  def test_get_execution_summary_fails_without_tracking(self):
+    ds_iter = dataset.MapDataset.range(10).to_iter_dataset().__iter__()
+    next(ds_iter)
+    with self.assertRaisesRegex(ValueError, "STAGE_TIMING"):
+      dataset.get_execution_summary(ds_iter)
+
+  def test_merges_worker_summaries(self):
+    s = _make_execution_stats(stats.StatsConfig(name="prefetch"), [])
+
+    def worker_summary(time_ns: int, num_elements: int):
+      return stats.ExecutionSummary(
+          nodes={
+              0: stats.ExecutionSummary.Node(
+                  id=0,
+                  name="map",
+                  inputs=[1],
+                  min_processing_time_ns=time_ns,
+                  max_processing_time_ns=time_ns,
+                  total_processing_time_ns=time_ns * num_elements,
+                  num_produced_elements=num_elements,
+                  num_produced_bytes=8 * num_elements,
+                  is_output=True,
+              ),
+              1: stats.ExecutionSummary.Node(
+                  id=1, name="source", num_produced_elements=num_elements
+              ),
+          }
+      )
+
+    s.record_worker_summary(0, worker_summary(1_000, 2))
+    s.record_worker_summary(1, worker_summary(5_000, 1))
+    # Summaries are cumulative, the latest one replaces the previous.
+    s.record_worker_summary(1, worker_summary(3_000, 3))
+    summary = s.get_execution_summary()
+    self.assertEqual(
+        [node.name for node in summary.nodes.values()],
+        ["prefetch", "map", "source"],
+    )
+    self.assertEqual(summary.nodes[0].inputs, [1])
+    self.assertEqual(summary.nodes[1].inputs, [2])
+    map_node = summary.nodes[1]
+    self.assertFalse(map_node.is_output)
+    self.assertEqual(map_node.num_produced_elements, 5)
+    self.assertEqual(map_node.num_produced_bytes, 40)
+    self.assertEqual(map_node.min_processing_time_ns, 1_000)
+    self.assertEqual(map_node.max_processing_time_ns, 3_000)
+    self.assertEqual(map_node.total_processing_time_ns, 11_000)
+    self.assertEqual(
+        {
+            worker_index: node.num_produced_elements
+            for worker_index, node in map_node.worker_nodes.items()
+        },
+        {0: 2, 1: 3},
+    )
+    self.assertEqual(map_node.worker_nodes[1].inputs, [2])
+    self.assertIn("num produced bytes", str(summary))
+
+
 if __name__ == "__main__":
   absltest.main()
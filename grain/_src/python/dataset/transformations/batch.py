@@ -21,6 +21,8 @@ import pprint
 from typing import Callable, TypeVar
 
 from grain._src.core import tree
+from grain._src.python import multiprocessing_common
+from grain._src.python import shared_memory_array
 from grain._src.python.dataset import dataset
 import numpy as np
 
@@ -28,14 +30,46 @@ T = TypeVar("T")
 S = TypeVar("S")
 
 
+def _stack_in_shared_memory(*xs) -> np.ndarray:
+  """Stacks arrays into a new `SharedMemoryArray`.
+
+  The result is sent to the main process without copying (see
+  `SharedMemoryArray.export_metadata`) and unlinks the shared memory if it gets
+  dropped in the worker process instead.
+
+  Args:
+    *xs: Values to stack.
+
+  Returns:
+    The stacked values.
+  """
+  if not all(isinstance(x, (np.ndarray, np.generic)) for x in xs):
+    return np.stack(xs)
+  dtype = np.result_type(*xs)
+  if dtype.hasobject:
+    return np.stack(xs)
+  out = shared_memory_array.SharedMemoryArray(
+      (len(xs),) + xs[0].shape, dtype=dtype
+  )
+  out.unlink_on_del()
+  return np.stack(xs, out=out)
+
+
 def _make_batch(values: Sequence[T]) -> T:
   """Returns a batch of values with a new batch dimension at the front."""
 
   if not values:
     raise ValueError("Cannot batch 0 values. Please file a bug.")
 
+  # Batches produced by worker processes are assembled directly in shared
+  # memory to avoid copying them there before sending to the main process.
+  stack_fn = (
+      _stack_in_shared_memory
+      if multiprocessing_common.is_worker_process()
+      else lambda *xs: np.stack(xs)
+  )
   try:
-    return tree.map_structure(lambda *xs: np.stack(xs), *values)
+    return tree.map_structure(stack_fn, *values)
 
   except ValueError as e:
     # NumPy error message doesn't include actual shapes and dtypes. Provide a
@@ -122,9 +156,8 @@ class BatchMapDataset(dataset.MapDataset[T]):
   def __len__(self):
     return self._length
 
-  def __getitem__(self, index):
-    if isinstance(index, slice):
-      return self.slice(index)
+  def _parent_range(self, index: int) -> range:
+    """Returns the range of parent indices making up the batch at `index`."""
     # Each epoch gets batched separately. If users want to batch across epochs
     # they can repeat() before the batch().
     epoch, index_in_epoch = divmod(index, self._length)
@@ -134,10 +167,32 @@ class BatchMapDataset(dataset.MapDataset[T]):
     # Add offset for epoch.
     start += epoch * len(self._parent)
     stop += epoch * len(self._parent)
-    values = [self._parent[i] for i in range(start, stop)]
+    return range(start, stop)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return self.slice(index)
+    values = self._parent.__getitems__(list(self._parent_range(index)))
     with self._stats.record_self_time():
       return self._stats.record_output_spec(self._batch_fn(values))
 
+  def __getitems__(self, indices):
+    # Request elements of all batches from the parent in a single call.
+    ranges = [self._parent_range(index) for index in indices]
+    values = self._parent.__getitems__(
+        [i for parent_range in ranges for i in parent_range]
+    )
+    with self._stats.record_self_time(num_elements=len(indices)):
+      batches = []
+      start = 0
+      for parent_range in ranges:
+        stop = start + len(parent_range)
+        batches.append(
+            self._stats.record_output_spec(self._batch_fn(values[start:stop]))
+        )
+        start = stop
+      return batches
+
   def __str__(self) -> str:
     return (
         f"BatchMapDataset(batch_size={self._batch_size},"
@@ -13,8 +13,12 @@
 # limitations under the License.
 """Tests for batch transformation."""
 
+from unittest import mock
+
 from absl.testing import absltest
 from absl.testing import parameterized
+from grain._src.python import multiprocessing_common
+from grain._src.python import shared_memory_array
 from grain._src.python.dataset import dataset
 from grain._src.python.dataset.transformations import batch
 from grain._src.python.dataset.transformations import repeat
@@ -66,6 +70,34 @@ class MakeBatchTest(absltest.TestCase):
     ):
       batch._make_batch(values)
 
+  @mock.patch.object(multiprocessing_common, "_is_worker_process", True)
+  def test_batch_in_shared_memory_in_worker_process(self):
+    values = [
+        {"a": np.asarray([1, 2, 3]), "b": "x"},
+        {"a": np.asarray([4, 5, 6]), "b": "y"},
+    ]
+    batched_values = batch._make_batch(values)
+    self.assertIsInstance(
+        batched_values["a"], shared_memory_array.SharedMemoryArray
+    )
+    np.testing.assert_array_equal(batched_values["a"], [[1, 2, 3], [4, 5, 6]])
+    np.testing.assert_array_equal(batched_values["b"], ["x", "y"])
+    metadata = batched_values["a"].export_metadata()
+    self.assertIsNotNone(metadata)
+    del batched_values
+    arr = shared_memory_array.SharedMemoryArray.from_metadata(metadata)
+    arr.unlink_on_del()
+    np.testing.assert_array_equal(arr, [[1, 2, 3], [4, 5, 6]])
+
+  @mock.patch.object(multiprocessing_common, "_is_worker_process", True)
+  def test_different_shape_in_worker_process(self):
+    values = [{"a": np.asarray([1, 2, 3])}, {"a": np.asarray([4, 5])}]
+    with self.assertRaisesRegex(
+        ValueError,
+        "Expected all input elements to have the same structure but got:",
+    ):
+      batch._make_batch(values)
+
 
 class BatchMapDatasetTest(parameterized.TestCase):
 
@@ -112,6 +144,19 @@ class BatchMapDatasetTest(parameterized.TestCase):
     for i in range(len(ds)):
       np.testing.assert_allclose(actual[i], expected[i])
 
+  @parameterized.named_parameters(
+      dict(testcase_name="drop_remainder", drop_remainder=True),
+      dict(testcase_name="", drop_remainder=False),
+  )
+  def test_getitems(self, drop_remainder: bool):
+    ds = dataset.MapDataset.range(0, 10)
+    ds = batch.BatchMapDataset(ds, batch_size=3, drop_remainder=drop_remainder)
+    indices = [3, 0, 5, 1]
+    actual = ds.__getitems__(indices)
+    self.assertLen(actual, len(indices))
+    for batch_element, i in zip(actual, indices):
+      np.testing.assert_array_equal(batch_element, ds[i])
+
   @parameterized.named_parameters(
       dict(testcase_name="drop_remainder", drop_remainder=True),
       dict(testcase_name="", drop_remainder=False),
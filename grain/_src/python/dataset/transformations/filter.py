@@ -62,6 +62,16 @@ class FilterMapDataset(dataset.MapDataset[T]):
         return element
       return None
 
+  def __getitems__(self, indices):
+    elements = self._parent.__getitems__(indices)
+    with self._stats.record_self_time(num_elements=len(indices)):
+      return [
+          element
+          if element is not None and self._filter_fn(element)
+          else None
+          for element in elements
+      ]
+
   def __str__(self) -> str:
     return f"FilterMapDataset(transform={self._transform_name})"
 
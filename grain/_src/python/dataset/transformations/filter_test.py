@@ -93,6 +93,16 @@ class FilterMapDatasetTest(absltest.TestCase):
     ]
     self.assertEqual(expected_data, actual_data)
 
+  def test_getitems(self):
+    filter_even_elts_ds = filter_dataset.FilterMapDataset(
+        self.range_ds, FilterEvenElementsOnly()
+    )
+    indices = [5, 2, 13, 0]
+    self.assertEqual(
+        filter_even_elts_ds.__getitems__(indices),
+        [filter_even_elts_ds[i] for i in indices],
+    )
+
 
 class FilterIterDatasetTest(absltest.TestCase):
 
@@ -115,6 +115,12 @@ class _FlatMapDatasetIterator(dataset.DatasetIterator[T]):
       return self._stats.record_output_spec(mapped_element)
 
   def get_state(self):
+    if (
+        self._options_with_default.minimize_restore_replay
+        and self._has_consumed_all_buffer_elements()
+    ):
+      # Restoring doesn't re-run the flat map on the consumed element.
+      return {"parent": self._parent.get_state(), "next_index_in_buffer": 0}
     return {
         "parent": self._last_parent_state,
         "next_index_in_buffer": self._next_index_in_buffer,
@@ -124,6 +130,10 @@ class _FlatMapDatasetIterator(dataset.DatasetIterator[T]):
     self._last_parent_state = state["parent"]
     self._parent.set_state(state["parent"])
     self._next_index_in_buffer = state["next_index_in_buffer"]
+    self._buffer = []
+    if self._next_index_in_buffer == 0:
+      # No element of the buffer was consumed, `__next__` fills it.
+      return
     try:
       element = next(self._parent)
       # Recovers the buffer
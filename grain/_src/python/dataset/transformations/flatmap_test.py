@@ -193,6 +193,43 @@ class FlatMapIterDatasetTest(absltest.TestCase):
       for i in range(starting_step, max_steps):
         self.assertEqual(next(ds_iter), values_without_interruption[i])
 
+  def test_minimize_restore_replay(self):
+    num_flat_map_calls = 0
+
+    class CountingUnbatch(transforms.FlatMapTransform):
+
+      def flat_map(self, elements: Any) -> Sequence[Any]:
+        nonlocal num_flat_map_calls
+        num_flat_map_calls += 1
+        return [e for e in elements]
+
+    iter_ds = dataset.WithOptionsIterDataset(
+        flatmap.FlatMapIterDataset(
+            source.SourceMapDataset(self._data_source).to_iter_dataset(),
+            CountingUnbatch(),
+        ),
+        dataset.DatasetOptions(minimize_restore_replay=True),
+    )
+    ds_iter = iter_ds.__iter__()
+    checkpoints = []
+    for _ in range(len(self._expected)):
+      checkpoints.append(ds_iter.get_state())
+      next(ds_iter)
+    for starting_step in range(len(self._expected)):
+      num_flat_map_calls = 0
+      ds_iter = iter_ds.__iter__()
+      ds_iter.set_state(checkpoints[starting_step])
+      # The flat map only re-runs if the checkpoint was saved while splitting
+      # an element.
+      self.assertEqual(
+          num_flat_map_calls,
+          0 if starting_step in (0, 4, 6, 10) else 1,
+          msg=f"Restoring at step {starting_step}.",
+      )
+      self.assertSequenceEqual(
+          list(ds_iter), self._expected[starting_step:]
+      )
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -166,6 +166,28 @@ class MapMapDataset(dataset.MapDataset[T]):
         element = self._map_fn(element)
     return self._stats.record_output_spec(element)
 
+  def __getitems__(self, indices):
+    elements = self._parent.__getitems__(indices)
+    with self._stats.record_self_time(num_elements=len(indices)):
+      if self._rng_pool:
+        rng = self._rng_pool.acquire_rng(0)
+        results = []
+        for index, element in zip(indices, elements):
+          if element is not None:
+            _reset_rng_state(rng, op_seed=0, index=index)
+            element = self._map_fn(element, rng)
+          results.append(element)
+        self._rng_pool.release_rng(rng)
+      else:
+        results = [
+            None if element is None else self._map_fn(element)
+            for element in elements
+        ]
+    return [
+        None if element is None else self._stats.record_output_spec(element)
+        for element in results
+    ]
+
 
 class MapWithIndexMapDataset(dataset.MapDataset[T]):
   """Map with index MapDataset."""
@@ -206,6 +228,16 @@ class MapWithIndexMapDataset(dataset.MapDataset[T]):
         return None
       return self._stats.record_output_spec(self._map_fn(index, element))
 
+  def __getitems__(self, indices):
+    elements = self._parent.__getitems__(indices)
+    with self._stats.record_self_time(num_elements=len(indices)):
+      return [
+          None
+          if element is None
+          else self._stats.record_output_spec(self._map_fn(index, element))
+          for index, element in zip(indices, elements)
+      ]
+
 
 class _MapDatasetIterator(dataset.DatasetIterator[T]):
   """Iterator that applies map transformation to elements."""
@@ -134,6 +134,17 @@ class MapMapDatasetTest(parameterized.TestCase):
     ]
     np.testing.assert_almost_equal(expected_data, actual_data, decimal=1)
 
+  @parameterized.parameters(
+      MapWithTransform,
+      RandomMapWithTransform,
+  )
+  def test_getitems(self, map_cls):
+    ds = ldmap.MapMapDataset(
+        self.range_ds.filter(lambda x: x % 3), map_cls(), seed=0
+    )
+    indices = [7, 0, 3, 15, 1]
+    self.assertEqual(ds.__getitems__(indices), [ds[i] for i in indices])
+
   def test_random_map_with_default_seed(self):
     seed = 42
     ds1 = self.range_ds.seed(seed)
@@ -128,11 +128,15 @@ class SingleBinPackDatasetIterator(dataset.DatasetIterator):
     self._num_next_calls = 0
 
   def _get_next_from_parent(self) -> tuple[int, list[Any]]:
-    if self._num_next_calls > _RECACHE_PARENT_STATE_EVERY_N:
+    if (
+        self._num_next_calls > _RECACHE_PARENT_STATE_EVERY_N
+        or self._options_with_default.minimize_restore_replay
+    ):
       # Update `_last_state` only if buffers are empty.
       if not self._packed_elements and not self._element_buffer:
         self._last_parent_state = self._parent.get_state()
-        self._num_next_calls = 0
+        # The current call hasn't returned yet and is replayed on restore.
+        self._num_next_calls = 1
 
     element = next(self._parent)
     flat_element = tree.flatten(element)
@@ -251,9 +255,13 @@ class SingleBinPackDatasetIterator(dataset.DatasetIterator):
     self._element_buffer_space = copy.copy(self._flat_lengths)
     # Advance for num_next_calls.
     self._num_next_calls = 0
-    # Replay pipeline for `num_next_calls`.
-    for _ in range(state["num_next_calls"]):
-      next(self)
+    # Replay pipeline for `num_next_calls`. The last call may have reached the
+    # end of the parent.
+    try:
+      for _ in range(state["num_next_calls"]):
+        next(self)
+    except StopIteration:
+      pass
     assert self._num_next_calls == state["num_next_calls"]
 
   def __str__(self) -> str:
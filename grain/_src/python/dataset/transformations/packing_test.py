@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for batch transformation."""
 
+from unittest import mock
+
 from absl.testing import absltest
 from absl.testing import parameterized
 from grain._src.python.dataset import dataset
@@ -348,6 +350,56 @@ class SingleBinPackIterDatasetTest(parameterized.TestCase):
         for k, v in value.items():
           np.testing.assert_array_equal(v, values_without_interruption[i][k])
 
+  def _assert_restores_from_every_step(
+      self, ds: dataset.IterDataset, num_steps: int
+  ) -> None:
+    ds_iter = iter(ds)
+    values_without_interruption = []
+    checkpoints = []
+    for _ in range(num_steps):
+      checkpoints.append(ds_iter.get_state())  # pytype: disable=attribute-error
+      values_without_interruption.append(next(ds_iter))
+    for starting_step in range(num_steps):
+      ds_iter = iter(ds)
+      ds_iter.set_state(checkpoints[starting_step])  # pytype: disable=attribute-error
+      for i in range(starting_step, num_steps):
+        value = next(ds_iter)
+        for k, v in value.items():
+          np.testing.assert_array_equal(v, values_without_interruption[i][k])
+
+  def _make_ds(self, make_element) -> dataset.IterDataset:
+    ds = dataset.MapDataset.range(1, 12).shuffle(seed=3).repeat(None)
+    ds = ds.to_iter_dataset().map(make_element)
+    return packing.SingleBinPackIterDataset(ds, length_struct={"x": 8})
+
+  def test_checkpointing_after_recaching_parent_state(self):
+    ds = self._make_ds(lambda x: {"x": 2**x + np.arange(x)})
+    with mock.patch.object(packing, "_RECACHE_PARENT_STATE_EVERY_N", 2):
+      self._assert_restores_from_every_step(ds, 20)
+
+  def test_minimize_restore_replay(self):
+    calls = []
+
+    def make_element(x):
+      calls.append(x)
+      return {"x": 2**x + np.arange(x)}
+
+    ds = dataset.WithOptionsIterDataset(
+        self._make_ds(make_element),
+        dataset.DatasetOptions(minimize_restore_replay=True),
+    )
+    self._assert_restores_from_every_step(ds, 20)
+    ds_iter = iter(ds)
+    for _ in range(15):
+      next(ds_iter)
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    calls.clear()
+    iter(ds).set_state(state)  # pytype: disable=attribute-error
+    # Only the elements of the partial pack are recomputed. Elements have at
+    # least one token, so at most 7 of them fit into a partial pack.
+    self.assertNotEmpty(calls)
+    self.assertLessEqual(len(calls), 7)
+
 
 def _common_test_body(
     input_elements,
@@ -17,9 +17,9 @@ from __future__ import annotations
 
 import collections
 from collections.abc import Callable, Iterator
-import contextlib
 import copy
 import functools
+import io
 import queue
 import sys
 import threading
@@ -31,12 +31,19 @@ import cloudpickle
 from concurrent import futures
 from grain._src.core import tree
 import multiprocessing as mp
+from grain._src.python import autotune
 from grain._src.python import grain_pool
+from grain._src.python import memory_budget
 from grain._src.python import options as grain_options
 from grain._src.python import shared_memory_array
 from grain._src.python.dataset import dataset
 from grain._src.python.dataset import stats as dataset_stats
 from grain._src.python.dataset.transformations import filter as filter_dataset
+from grain._src.python.dataset.transformations import map as map_dataset
+from grain._src.python.dataset.transformations import repeat
+from grain._src.python.dataset.transformations import shuffle
+from grain._src.python.dataset.transformations import slice as slice_dataset
+from grain._src.python.dataset.transformations import source
 import numpy as np
 
 T = TypeVar("T")
@@ -99,24 +106,49 @@ class PrefetchDatasetIterator(dataset.DatasetIterator[T]):
     self._dataset_length = len(parent)
     self._read_options = read_options
     self._next_index = 0
+    # Futures of element chunks requested from the parent with their indices
+    # and estimated size in bytes, the elements of the chunk currently being
+    # consumed and the first index not requested yet.
     self._buffer = None
+    self._chunk = collections.deque()
+    self._next_buffered_index = 0
+    # Error raised by the parent for the index following the elements left in
+    # `self._chunk`.
+    self._read_error = None
+    # With `DatasetOptions.max_buffered_bytes` the chunks are counted against
+    # the budget by their size estimated from the average element size.
+    self._memory_budget = None
+    self._element_nbytes = None
+    self._chunk_nbytes = 0
     self._lock = threading.Lock()
     self._prefetch_buffer_size = read_options.prefetch_buffer_size
     self._allow_nones = allow_nones
+    self._autotuner = None
     if self._prefetch_buffer_size > 0:
-      self._executor = futures.ThreadPoolExecutor(read_options.num_threads)
+      self._chunk_size = grain_options.read_chunk_size(read_options)
+      num_threads = read_options.num_threads
+      if read_options.autotune:
+        self._autotuner = autotune.ReadAutotuner(
+            read_options, self._chunk_size
+        )
+        num_threads = self._autotuner.max_num_threads
+      self._executor = futures.ThreadPoolExecutor(num_threads)
 
   @functools.cached_property
   def _stats(self):
-    execution_tracking_mode = self._options_with_default.execution_tracking_mode
+    options = self._options_with_default
+    execution_tracking_mode = options.execution_tracking_mode
+    sample_every_n = options.execution_tracking_sample_every_n
     parent_stats = self._map_parent._initialize_stats(  # pylint: disable=protected-access
-        execution_tracking_mode
+        execution_tracking_mode, sample_every_n
     )
     # Connect to `MapDataset` parent stats.
     return dataset_stats.make_stats(
         dataset_stats.StatsConfig(
             name=str(self),
             transform_mutates_spec=self._MUTATES_ELEMENT_SPEC,
+            log_summary=True,
+            sample_every_n=sample_every_n,
         ),
         (parent_stats,),
         execution_tracking_mode,
@@ -141,33 +173,22 @@ class PrefetchDatasetIterator(dataset.DatasetIterator[T]):
         break
       with self._lock, timer:
         if self._prefetch_buffer_size > 0:
-          if not self._buffer:
-            indices = range(
-                self._next_index,
-                min(
-                    self._next_index + self._prefetch_buffer_size,
-                    self._dataset_length,
-                ),
-            )
+          if self._buffer is None:
             # Stats initialization is not thread-safe, so we trigger map parent
             # stats initialization before multithreaded prefetching.
             _ = self._stats
-            self._buffer = collections.deque(
-                self._executor.submit(self._map_parent.__getitem__, i)
-                for i in indices
-            )
-          element = self._buffer.popleft()
-          if (
-              self._next_index + self._prefetch_buffer_size
-              < self._dataset_length
-          ):
-            self._buffer.append(
-                self._executor.submit(
-                    self._map_parent.__getitem__,
-                    self._next_index + self._prefetch_buffer_size,
-                )
-            )
-          element = element.result()
+            self._buffer = collections.deque()
+            self._next_buffered_index = self._next_index
+            self._reset_memory_budget()
+          if not self._chunk:
+            if self._read_error is None:
+              if not self._buffer:
+                self._fill_buffer()
+              self._chunk = collections.deque(self._next_chunk())
+              self._fill_buffer()
+            if not self._chunk:
+              self._raise_read_error()
+          element = self._chunk.popleft()
         else:
           element = self._map_parent[self._next_index]
         self._next_index += 1
@@ -178,19 +199,146 @@ class PrefetchDatasetIterator(dataset.DatasetIterator[T]):
           return element
     raise StopIteration
 
+  def _reset_memory_budget(self) -> None:
+    if self._memory_budget is not None:
+      self._memory_budget.close()
+      self._memory_budget = None
+    self._chunk_nbytes = 0
+    max_buffered_bytes = self._options_with_default.max_buffered_bytes
+    if max_buffered_bytes is not None:
+      self._memory_budget = memory_budget.MemoryBudget(
+          "prefetch", max_buffered_bytes
+      )
+
+  def _next_chunk(self) -> list[T]:
+    """Waits for the next requested chunk of elements.
+
+    If reading the chunk fails, its elements are read one by one to return the
+    elements preceding the failing index. The error is then raised by
+    `_raise_read_error` when the iterator reaches that index.
+
+    Returns:
+      The elements of the chunk up to the first failing one.
+    """
+    future, indices, nbytes = self._buffer.popleft()
+    start_time = time.perf_counter()
+    try:
+      chunk = future.result()
+    except Exception:  # pylint: disable=broad-except
+      chunk = []
+      for index in indices:
+        try:
+          chunk.append(self._map_parent[index])
+        except Exception as e:  # pylint: disable=broad-except
+          self._read_error = e
+          break
+    else:
+      if self._autotuner is not None:
+        self._autotuner.record_chunk(chunk, time.perf_counter() - start_time)
+    if self._memory_budget is not None:
+      # The previous chunk has been consumed.
+      self._memory_budget.release(self._chunk_nbytes)
+      self._chunk_nbytes = nbytes
+      if chunk:
+        # Sampling the first element is enough to estimate the size.
+        element_nbytes = autotune.element_nbytes(chunk[0])
+        if self._element_nbytes is None:
+          self._element_nbytes = element_nbytes
+        else:
+          self._element_nbytes += 0.2 * (element_nbytes - self._element_nbytes)
+    return chunk
+
+  def _raise_read_error(self) -> None:
+    """Raises the read error and drops the elements requested after it."""
+    error, self._read_error = self._read_error, None
+    for future, _, _ in self._buffer:
+      future.cancel()
+    # The next call reads the failing index again, as without prefetching.
+    self._buffer = None
+    raise error
+
+  def _fill_buffer(self) -> None:
+    """Requests chunks of up to `prefetch_buffer_size` elements ahead."""
+    read_chunk = self._map_parent.__getitems__
+    prefetch_buffer_size = self._prefetch_buffer_size
+    if self._autotuner is not None:
+      read_chunk = self._autotuner.wrap(read_chunk)
+      prefetch_buffer_size = self._autotuner.num_chunks_ahead * self._chunk_size
+    limit = self._next_index + len(self._chunk) + prefetch_buffer_size
+    while self._next_buffered_index < self._dataset_length:
+      start = self._next_buffered_index
+      stop = min(start + self._chunk_size, self._dataset_length)
+      if stop > limit and self._buffer:
+        break
+      nbytes = 0
+      if self._memory_budget is not None and self._buffer:
+        if self._element_nbytes is None:
+          # Read one chunk to learn the element size first.
+          break
+        nbytes = int(self._element_nbytes * (stop - start))
+        if not self._memory_budget.try_acquire(nbytes):
+          break
+      indices = list(range(start, stop))
+      self._buffer.append(
+          (self._executor.submit(read_chunk, indices), indices, nbytes)
+      )
+      self._next_buffered_index = stop
+
   def get_state(self):
     return {"next_index": self._next_index}
 
+  def _seek_in_buffer(self, next_index: int) -> bool:
+    """Drops the requested elements preceding `next_index`.
+
+    Seeking forward, e.g. to skip consumed elements on restore, keeps the
+    elements already requested from `next_index` on.
+
+    Args:
+      next_index: Index of the next element to return.
+
+    Returns:
+      Whether `next_index` was requested and the buffer was kept.
+    """
+    if (
+        self._buffer is None
+        or self._read_error is not None
+        or not self._next_index <= next_index < self._next_buffered_index
+    ):
+      return False
+    num_to_drop = next_index - self._next_index
+    if num_to_drop >= len(self._chunk):
+      num_to_drop -= len(self._chunk)
+      while num_to_drop >= len(self._buffer[0][1]):
+        future, indices, nbytes = self._buffer.popleft()
+        future.cancel()
+        if self._memory_budget is not None:
+          self._memory_budget.release(nbytes)
+        num_to_drop -= len(indices)
+      self._chunk = collections.deque(self._next_chunk())
+      if num_to_drop > len(self._chunk):
+        # Reading an element preceding `next_index` failed.
+        self._read_error = None
+        return False
+    for _ in range(num_to_drop):
+      self._chunk.popleft()
+    self._fill_buffer()
+    return True
+
   def set_state(self, state):
     with self._lock:
-      self._next_index = state["next_index"]
-      if self._next_index < 0 or self._next_index > self._dataset_length:
+      next_index = state["next_index"]
+      if next_index < 0 or next_index > self._dataset_length:
         raise IndexError(
-            f"Checkpoint `next_index` {self._next_index} is out of range for"
+            f"Checkpoint `next_index` {next_index} is out of range for"
             f" dataset of length {self._dataset_length}."
         )
-      if self._prefetch_buffer_size > 0:
+      if self._prefetch_buffer_size > 0 and not self._seek_in_buffer(
+          next_index
+      ):
         self._buffer = None
+        self._chunk = collections.deque()
+        self._read_error = None
+      self._next_index = next_index
 
   def __str__(self) -> str:
     return (
@@ -199,13 +347,6 @@ class PrefetchDatasetIterator(dataset.DatasetIterator[T]):
     )
 
 
-def _iterator_with_context(
-    iterator: contextlib.AbstractContextManager[Iterator[T]],
-) -> Iterator[T]:
-  with iterator as it:
-    yield from it
-
-
 class MultiprocessPrefetchIterDataset(dataset.IterDataset[T]):
   """Uses a pool of processes to prefetch elements ahead of time.
 
@@ -258,8 +399,10 @@ _WORKERS_STATE = "workers_state"
 _ITERATIONS_TO_SKIP = "iterations_to_skip"
 _LAST_WORKER_INDEX = "last_worker_index"
 
-# Minimal interval (in seconds) between consecutive state recordings in worker
-# processes of `MultiprocessPrefetchDatasetIterator`. We record the state
+# Default time (in seconds) a worker process of
+# `MultiprocessPrefetchDatasetIterator` spends computing elements between
+# consecutive state recordings, see
+# `MultiprocessingOptions.record_state_interval_s`. We record the state
 # periodically to reduce the overhead of sending the state from workers.
 # Note that this is also an approximate upper bound on how long it is going to
 # take to recover from a checkpointed state. Larger values will decrease the
@@ -267,9 +410,216 @@ _LAST_WORKER_INDEX = "last_worker_index"
 # checkpoint longer on average.
 _RECORD_STATE_INTERVAL_S = 3
 
+# Keys in the states of `PrefetchDatasetIterator` and of the iterators `map`
+# applies to it, which are the worker states `_reshard_state` can convert.
+_NEXT_INDEX = "next_index"
+_PARENT = "parent"
+_INDEX_FOR_RNG = "index_for_rng"
+
+# `MapDataset`s that never produce Nones and transformations that only produce
+# Nones for indices their parents produce Nones for. Other `MapDataset`s, such
+# as `filter`, may be sparse.
+_DENSE_MAP_DATASETS = (source.RangeMapDataset, source.SourceMapDataset)
+_DENSITY_PRESERVING_MAP_DATASETS = (
+    dataset._WithSeedMapDataset,  # pylint: disable=protected-access
+    repeat.RepeatMapDataset,
+    shuffle.ShuffleMapDataset,
+    slice_dataset.SliceMapDataset,
+)
+
+
+def _get_prefetch_dataset(
+    ds: dataset.IterDataset,
+) -> PrefetchIterDataset | None:
+  """Returns the `to_iter_dataset()` result `ds` applies `map`s to, if any."""
+  while isinstance(ds, map_dataset.MapIterDataset):
+    ds = ds.parents[0]
+  return ds if isinstance(ds, PrefetchIterDataset) else None
+
+
+def _is_dense(ds: dataset.MapDataset) -> bool:
+  """Returns whether `ds` is known to never produce Nones."""
+  if isinstance(ds, _DENSE_MAP_DATASETS):
+    return True
+  if isinstance(ds, _DENSITY_PRESERVING_MAP_DATASETS):
+    return all(_is_dense(parent) for parent in ds.parents)
+  return False
+
+
+def _has_positional_state(ds: dataset.IterDataset) -> bool:
+  """Returns whether worker states of `ds` only depend on their position.
+
+  The state of such a worker is the number of indices of its `MapDataset`
+  slice it consumed and can be converted by `_reshard_state`.
+
+  Args:
+    ds: Parent dataset of `MultiprocessPrefetchIterDataset`.
+  """
+  return _get_prefetch_dataset(ds) is not None
+
+
+def _produces_all_positions(ds: dataset.IterDataset) -> bool:
+  """Returns whether `ds` has positional states and yields every position.
+
+  `PrefetchDatasetIterator` drops the Nones of sparse `MapDataset`s, e.g.
+  produced by `filter`, unless `allow_nones` is set. Otherwise the number of
+  elements a worker yields equals the number of positions it consumed, so
+  elements can be skipped by seeking.
+
+  Args:
+    ds: Parent dataset of `MultiprocessPrefetchIterDataset`.
+  """
+  prefetch_ds = _get_prefetch_dataset(ds)
+  return prefetch_ds is not None and (
+      prefetch_ds._allow_nones or _is_dense(prefetch_ds.parents[0])  # pylint: disable=protected-access
+  )
+
+
+def _get_next_index(worker_state: Any) -> int | None:
+  """Returns the number of elements produced by a worker's iterator.
+
+  Args:
+    worker_state: State of the iterator of a worker.
+
+  Returns:
+    The number of produced elements if `worker_state` is a state of
+    `PrefetchDatasetIterator`, possibly wrapped in states of iterators of `map`
+    transformations, and None otherwise.
+  """
+  if not isinstance(worker_state, dict):
+    return None
+  if worker_state.keys() == {_NEXT_INDEX}:
+    return worker_state[_NEXT_INDEX]
+  if worker_state.keys() == {_PARENT, _INDEX_FOR_RNG}:
+    next_index = _get_next_index(worker_state[_PARENT])
+    if next_index == worker_state[_INDEX_FOR_RNG]:
+      return next_index
+  return None
+
+
+def _with_next_index(worker_state: Any, next_index: int) -> Any:
+  """Returns `worker_state` positioned after `next_index` elements."""
+  if _NEXT_INDEX in worker_state:
+    return {_NEXT_INDEX: next_index}
+  return {
+      _PARENT: _with_next_index(worker_state[_PARENT], next_index),
+      _INDEX_FOR_RNG: next_index,
+  }
+
+
+def _reshard_state(
+    state: dict[str, Any],
+    num_workers: int,
+    *,
+    produces_all_positions: bool,
+) -> dict[str, Any]:
+  """Converts a `MultiprocessPrefetchDatasetIterator` state to `num_workers`.
+
+  Worker `i` out of `n` iterates over the elements `i, i + n, i + 2n, ...` of
+  the parent and the workers' elements are consumed in round-robin order.
+  If the parent is a `MapDataset` converted with `to_iter_dataset()`,
+  possibly followed by `map` transformations, the state of a worker is the
+  number of elements it produced and the elements consumed from all workers
+  are the first `P` elements of the parent. Worker `i` out of `num_workers`
+  then continues at element `P` of the parent if `P % num_workers == i` or
+  else the next element it's responsible for. Neither elements recorded in
+  worker states nor the `iterations_to_skip` after them are read again.
+
+  If the parent drops Nones, e.g. after `filter`, the positions of the
+  `iterations_to_skip` elements are unknown and the state is only converted if
+  no elements were consumed after the recorded worker states.
+
+  Args:
+    state: State saved with a different number of workers.
+    num_workers: The new number of workers.
+    produces_all_positions: Whether the parent yields an element for every
+      position, see `_produces_all_positions`.
+
+  Returns:
+    The state for `num_workers` workers.
+
+  Raises:
+    ValueError: If the state can't be converted.
+  """
+  workers_state = state[_WORKERS_STATE]
+  old_num_workers = len(workers_state)
+  if not produces_all_positions and any(state[_ITERATIONS_TO_SKIP].values()):
+    raise ValueError(
+        "Cannot restore the checkpoint with a different number of workers: the"
+        " parent dataset may drop elements, e.g. with `filter`, so the"
+        " positions of the elements consumed after the recorded worker states"
+        f" {state[_ITERATIONS_TO_SKIP]} are unknown. Save the checkpoint with"
+        " `MultiprocessingOptions.record_state_interval_s=0` to record the"
+        " state with every element."
+    )
+  num_consumed = []
+  for i in range(old_num_workers):
+    next_index = _get_next_index(workers_state[str(i)])
+    if next_index is None:
+      raise ValueError(
+          "Cannot restore the checkpoint with a different number of workers:"
+          f" unexpected worker state {workers_state[str(i)]}."
+      )
+    num_consumed.append(next_index + state[_ITERATIONS_TO_SKIP][str(i)])
+  total_consumed = sum(num_consumed)
+  # Worker `i` is responsible for `ceil((P - i) / n)` of the first `P`
+  # elements.
+  if any(
+      consumed != -(-(total_consumed - i) // old_num_workers)
+      for i, consumed in enumerate(num_consumed)
+  ):
+    raise ValueError(
+        "Cannot restore the checkpoint with a different number of workers:"
+        " the workers were not read in round-robin order. Got"
+        f" {num_consumed} elements consumed from each worker."
+    )
+  template = workers_state["0"]
+  return {
+      _WORKERS_STATE: {
+          str(i): _with_next_index(
+              template, -(-(total_consumed - i) // num_workers)
+          )
+          for i in range(num_workers)
+      },
+      _ITERATIONS_TO_SKIP: {str(i): 0 for i in range(num_workers)},
+      _LAST_WORKER_INDEX: (total_consumed - 1) % num_workers,
+  }
+
+
+def _skip_elements(
+    it: dataset.DatasetIterator,
+    worker_state: Any,
+    num_elements: int,
+    *,
+    seekable: bool,
+) -> None:
+  """Advances `it`, which was set to `worker_state`, by `num_elements`.
+
+  Args:
+    it: Iterator of a worker.
+    worker_state: The current state of `it`.
+    num_elements: Number of elements to skip.
+    seekable: Whether the worker's dataset yields an element for every
+      position, see `_produces_all_positions`. The elements are then skipped
+      by setting the state after them instead of computing and discarding
+      them.
+  """
+  if seekable and num_elements:
+    next_index = _get_next_index(worker_state)
+    if next_index is not None:
+      it.set_state(_with_next_index(worker_state, next_index + num_elements))
+      return
+  for _ in range(num_elements):
+    _ = next(it)
+
 
 def _copy_leaf_to_shm(leaf: Any) -> Any:
   """Copies `leaf` to shared memory if it's a numpy array."""
+  if isinstance(leaf, shared_memory_array.SharedMemoryArray):
+    # The array may have been allocated in shared memory already.
+    metadata = leaf.export_metadata()
+    if metadata is not None:
+      return metadata
   if (
       not isinstance(leaf, np.ndarray)
       or leaf.dtype.hasobject
@@ -289,6 +639,15 @@ def _copy_struct_to_shm(struct: Any) -> Any:
   return tree.map_structure(_copy_leaf_to_shm, struct)
 
 
+def _get_num_bytes(struct: Any) -> int:
+  """Returns the total size of leaf ndarrays of the structure."""
+  return sum(
+      leaf.nbytes
+      for leaf in tree.flatten(struct)
+      if isinstance(leaf, np.ndarray)
+  )
+
+
 def _open_leaf_from_shm(leaf: Any) -> Any:
   """Recovers `leaf` from shared memory if it's a numpy array metadata."""
   if isinstance(leaf, shared_memory_array.SharedMemoryArrayMetadata):
@@ -329,6 +688,23 @@ def _set_slice(ds: dataset.IterDataset, sl: slice) -> None:
       _set_slice(parent, sl)
 
 
+class _ShallowDatasetPickler(cloudpickle.Pickler):
+  """Pickles a dataset replacing the datasets it refers to by their ids."""
+
+  def __init__(
+      self, file: io.BytesIO, ds: dataset.IterDataset | dataset.MapDataset
+  ):
+    super().__init__(file)
+    self._ds = ds
+
+  def persistent_id(self, obj: Any) -> int | None:
+    if obj is not self._ds and isinstance(
+        obj, (dataset.IterDataset, dataset.MapDataset)
+    ):
+      return id(obj)
+    return None
+
+
 def _check_picklable(
     ds: dataset.IterDataset | dataset.MapDataset,
 ):
@@ -337,11 +713,8 @@ def _check_picklable(
   Args:
     ds: IterDataset or MapDataset to check whether it is picklable.
 
-  NOTE: This function's time complexity is O(n^2) where n is the number of
-  Grain dataset operations because `cloudpickle.dumps(ds)` will trigger
-  pickling into all the datasets. If this naive O(n^2) algorithm takes too
-  much time, we could consider doing copying `ds`, delete its parents and then
-  do `cloudpickle.dumps(new_ds)` to reduce the time complexity to O(n).
+  Each dataset is pickled without its parents, which are checked separately,
+  so the time complexity is O(n) in the number of Grain dataset operations.
   """
 
   # Traverses the graph in post-order to find the first unpickle-able subtree
@@ -349,7 +722,7 @@ def _check_picklable(
     _check_picklable(parent)
 
   try:
-    cloudpickle.dumps(ds)
+    _ShallowDatasetPickler(io.BytesIO(), ds).dump(ds)
   except Exception as e:  # pylint: disable=broad-exception-caught
     if sys.version_info >= (3, 11):
       e.add_note(
@@ -366,38 +739,91 @@ class GetElementProducerFn(grain_pool.GetElementProducerFn, Generic[T]):
   """
 
   def __init__(
-      self, state: dict[str, dict[str, Any] | int], ds: dataset.IterDataset[T]
+      self,
+      state: dict[str, dict[str, Any] | int],
+      ds: dataset.IterDataset[T],
+      record_state_interval_s: float | None = None,
+      dataset_options: dataset.DatasetOptions | None = None,
   ):
     self._state = state
     self._ds = ds
+    if record_state_interval_s is None:
+      record_state_interval_s = _RECORD_STATE_INTERVAL_S
+    self._record_state_interval_s = record_state_interval_s
+    # Options set after `mp_prefetch` in the main process, they also apply to
+    # the transformations executed in the workers.
+    self._dataset_options = dataset_options
 
   def __call__(
       self, *, worker_index: int, worker_count: int
-  ) -> Iterator[tuple[T, Optional[dict[str, Any]]]]:
+  ) -> Iterator[
+      tuple[
+          T,
+          Optional[dict[str, Any]],
+          Optional[dataset_stats.ExecutionSummary],
+      ]
+  ]:
     # Recover from the last recorded state for the given worker.
     worker_state = self._state[_WORKERS_STATE][str(worker_index)]
     if worker_count > 1:
       _set_slice(self._ds, slice(worker_index, None, worker_count))
-    it = iter(self._ds)
+    ds = self._ds
+    if self._dataset_options is not None:
+      ds = dataset.WithOptionsIterDataset(ds, self._dataset_options)
+    it = iter(ds)
     it.set_state(worker_state)  # pytype: disable=attribute-error
     # Skip the required number of iterations after the last recorded state.
-    for _ in range(self._state[_ITERATIONS_TO_SKIP][str(worker_index)]):
-      _ = next(it)
-    last_recorded_state_time = time.time()
-    for element in it:
-      now = time.time()
+    _skip_elements(
+        it,
+        worker_state,
+        self._state[_ITERATIONS_TO_SKIP][str(worker_index)],
+        seekable=_produces_all_positions(self._ds),
+    )
+    # The execution summary of the worker's pipeline is sent with the first
+    # element and together with the recorded states. The main process merges
+    # it into the summary of the whole pipeline.
+    # pylint: disable=protected-access
+    tracks_execution = (
+        it._options_with_default.execution_tracking_mode  # pytype: disable=attribute-error
+        == dataset_stats.ExecutionTrackingMode.STAGE_TIMING
+    )
+    if tracks_execution:
+      # The worker's pipeline is a part of the pipeline in the main process,
+      # which reports and logs the statistics.
+      it._stats._is_output = False  # pytype: disable=attribute-error
+    # pylint: enable=protected-access
+    num_produced_bytes = 0
+    send_execution_summary = tracks_execution
+    # Time spent computing the elements produced since the last recorded
+    # state, which is the work a restore from that state replays.
+    compute_time_since_recorded_state = 0.0
+    while True:
+      start_time = time.perf_counter()
+      try:
+        element = next(it)
+      except StopIteration:
+        return
+      compute_time_since_recorded_state += time.perf_counter() - start_time
+      if tracks_execution:
+        num_produced_bytes += _get_num_bytes(element)
       element = _copy_struct_to_shm(element)
-      if now - last_recorded_state_time >= _RECORD_STATE_INTERVAL_S:
-        last_recorded_state_time = now
-        yield (element, it.get_state())  # pytype: disable=attribute-error
-      else:
-        yield (element, None)
+      state = None
+      if compute_time_since_recorded_state >= self._record_state_interval_s:
+        compute_time_since_recorded_state = 0.0
+        state = it.get_state()  # pytype: disable=attribute-error
+        send_execution_summary = tracks_execution
+      execution_summary = None
+      if send_execution_summary:
+        send_execution_summary = False
+        execution_summary = it._stats.get_execution_summary()  # pylint: disable=protected-access  # pytype: disable=attribute-error
+        execution_summary.nodes[0].num_produced_bytes = num_produced_bytes
+      yield (element, state, execution_summary)
 
   def serialize(self) -> bytes:
     """Overrides the default implementation to generate better error messages."""
 
     try:
-      return cloudpickle.dumps(self)
+      return grain_pool.dumps_with_shared_arrays(self)
     except Exception as e:  # pylint: disable=broad-except
       # Calls `_check_picklable` to generate useful pickle errors
       #
@@ -424,10 +850,8 @@ class MultiprocessPrefetchDatasetIterator(dataset.DatasetIterator[T]):
     super().__init__()
     self._iter_parent = parent
     self._multiprocessing_options = multiprocessing_options
-    # The underlying iterator producing elements and workers state.
-    self._iterator = None
-    # Raw reference to the underlying iterator that can be used to determine the
-    # last worker index.
+    # The underlying iterator producing elements and workers state. It stops
+    # the worker processes at the end of iteration or once deleted.
     self._raw_iterator = None
     # Create initial state. We record state of each worker periodically together
     # with the number of iterations without the recorded state and index of the
@@ -451,9 +875,11 @@ class MultiprocessPrefetchDatasetIterator(dataset.DatasetIterator[T]):
 
   def __next__(self) -> T:
     self._ensure_iterator_initialized()
-    result, state = next(self._iterator)
+    result, state, execution_summary = next(self._raw_iterator)
     with self._stats.record_self_time():
       worker_index = self._raw_iterator.get_last_worker_index()  # pytype: disable=attribute-error
+      if execution_summary is not None:
+        self._stats.record_worker_summary(worker_index, execution_summary)
 
       # pytype: disable=annotation-type-mismatch
       iterations_to_skip: dict[str, Any] = self._state[_ITERATIONS_TO_SKIP]
@@ -478,31 +904,74 @@ class MultiprocessPrefetchDatasetIterator(dataset.DatasetIterator[T]):
     self._ensure_iterator_initialized()
 
   def set_state(self, state: dict[str, dict[str, Any] | int]) -> None:
+    """Sets the state, converting states saved with a different `num_workers`.
+
+    See `_reshard_state` for the pipelines whose states can be converted.
+
+    Args:
+      state: State returned by `get_state`.
+    """
+    num_workers = self._multiprocessing_options.num_workers
+    if len(state[_WORKERS_STATE]) != num_workers:  # pytype: disable=wrong-arg-types
+      if not _has_positional_state(self._iter_parent):
+        raise ValueError(
+            "Cannot restore the checkpoint with a different number of workers:"
+            " only states of `MapDataset.to_iter_dataset()`, optionally"
+            " followed by `map` transformations, can be converted. Got parent"
+            f" dataset {self._iter_parent}."
+        )
+      state = _reshard_state(
+          state,
+          num_workers,
+          produces_all_positions=_produces_all_positions(self._iter_parent),
+      )
     self._state = state
-    self._raw_iterator = None
-    self._iterator = None
+    if self._raw_iterator is not None:
+      # Reuse the running worker processes.
+      self._raw_iterator.reset(
+          GetElementProducerFn(
+              self._state,
+              self._iter_parent,
+              self._multiprocessing_options.record_state_interval_s,
+              self._options,
+          ),
+          self._worker_index_to_start_reading(),
+      )
 
   def get_state(self) -> dict[str, Any]:
-    return copy.deepcopy(self._state)
+    # Worker states are replaced rather than modified when newer ones arrive,
+    # so copying the dicts holding them is enough for a snapshot. This keeps
+    # `get_state` cheap with many workers and deep pipelines.
+    return {
+        _WORKERS_STATE: dict(self._state[_WORKERS_STATE]),  # pytype: disable=wrong-arg-types
+        _ITERATIONS_TO_SKIP: dict(self._state[_ITERATIONS_TO_SKIP]),  # pytype: disable=wrong-arg-types
+        _LAST_WORKER_INDEX: self._state[_LAST_WORKER_INDEX],
+    }
+
+  def _worker_index_to_start_reading(self) -> int:
+    return (
+        self._state[_LAST_WORKER_INDEX] + 1
+    ) % self._multiprocessing_options.num_workers
 
   def _ensure_iterator_initialized(self) -> None:
-    if self._iterator is None:
+    if self._raw_iterator is None:
       self._raw_iterator = self._create_iterator_context()
       self._raw_iterator.start_prefetch()
-      self._iterator = _iterator_with_context(self._raw_iterator)
 
   def _create_iterator_context(self) -> grain_pool.MultiProcessIterator[T]:
     """Creates a `MultiProcessIterator`."""
 
     get_element_producer_fn = GetElementProducerFn(
-        self._state, self._iter_parent
+        self._state,
+        self._iter_parent,
+        self._multiprocessing_options.record_state_interval_s,
+        self._options,
     )
 
     return grain_pool.MultiProcessIterator(
         get_element_producer_fn,
         self._multiprocessing_options,
-        (self._state[_LAST_WORKER_INDEX] + 1)
-        % self._multiprocessing_options.num_workers,
+        self._worker_index_to_start_reading(),
     )
 
   def __str__(self) -> str:
@@ -584,7 +1053,10 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
     # Whether this iterator is closed, meaning it should no longer be used.
     self._closed = False
     self._producer_running: threading.Event = None
-    self._buffer: queue.Queue[tuple[T, StateT, Exception | None]] = None
+    # Holds elements with their state, error and size in bytes counted against
+    # the memory budget.
+    self._buffer: queue.Queue[tuple[T, StateT, Exception | None, int]] = None
+    self._memory_budget: memory_budget.MemoryBudget | None = None
 
   def _start_producer(self, initial_state: None):
     """Starts the producer.
@@ -613,20 +1085,25 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
     self._producer_running = threading.Event()
     self._producer_running.set()
     self._buffer = queue.Queue(maxsize=self._prefetch_buffer_size)
+    self._memory_budget = memory_budget.MemoryBudget(
+        "thread_prefetch", self._options_with_default.max_buffered_bytes
+    )
     self._work_queue.put(
         functools.partial(
             self._producer,
             initial_state=initial_state,
             output_buffer=self._buffer,
             running=self._producer_running,
+            budget=self._memory_budget,
         )
     )
 
   def _producer(
       self,
       initial_state,
-      output_buffer: queue.Queue[tuple[T, StateT, Exception | None]],
+      output_buffer: queue.Queue[tuple[T, StateT, Exception | None, int]],
       running: threading.Event,
+      budget: memory_budget.MemoryBudget,
   ) -> None:
     """Functor that fills the queue to its capacity.
 
@@ -636,6 +1113,7 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
       initial_state: state to initialize the itertor to.
       output_buffer: queue to fill.
       running: an sync event for whether the thread should run.
+      budget: memory budget for the elements in the queue.
     """
     try:
       if initial_state is not None:
@@ -645,22 +1123,29 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
         # will be discarded. This avoids having to call a potentially expensive
         # and unused get_state() on the main thread.
         output_buffer.put(
-            (_INITIAL_STATE_SENTINEL, self._parent.get_state(), None)
+            (_INITIAL_STATE_SENTINEL, self._parent.get_state(), None, 0)
         )
       # Check if the producer thread should be running every time an item is
       # retrieved from the queue.
       while running.is_set():
         while True:
           element, state = next(self._parent), self._parent.get_state()
-          output_buffer.put((element, state, None))
+          nbytes = 0
+          if budget.max_bytes is not None:
+            nbytes = autotune.element_nbytes(element)
+            if not budget.acquire(nbytes, lambda: not running.is_set()):
+              return
+          output_buffer.put((element, state, None, nbytes))
           break
     except Exception as e:  # pylint: disable=broad-except
-      output_buffer.put((None, None, e))
+      output_buffer.put((None, None, e, 0))
 
   def __next__(self):
     self.start_prefetch()
     assert self._buffer is not None
-    element, state, err = self._buffer.get()
+    element, state, err, nbytes = self._buffer.get()
+    if nbytes:
+      self._memory_budget.release(nbytes)
 
     if err is not None:
       raise err
@@ -714,6 +1199,7 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
         buffer.get_nowait()
       except queue.Empty:
         break
+    self._memory_budget.close()
     self._producer_running = None
     self._buffer = None
 
@@ -725,7 +1211,7 @@ class _ThreadPrefetchDatasetIterator(dataset.DatasetIterator[T]):
       # the delegate iterator.
       buffer = self._buffer
       assert buffer is not None  # PyType.
-      val, state, err = buffer.get()
+      val, state, err, _ = buffer.get()
       if err is not None:
         raise err
       assert val is _INITIAL_STATE_SENTINEL
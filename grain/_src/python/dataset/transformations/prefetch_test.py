@@ -11,7 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import copy
 import dataclasses
+import functools
 import sys
 import time
 from typing import TypeVar, cast
@@ -22,11 +24,14 @@ from absl.testing import absltest
 from absl.testing import parameterized
 from grain._src.core import transforms
 import multiprocessing as mp
+from grain._src.python import grain_pool
 from grain._src.python import options
 from grain._src.python.dataset import dataset
+from grain._src.python.dataset import stats
 from grain._src.python.dataset.transformations import filter as filter_lazy_dataset
 from grain._src.python.dataset.transformations import map as map_lazy_dataset
 from grain._src.python.dataset.transformations import prefetch
+import numpy as np
 
 
 _T = TypeVar('_T')
@@ -46,6 +51,12 @@ class FilterAllElements(transforms.FilterTransform):
     return False
 
 
+def _double_after(x: int, first_computed_element: int) -> int:
+  if x < first_computed_element:
+    raise ValueError(f'Element {x} must not be computed.')
+  return 2 * x
+
+
 class RepeatedIntSourceIterDataset(dataset.IterDataset[int]):
 
   def __iter__(self) -> dataset.DatasetIterator[int]:
@@ -144,6 +155,100 @@ class PrefetchIterDatasetTest(parameterized.TestCase):
     _ = [next(ds_iter) for _ in range(5)]
     self.assertEmpty(ds_iter._buffer)  # iterated through all elements
 
+  def test_prefetch_reads_chunks_of_indices(self):
+    ds = dataset.MapDataset.range(100)
+    read_options = options.ReadOptions(num_threads=2, prefetch_buffer_size=40)
+    with mock.patch.object(
+        ds, '__getitems__', wraps=ds.__getitems__
+    ) as getitems:
+      ds_iter = prefetch.PrefetchDatasetIterator(
+          ds, read_options, allow_nones=False
+      )
+      self.assertEqual(list(ds_iter), list(range(100)))
+    requested = [call.args[0] for call in getitems.call_args_list]
+    self.assertEqual(sorted(sum(requested, [])), list(range(100)))
+    self.assertTrue(all(len(indices) == 10 for indices in requested))
+
+  def test_prefetch_raises_read_error_at_failing_index(self):
+
+    def fail_at_15(x):
+      if x == 15:
+        raise ValueError('Failed to read element 15.')
+      return x
+
+    ds = dataset.MapDataset.range(30).map(fail_at_15)
+    read_options = options.ReadOptions(num_threads=2, prefetch_buffer_size=40)
+    ds_iter = prefetch.PrefetchDatasetIterator(
+        ds, read_options, allow_nones=False
+    )
+    # Elements 10-19 are read in the same chunk.
+    self.assertEqual([next(ds_iter) for _ in range(15)], list(range(15)))
+    with self.assertRaisesRegex(ValueError, 'Failed to read element 15.'):
+      next(ds_iter)
+    self.assertEqual(ds_iter.get_state(), {'next_index': 15})
+    with self.assertRaisesRegex(ValueError, 'Failed to read element 15.'):
+      next(ds_iter)
+    ds_iter.set_state({'next_index': 16})
+    self.assertEqual(list(ds_iter), list(range(16, 30)))
+
+  def test_prefetch_seeks_forward_within_buffer(self):
+    read_indices = []
+
+    def record_index(x):
+      read_indices.append(x)
+      return x
+
+    ds = dataset.MapDataset.range(100).map(record_index)
+    read_options = options.ReadOptions(num_threads=2, prefetch_buffer_size=40)
+    ds_iter = prefetch.PrefetchDatasetIterator(
+        ds, read_options, allow_nones=False
+    )
+    self.assertEqual(next(ds_iter), 0)
+    # Within the current chunk, within the requested chunks and beyond them.
+    for next_index in [3, 27, 90]:
+      ds_iter.set_state({'next_index': next_index})
+      self.assertEqual(next(ds_iter), next_index)
+    self.assertEqual(list(ds_iter), list(range(91, 100)))
+    # Seeking within the buffer doesn't read elements again.
+    self.assertLen(read_indices, len(set(read_indices)))
+    ds_iter.set_state({'next_index': 50})
+    self.assertEqual(list(ds_iter), list(range(50, 100)))
+
+  def test_prefetch_with_autotune(self):
+    ds = dataset.MapDataset.range(1000).map(lambda x: np.full(16, x))
+    read_options = options.ReadOptions(
+        num_threads=2, prefetch_buffer_size=8, autotune=True
+    )
+    ds_iter = prefetch.PrefetchDatasetIterator(
+        ds, read_options, allow_nones=False
+    )
+    self.assertIsNotNone(ds_iter._autotuner)
+    checkpoint = None
+    for i in range(1000):
+      if i == 500:
+        checkpoint = ds_iter.get_state()
+      np.testing.assert_array_equal(next(ds_iter), np.full(16, i))
+    ds_iter.set_state(checkpoint)
+    np.testing.assert_array_equal(next(ds_iter), np.full(16, 500))
+
+  def test_prefetch_limits_buffered_bytes(self):
+    ds = dataset.MapDataset.range(200).map(
+        lambda x: np.full(1000, x, dtype=np.uint8)
+    )
+    ds = prefetch.PrefetchIterDataset(
+        ds,
+        read_options=options.ReadOptions(num_threads=2, prefetch_buffer_size=100),
+    )
+    ds = dataset.WithOptionsIterDataset(
+        ds, dataset.DatasetOptions(max_buffered_bytes=10_000)
+    )
+    ds_iter = ds.__iter__()
+    actual = [int(next(ds_iter)[0]) for _ in range(60)]
+    # Chunks of 25 elements take 25 KB, so only a single chunk is read ahead.
+    self.assertLessEqual(len(ds_iter._buffer), 1)
+    actual.extend(int(x[0]) for x in ds_iter)
+    self.assertEqual(actual, list(range(200)))
+
   def test_checkpoint(self):
     ds_iter = iter(self.prefetch_lazy_iter_ds)
 
@@ -183,7 +288,8 @@ class PrefetchIterDatasetTest(parameterized.TestCase):
         logs,
         r'Transformation'
         r' PrefetchDatasetIterator\(read_options=ReadOptions\(num_threads=16,'
-        r' prefetch_buffer_size=500\), allow_nones=False\)'
+        r' prefetch_buffer_size=500, autotune=False,'
+        r' autotune_memory_budget=1073741824\), allow_nones=False\)'
         r' skipped 100.00 \% of the last seen 1000 elements.',
     )
 
@@ -199,7 +305,8 @@ class PrefetchIterDatasetTest(parameterized.TestCase):
         ValueError,
         r'Transformation'
         r' PrefetchDatasetIterator\(read_options=ReadOptions\(num_threads=16,'
-        r' prefetch_buffer_size=500\), allow_nones=False\)'
+        r' prefetch_buffer_size=500, autotune=False,'
+        r' autotune_memory_budget=1073741824\), allow_nones=False\)'
         r' skipped 100.00 \% of the last seen 1000 elements.',
     ):
       _ = list(ds)
@@ -215,6 +322,16 @@ class PrefetchIterDatasetTest(parameterized.TestCase):
     self.assertEqual(list(ds), [None] * 1000)
 
 
+class _PickleCounter:
+  """Counts how many times instances of the class are pickled."""
+
+  count = 0
+
+  def __reduce__(self):
+    _PickleCounter.count += 1
+    return _PickleCounter, ()
+
+
 class MultiprocessPrefetchIterDatasetTest(parameterized.TestCase):
 
   def setUp(self):
@@ -306,6 +423,231 @@ class MultiprocessPrefetchIterDatasetTest(parameterized.TestCase):
           value = next(ds_iter)
           self.assertEqual(value, values_without_interruption[i])
 
+  def test_checkpoint_non_deterministic(self):
+    ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(60).to_iter_dataset(),
+        options.MultiprocessingOptions(num_workers=3, deterministic=False),
+    )
+    ds_iter = iter(ds)
+    values = [next(ds_iter) for _ in range(20)]
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    remaining_values = list(ds_iter)
+    self.assertCountEqual(values + remaining_values, range(60))
+    ds_iter.set_state(state)  # pytype: disable=attribute-error
+    # The order of elements can differ but the restored iterator produces
+    # exactly the remaining elements.
+    self.assertCountEqual(list(ds_iter), remaining_values)
+
+  @parameterized.product(
+      num_workers_and_restored_num_workers=[(2, 3), (3, 1), (1, 4), (4, 2)],
+      record_state_interval=[prefetch._RECORD_STATE_INTERVAL_S, 0],
+  )
+  def test_restores_with_different_num_workers(
+      self,
+      num_workers_and_restored_num_workers: tuple[int, int],
+      record_state_interval: int,
+  ):
+    num_workers, restored_num_workers = num_workers_and_restored_num_workers
+    ds = dataset.MapDataset.range(30).to_iter_dataset().map(lambda x: 2 * x)
+    with mock.patch.object(
+        prefetch, '_RECORD_STATE_INTERVAL_S', record_state_interval
+    ):
+      ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+          ds, options.MultiprocessingOptions(num_workers)
+      ).__iter__()
+      values = [next(ds_iter) for _ in range(7)]
+      state = ds_iter.get_state()
+      restored_iter = prefetch.MultiprocessPrefetchIterDataset(
+          ds, options.MultiprocessingOptions(restored_num_workers)
+      ).__iter__()
+      restored_iter.set_state(state)
+      values.extend(restored_iter)
+    self.assertEqual(values, [2 * x for x in range(30)])
+
+  def test_restores_filtered_parent_with_different_num_workers(self):
+    ds = dataset.MapDataset.range(40).filter(lambda x: x % 3 == 0)
+    ds = ds.to_iter_dataset()
+    ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+        ds, options.MultiprocessingOptions(1, record_state_interval_s=0)
+    ).__iter__()
+    values = [next(ds_iter) for _ in range(4)]
+    state = ds_iter.get_state()
+    restored_iter = prefetch.MultiprocessPrefetchIterDataset(
+        ds, options.MultiprocessingOptions(2)
+    ).__iter__()
+    restored_iter.set_state(state)
+    values.extend(restored_iter)
+    self.assertEqual(values, list(range(0, 40, 3)))
+
+  def test_restore_filtered_parent_with_different_num_workers_fails(self):
+    ds = dataset.MapDataset.range(40).filter(lambda x: x % 3 == 0)
+    ds = ds.to_iter_dataset()
+    ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+        ds, options.MultiprocessingOptions(1, record_state_interval_s=1e9)
+    ).__iter__()
+    _ = [next(ds_iter) for _ in range(4)]
+    state = ds_iter.get_state()
+    self.assertEqual(state['iterations_to_skip'], {'0': 4})
+    restored_iter = prefetch.MultiprocessPrefetchIterDataset(
+        ds, options.MultiprocessingOptions(2)
+    ).__iter__()
+    with self.assertRaisesRegex(ValueError, 'may drop elements'):
+      restored_iter.set_state(state)
+
+  def test_restore_with_different_num_workers_fails(self):
+    ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+        self.iter_ds, options.MultiprocessingOptions(num_workers=2)
+    ).__iter__()
+    next(ds_iter)
+    state = ds_iter.get_state()
+    restored_iter = prefetch.MultiprocessPrefetchIterDataset(
+        self.iter_ds, options.MultiprocessingOptions(num_workers=3)
+    ).__iter__()
+    with self.assertRaisesRegex(ValueError, 'only states of'):
+      restored_iter.set_state(state)
+
+  @parameterized.parameters(0, 1e9)
+  def test_record_state_interval(self, record_state_interval_s: float):
+    ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(20).to_iter_dataset(),
+        options.MultiprocessingOptions(
+            num_workers=2, record_state_interval_s=record_state_interval_s
+        ),
+    ).__iter__()
+    self.assertEqual([next(ds_iter) for _ in range(5)], list(range(5)))
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    if record_state_interval_s:
+      self.assertEqual(state['iterations_to_skip'], {'0': 3, '1': 2})
+      self.assertEqual(
+          state['workers_state'],
+          {'0': {'next_index': 0}, '1': {'next_index': 0}},
+      )
+    else:
+      self.assertEqual(state['iterations_to_skip'], {'0': 0, '1': 0})
+      self.assertEqual(
+          state['workers_state'],
+          {'0': {'next_index': 3}, '1': {'next_index': 2}},
+      )
+
+  def test_restore_skips_elements_without_computing_them(self):
+    ds_iter = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(20).to_iter_dataset().map(lambda x: 2 * x),
+        options.MultiprocessingOptions(
+            num_workers=2, record_state_interval_s=1e9
+        ),
+    ).__iter__()
+    values = [next(ds_iter) for _ in range(7)]
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    self.assertEqual(state['iterations_to_skip'], {'0': 4, '1': 3})
+    # Computing any of the consumed elements fails the restored pipeline.
+    restored_iter = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(20)
+        .to_iter_dataset()
+        .map(functools.partial(_double_after, first_computed_element=7)),
+        options.MultiprocessingOptions(num_workers=2),
+    ).__iter__()
+    restored_iter.set_state(state)  # pytype: disable=attribute-error
+    values.extend(restored_iter)
+    self.assertEqual(values, [2 * x for x in range(20)])
+
+  def test_restores_filtered_parent_skipping_elements(self):
+    ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(40)
+        .filter(lambda x: x % 3 == 0)
+        .to_iter_dataset(),
+        options.MultiprocessingOptions(
+            num_workers=2, record_state_interval_s=1e9
+        ),
+    )
+    ds_iter = ds.__iter__()
+    values = [next(ds_iter) for _ in range(4)]
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    self.assertEqual(state['iterations_to_skip'], {'0': 2, '1': 2})
+    restored_iter = ds.__iter__()
+    restored_iter.set_state(state)  # pytype: disable=attribute-error
+    values.extend(restored_iter)
+    self.assertEqual(values, list(range(0, 40, 3)))
+
+  def test_execution_summary_includes_worker_transformations(self):
+    ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(20)
+        .to_iter_dataset()
+        .map(lambda x: np.full(4, x, np.int32)),
+        options.MultiprocessingOptions(
+            num_workers=2, record_state_interval_s=0
+        ),
+    )
+    ds = dataset.WithOptionsIterDataset(
+        ds,
+        dataset.DatasetOptions(
+            execution_tracking_mode=stats.ExecutionTrackingMode.STAGE_TIMING
+        ),
+    )
+    ds_iter = ds.__iter__()
+    self.assertLen(list(ds_iter), 20)
+    summary = dataset.get_execution_summary(ds_iter)
+    self.assertIn('MultiprocessPrefetch', summary.nodes[0].name)
+    self.assertEqual(summary.nodes[0].inputs, [1])
+    map_node = summary.nodes[1]
+    self.assertIn('MapDatasetIterator', map_node.name)
+    self.assertEqual(map_node.num_produced_elements, 20)
+    self.assertEqual(map_node.num_produced_bytes, 20 * 4 * 4)
+    self.assertGreater(map_node.total_processing_time_ns, 0)
+    self.assertEqual(
+        {
+            worker_index: node.num_produced_elements
+            for worker_index, node in map_node.worker_nodes.items()
+        },
+        {0: 10, 1: 10},
+    )
+
+  def test_set_state_reuses_worker_processes(self):
+    ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(20).to_iter_dataset(),
+        options.MultiprocessingOptions(num_workers=2),
+    )
+    ds_iter = iter(ds)
+    values = [next(ds_iter) for _ in range(5)]
+    state = ds_iter.get_state()  # pytype: disable=attribute-error
+    pids = [p.pid for p in ds_iter._raw_iterator._grain_pool[0].processes]  # pytype: disable=attribute-error
+    ds_iter.set_state(copy.deepcopy(state))  # pytype: disable=attribute-error
+    self.assertEqual(values + [next(ds_iter)], list(range(6)))
+    self.assertEqual(
+        [p.pid for p in ds_iter._raw_iterator._grain_pool[0].processes],  # pytype: disable=attribute-error
+        pids,
+    )
+    self.assertEqual(list(ds_iter), list(range(6, 20)))
+    # The worker processes are stopped at the end of iteration and restarted
+    # when restoring the state.
+    self.assertEmpty(ds_iter._raw_iterator._grain_pool)  # pytype: disable=attribute-error
+    ds_iter.set_state(copy.deepcopy(state))  # pytype: disable=attribute-error
+    self.assertEqual(values + list(ds_iter), list(range(20)))
+
+  def test_pipelines_share_persistent_pool(self):
+    self.addCleanup(grain_pool._persistent_pool.shutdown)
+    multiprocessing_options = options.MultiprocessingOptions(
+        num_workers=2, use_persistent_pool=True
+    )
+    train_ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(10).to_iter_dataset(), multiprocessing_options
+    )
+    eval_ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(10).map(lambda x: -x).to_iter_dataset(),
+        multiprocessing_options,
+    )
+    ds_iter = iter(train_ds)
+    self.assertEqual(next(ds_iter), 0)
+    pids = [p.pid for p in ds_iter._raw_iterator._grain_pool[0].processes]  # pytype: disable=attribute-error
+    self.assertEqual(list(ds_iter), list(range(1, 10)))
+    # The workers are returned to the persistent pool at the end of iteration.
+    ds_iter = iter(eval_ds)
+    self.assertEqual(next(ds_iter), 0)
+    self.assertEqual(
+        [p.pid for p in ds_iter._raw_iterator._grain_pool[0].processes],  # pytype: disable=attribute-error
+        pids,
+    )
+    self.assertEqual(list(ds_iter), [-x for x in range(1, 10)])
+
   def test_fails_with_negative_num_workers(self):
     with self.assertRaisesRegex(
         ValueError, '`num_workers` must be greater than or equal to 0'
@@ -340,6 +682,14 @@ class MultiprocessPrefetchIterDatasetTest(parameterized.TestCase):
     ds_iter = iter(ds)
     self.assertEqual(next(ds_iter), 2)
 
+  def test_batches_in_shared_memory(self):
+    ds = dataset.MapDataset.range(20).map(lambda x: np.full((4,), x))
+    ds = ds.to_iter_dataset().batch(2)
+    prefetch_ds = prefetch.MultiprocessPrefetchIterDataset(
+        ds, options.MultiprocessingOptions(num_workers=1)
+    )
+    np.testing.assert_array_equal(list(prefetch_ds), list(ds))
+
   def test_fails_with_iter_source_multiple_workers(self):
     ds = prefetch.MultiprocessPrefetchIterDataset(
         RepeatedIntSourceIterDataset().map(lambda x: x + 1),
@@ -404,6 +754,24 @@ class MultiprocessPrefetchIterDatasetTest(parameterized.TestCase):
           r'Dataset: MapIterDataset.* cannot be pickled!',
       )
 
+  def test_shares_large_arrays_with_workers(self):
+    table = np.arange(1 << 18)
+    ds = prefetch.MultiprocessPrefetchIterDataset(
+        dataset.MapDataset.range(4)
+        .map(lambda i: (table.flags.writeable, int(table[i])))
+        .to_iter_dataset(),
+        options.MultiprocessingOptions(num_workers=2),
+    )
+    self.assertEqual(list(ds), [(False, i) for i in range(4)])
+
+  def test_check_picklable_pickles_each_dataset_once(self):
+    counter = _PickleCounter()
+    ds = dataset.MapDataset.source([counter])
+    for _ in range(10):
+      ds = ds.map(lambda x: x)
+    prefetch._check_picklable(ds.to_iter_dataset())
+    self.assertEqual(_PickleCounter.count, 1)
+
   def test_reports_first_unpicklable_dataset_when_with_multiple_parents(self):
     class UnpicklableObject:
 
@@ -642,6 +1010,27 @@ class ThreadPrefetchIterDatasetTest(parameterized.TestCase):
           value = next(ds_iter)
           self.assertEqual(value, values_without_interruption[i])
 
+  def test_limits_buffered_bytes(self):
+    ds = (
+        dataset.MapDataset.range(50)
+        .to_iter_dataset()
+        .map(lambda x: np.full(1000, x, dtype=np.uint8))
+    )
+    ds = prefetch.ThreadPrefetchIterDataset(ds, prefetch_buffer_size=100)
+    ds = dataset.WithOptionsIterDataset(
+        ds, dataset.DatasetOptions(max_buffered_bytes=3000)
+    )
+    ds_iter = ds.__iter__()
+    actual = [int(next(ds_iter)[0])]
+    state = ds_iter.get_state()
+    time.sleep(0.5)
+    self.assertBetween(ds_iter._memory_budget.buffered_bytes, 1000, 3000)
+    self.assertLessEqual(ds_iter._buffer.qsize(), 3)
+    actual.extend(int(x[0]) for x in ds_iter)
+    self.assertEqual(actual, list(range(50)))
+    ds_iter.set_state(state)
+    self.assertEqual([int(x[0]) for x in ds_iter], list(range(1, 50)))
+
   def test_fails_with_negative_prefetch_buffer_size(self):
     with self.assertRaisesRegex(
         ValueError, '`prefetch_buffer_size` must be greater than or equal to 0'
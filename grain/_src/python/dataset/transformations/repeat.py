@@ -61,3 +61,9 @@ class RepeatMapDataset(dataset.MapDataset[T]):
     if isinstance(index, slice):
       return self.slice(index)
     return self._stats.record_output_spec(self._parent[index])
+
+  def __getitems__(self, indices):
+    return [
+        self._stats.record_output_spec(element)
+        for element in self._parent.__getitems__(indices)
+    ]
@@ -47,6 +47,12 @@ class RepeatMapDatasetTest(absltest.TestCase):
     ds = repeat.RepeatMapDataset(ds, num_epochs=3)
     self.assertSequenceEqual(list(ds), [0, 1, 2, 3, 0, 1, 2, 3, 0, 1, 2, 3])
 
+  def test_getitems(self):
+    ds = dataset.MapDataset.range(4).shuffle(seed=42)
+    ds = repeat.RepeatMapDataset(ds, num_epochs=3)
+    indices = [11, 0, 5, 6, 3]
+    self.assertSequenceEqual(ds.__getitems__(indices), [ds[i] for i in indices])
+
   def test_infinite_epochs_sets_length_to_maxsize(self):
     ds = dataset.MapDataset.range(6)
     ds = repeat.RepeatMapDataset(ds, num_epochs=None)
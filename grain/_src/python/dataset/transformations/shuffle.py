@@ -16,14 +16,54 @@
 from __future__ import annotations
 
 import copy
+import functools
 from typing import TypeVar
 
 from grain._src.python.dataset import dataset
 from grain._src.python.experimental.index_shuffle.python import index_shuffle_module as index_shuffle
+import numpy as np
 
 
 T = TypeVar("T")
 
+# Number of rounds used by all shuffle transformations.
+_SHUFFLE_ROUNDS = 4
+
+
+@functools.lru_cache(maxsize=64)
+def _index_shuffler(max_index: int, seed: int) -> index_shuffle.IndexShuffler:
+  """Returns a shuffler with round keys cached for `(max_index, seed)`."""
+  return index_shuffle.IndexShuffler(
+      max_index=max_index, seed=seed, rounds=_SHUFFLE_ROUNDS
+  )
+
+
+def _shuffle_in_blocks(
+    indices: np.ndarray, block_size: int, block_seed_fn
+) -> np.ndarray:
+  """Shuffles `indices` within consecutive blocks of `block_size`.
+
+  Vectorized equivalent of shuffling each index separately with
+  `index_shuffle(index % block_size, block_size - 1, block_seed_fn(block))`.
+
+  Args:
+    indices: Non-negative indices to shuffle.
+    block_size: Size of the blocks that are shuffled independently.
+    block_seed_fn: Returns the shuffle seed for a block index.
+
+  Returns:
+    Shuffled indices as an `int64` array of the same shape.
+  """
+  blocks, indices_in_block = np.divmod(
+      np.asarray(indices, dtype=np.int64), block_size
+  )
+  result = np.empty_like(indices_in_block)
+  for block in np.unique(blocks):
+    mask = blocks == block
+    shuffler = _index_shuffler(block_size - 1, block_seed_fn(int(block)))
+    result[mask] = shuffler.shuffle(indices_in_block[mask])
+  return result + blocks * block_size
+
 
 class ShuffleMapDataset(dataset.MapDataset[T]):
   """Shuffles the parent dataset."""
@@ -64,13 +104,28 @@ class ShuffleMapDataset(dataset.MapDataset[T]):
       #   - index_shuffle expects 32-bit integers
       #   - we use different seeds for each epoch to ensure that the shuffle is
       #     different for each epoch
-      per_epoch_seed = (self._seed + epoch) % 2**32
+      per_epoch_seed = self._epoch_seed(epoch)
       shuffled_index_in_epoch = index_shuffle.index_shuffle(
-          index_in_epoch, max_index=length - 1, seed=per_epoch_seed, rounds=4
+          index_in_epoch,
+          max_index=length - 1,
+          seed=per_epoch_seed,
+          rounds=_SHUFFLE_ROUNDS,
       )
       shuffled_index = shuffled_index_in_epoch + epoch * length
     return self._parent[shuffled_index]
 
+  def __getitems__(self, indices):
+    with self._stats.record_self_time(num_elements=len(indices)):
+      parent_indices = self.parent_indices(np.asarray(indices)).tolist()
+    return self._parent.__getitems__(parent_indices)
+
+  def _epoch_seed(self, epoch: int) -> int:
+    return (self._seed + epoch) % 2**32
+
+  def parent_indices(self, indices: np.ndarray) -> np.ndarray:
+    """Returns parent indices for `indices`, same as used by `__getitem__`."""
+    return _shuffle_in_blocks(indices, len(self._parent), self._epoch_seed)
+
 
 class WindowShuffleMapDataset(dataset.MapDataset[T]):
   """Shuffles the parent dataset within a given window.
@@ -104,11 +159,25 @@ class WindowShuffleMapDataset(dataset.MapDataset[T]):
           index_in_window,
           max_index=self._window_size - 1,
           seed=seed,
-          rounds=4,
+          rounds=_SHUFFLE_ROUNDS,
       )
       index = index_in_window + window_index * self._window_size
     return self._stats.record_output_spec(self._parent[index])
 
+  def __getitems__(self, indices):
+    with self._stats.record_self_time(num_elements=len(indices)):
+      parent_indices = self.parent_indices(np.asarray(indices)).tolist()
+    return [
+        self._stats.record_output_spec(element)
+        for element in self._parent.__getitems__(parent_indices)
+    ]
+
+  def parent_indices(self, indices: np.ndarray) -> np.ndarray:
+    """Returns parent indices for `indices`, same as used by `__getitem__`."""
+    return _shuffle_in_blocks(
+        indices, self._window_size, lambda window: self._seed + window
+    )
+
 
 class WindowShuffleIterDataset(dataset.IterDataset[T]):
   """Shuffles the parent dataset within a given window.
@@ -126,9 +195,16 @@ class WindowShuffleIterDataset(dataset.IterDataset[T]):
     self._seed = seed
 
   def __iter__(self) -> _WindowShuffleDatasetIterator[T]:
+    # Loaded lazily due to a circular dependency (shuffle <-> prefetch).
+    # pylint: disable=g-import-not-at-top
+    from grain._src.python.dataset.transformations import prefetch
+    # pylint: enable=g-import-not-at-top
     parent_iter = self._parent.__iter__()
     return _WindowShuffleDatasetIterator(
-        parent_iter, window_size=self._window_size, seed=self._seed
+        parent_iter,
+        window_size=self._window_size,
+        seed=self._seed,
+        seekable=prefetch._produces_all_positions(self._parent),  # pylint: disable=protected-access
     )
 
   def __str__(self) -> str:
@@ -146,10 +222,14 @@ class _WindowShuffleDatasetIterator(dataset.DatasetIterator[T]):
       *,
       window_size: int,
       seed: int,
+      seekable: bool = False,
   ):
     super().__init__(parent)
     self._window_size = window_size
     self._global_seed = seed
+    # Whether the parent yields an element for every position of its state, see
+    # `prefetch._produces_all_positions`.
+    self._seekable = seekable
     self._window_index: int = 0
     self._pos_in_window = 0
     self._window: list[T] = []
@@ -165,15 +245,16 @@ class _WindowShuffleDatasetIterator(dataset.DatasetIterator[T]):
     else:
       self._window_index += 1
 
+  def _shuffled_indices(self, seed: int, window_length: int) -> list[int]:
+    shuffler = index_shuffle.IndexShuffler(
+        max_index=window_length - 1, seed=seed, rounds=_SHUFFLE_ROUNDS
+    )
+    return shuffler.shuffle(np.arange(window_length, dtype=np.uint64)).tolist()
+
   def _reshuffle_list(self, seed: int, window: list[T]):
-    window_len = len(window)
-    shuffled = []
-    for pos in range(window_len):
-      shuffled_index = index_shuffle.index_shuffle(
-          pos, max_index=window_len - 1, seed=seed, rounds=4
-      )
-      shuffled.append(window[shuffled_index])
-    return shuffled
+    if not window:
+      return []
+    return [window[i] for i in self._shuffled_indices(seed, len(window))]
 
   def _fill_and_shuffle_window(self):
     # Window should be empty at this point.
@@ -215,12 +296,73 @@ class _WindowShuffleDatasetIterator(dataset.DatasetIterator[T]):
         parent_exhausted=self._parent_exhausted,
     )
 
+  def _read_remaining_window(self) -> bool:
+    """Reads the window elements not consumed yet by seeking the parent.
+
+    Elements of a full window at parent positions
+    `window_start, ..., window_start + window_size - 1` are returned in shuffled
+    order, so the positions of the remaining elements follow from the number
+    of consumed ones.
+
+    Returns:
+      Whether the parent window start state is positional and the window is
+      full, i.e. the elements were read.
+    """
+    # Loaded lazily due to a circular dependency (shuffle <-> prefetch).
+    # pylint: disable=g-import-not-at-top
+    from grain._src.python.dataset.transformations import prefetch
+    # pylint: enable=g-import-not-at-top
+    # pylint: disable=protected-access
+    window_start = prefetch._get_next_index(
+        self._parent_window_start_iter_state
+    )
+    if window_start is None:
+      return False
+
+    def seek(position: int):
+      self._parent.set_state(
+          prefetch._with_next_index(
+              self._parent_window_start_iter_state, window_start + position
+          )
+      )
+
+    # pylint: enable=protected-access
+    shuffled_indices = self._shuffled_indices(
+        self._global_seed + self._window_index, self._window_size
+    )
+    # Elements are popped from the end of the window.
+    remaining = shuffled_indices[: self._window_size - self._pos_in_window]
+    elements = {}
+    next_position = None
+    for position in sorted(remaining):
+      if position != next_position:
+        seek(position)
+      try:
+        elements[position] = next(self._parent)
+      except StopIteration:
+        # The parent has less than `window_size` elements left.
+        return False
+      next_position = position + 1
+    seek(self._window_size)
+    self._window = [elements[position] for position in remaining]
+    return True
+
   def set_state(self, state):
     self._parent_window_start_iter_state = state["parent_window_start_state"]
-    self._parent.set_state(self._parent_window_start_iter_state)
     self._window_index = state["window_index"]
     self._pos_in_window = state["pos_in_window"]
     self._parent_exhausted = state["parent_exhausted"]
+    # The next window is shuffled with the seed of the following window index.
+    self._init = False
+    # The length of the last window is not recorded, so it's read entirely.
+    if (
+        self._seekable
+        and not self._parent_exhausted
+        and self._options_with_default.minimize_restore_replay
+        and self._read_remaining_window()
+    ):
+      return
+    self._parent.set_state(self._parent_window_start_iter_state)
     self._fill_and_shuffle_window()
     # Removed previously processed elements from the window.
     for _ in range(min(self._pos_in_window, len(self._window))):
@@ -15,8 +15,10 @@
 
 from absl.testing import absltest
 from absl.testing import parameterized
+from grain._src.python import options
 from grain._src.python.dataset import dataset
 from grain._src.python.dataset.transformations import shuffle
+import numpy as np
 
 
 class ShuffleMapDatasetTest(parameterized.TestCase):
@@ -34,6 +36,11 @@ class ShuffleMapDatasetTest(parameterized.TestCase):
     shuffled_indices_epoch2 = [ds[400 + i] for i in range(400)]
     self.assertNotEqual(shuffled_indices, shuffled_indices_epoch2)
 
+  def test_getitems(self):
+    ds = shuffle.ShuffleMapDataset(dataset.MapDataset.range(400), seed=42)
+    indices = [0, 399, 400, 17, 1234]
+    self.assertEqual(ds.__getitems__(indices), [ds[i] for i in indices])
+
   def test_iter(self):
     ds = shuffle.ShuffleMapDataset(dataset.MapDataset.range(400), seed=42)
     ds_iter = iter(ds)
@@ -57,9 +64,33 @@ class ShuffleMapDatasetTest(parameterized.TestCase):
     with self.assertRaises(ValueError):
       shuffle.ShuffleMapDataset(dataset.MapDataset.range(400), seed=seed)
 
+  @parameterized.parameters(42, 2**32 - 1)
+  def test_parent_indices_matches_getitem(self, seed):
+    ds = shuffle.ShuffleMapDataset(dataset.MapDataset.range(37), seed=seed)
+    indices = np.random.default_rng(0).permutation(37 * 3)
+    np.testing.assert_array_equal(
+        ds.parent_indices(indices) % 37, [ds[i] for i in indices]
+    )
+
 
 class WindowShuffleMapDatasetTest(absltest.TestCase):
 
+  def test_parent_indices_matches_getitem(self):
+    ds = shuffle.WindowShuffleMapDataset(
+        dataset.MapDataset.range(37), window_size=8, seed=42
+    )
+    indices = np.arange(37 * 2)
+    np.testing.assert_array_equal(
+        ds.parent_indices(indices) % 37, [ds[i] for i in indices]
+    )
+
+  def test_getitems(self):
+    ds = shuffle.WindowShuffleMapDataset(
+        dataset.MapDataset.range(400), window_size=10, seed=42
+    )
+    indices = [0, 399, 400, 17, 1234]
+    self.assertEqual(ds.__getitems__(indices), [ds[i] for i in indices])
+
   def test_len(self):
     ds = shuffle.WindowShuffleMapDataset(
         dataset.MapDataset.range(400), window_size=10, seed=42
@@ -162,6 +193,101 @@ class WindowShuffleInterDatasetTest(absltest.TestCase):
           msg=f"Checkpoint values failed from checkpoint {i}.",
       )
 
+  def test_restores_into_new_iterator(self):
+    ds = shuffle.WindowShuffleIterDataset(
+        self.range_iter_ds, window_size=4, seed=42
+    )
+    ds_iter = ds.__iter__()
+    checkpoints = []
+    checkpoints_values = []
+    for _ in range(self._DATASET_SIZE):
+      checkpoints.append(ds_iter.get_state())
+      checkpoints_values.append(next(ds_iter))
+    for i in [0, 1, 4, 6, 29]:
+      ds_iter = ds.__iter__()
+      ds_iter.set_state(checkpoints[i])
+      self.assertEqual(
+          list(ds_iter),
+          checkpoints_values[i:],
+          msg=f"Checkpoint values failed from checkpoint {i}.",
+      )
+
+  def _assert_restores_from_every_step(self, ds: dataset.IterDataset):
+    ds_iter = ds.__iter__()
+    checkpoints = []
+    checkpoints_values = []
+    for _ in range(self._DATASET_SIZE):
+      checkpoints.append(ds_iter.get_state())
+      checkpoints_values.append(next(ds_iter))
+    for i in range(len(checkpoints)):
+      ds_iter = ds.__iter__()
+      ds_iter.set_state(checkpoints[i])
+      self.assertEqual(
+          ds_iter.get_state(),
+          checkpoints[i],
+          msg=f"Checkpoint state failed at {i}.",
+      )
+      self.assertEqual(
+          list(ds_iter),
+          checkpoints_values[i:],
+          msg=f"Checkpoint values failed from checkpoint {i}.",
+      )
+
+  def test_minimize_restore_replay_reads_remaining_window_elements(self):
+    read_elements = []
+
+    def record_element(x):
+      read_elements.append(x)
+      return x
+
+    parent = (
+        dataset.MapDataset.range(self._DATASET_SIZE)
+        .map(record_element)
+        .to_iter_dataset(
+            options.ReadOptions(prefetch_buffer_size=0), allow_nones=True
+        )
+        .map(lambda x: x * 2)
+    )
+    ds = dataset.WithOptionsIterDataset(
+        shuffle.WindowShuffleIterDataset(
+            parent, window_size=self._WINDOW_SIZE, seed=42
+        ),
+        dataset.DatasetOptions(minimize_restore_replay=True),
+    )
+    self._assert_restores_from_every_step(ds)
+    ds_iter = ds.__iter__()
+    for _ in range(13):
+      next(ds_iter)
+    state = ds_iter.get_state()
+    read_elements.clear()
+    ds.__iter__().set_state(state)
+    # Only the 7 elements of the second window not consumed yet are read.
+    self.assertLen(read_elements, 7)
+    self.assertContainsSubset(read_elements, range(10, 20))
+
+  def test_minimize_restore_replay_with_prefetching_parent(self):
+    ds = dataset.WithOptionsIterDataset(
+        shuffle.WindowShuffleIterDataset(
+            self.range_iter_ds, window_size=self._WINDOW_SIZE, seed=42
+        ),
+        dataset.DatasetOptions(minimize_restore_replay=True),
+    )
+    self._assert_restores_from_every_step(ds)
+
+  def test_minimize_restore_replay_with_filtered_parent(self):
+    parent = (
+        dataset.MapDataset.range(self._DATASET_SIZE * 2)
+        .filter(lambda x: x % 2 == 0)
+        .to_iter_dataset()
+    )
+    ds = dataset.WithOptionsIterDataset(
+        shuffle.WindowShuffleIterDataset(
+            parent, window_size=self._WINDOW_SIZE, seed=42
+        ),
+        dataset.DatasetOptions(minimize_restore_replay=True),
+    )
+    self._assert_restores_from_every_step(ds)
+
   def test_shuffled_raises_stop_iteration(self):
     ds = shuffle.WindowShuffleIterDataset(
         self.range_iter_ds, window_size=self._WINDOW_SIZE, seed=42
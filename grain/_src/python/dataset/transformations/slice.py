@@ -41,5 +41,13 @@ class SliceMapDataset(dataset.MapDataset[T]):
       parent_index = self._start + (index % len(self)) * self._step
     return self._parent[parent_index]
 
+  def __getitems__(self, indices):
+    with self._stats.record_self_time(num_elements=len(indices)):
+      length = len(self)
+      parent_indices = [
+          self._start + (index % length) * self._step for index in indices
+      ]
+    return self._parent.__getitems__(parent_indices)
+
   def __str__(self) -> str:
     return f"SliceMapDataset[{self._start}:{self._stop}:{self._step}]"
@@ -62,6 +62,17 @@ class SliceMapDatasetTest(parameterized.TestCase):
     ds_items = [ds[i] for i in range(len(ds))]
     self.assertSequenceEqual(ds_items, list(range(20))[start:stop:step])
 
+  @parameterized.parameters(
+      itertools.product([-8, 0, 3], [-9, 0, 7], [-2, -1, 1, 2])
+  )
+  def test_getitems(self, start: int, stop: int, step: int):
+    ds = dataset.MapDataset.range(20).shuffle(seed=42)
+    ds = slice_ds.SliceMapDataset(ds, slice(start, stop, step))
+    indices = list(range(2 * len(ds)))
+    self.assertSequenceEqual(
+        ds.__getitems__(indices), [ds[i] for i in indices]
+    )
+
   @parameterized.parameters(
       itertools.product(range(-8, 8), range(-9, 8), [-2, -1, 1, 2])
   )
@@ -42,6 +42,18 @@ class SourceMapDataset(dataset.MapDataset):
     with self._stats.record_self_time():
       return self._stats.record_output_spec(self._source[index % len(self)])
 
+  def __getitems__(self, indices):
+    with self._stats.record_self_time(num_elements=len(indices)):
+      length = len(self)
+      record_keys = [index % length for index in indices]
+      if hasattr(self._source, "__getitems__"):
+        # Let the source read records in bulk, e.g. ArrayRecord readers fetch
+        # all records of a chunk in a single call.
+        elements = self._source.__getitems__(record_keys)
+      else:
+        elements = [self._source[key] for key in record_keys]
+      return [self._stats.record_output_spec(e) for e in elements]
+
   def log_lineage(self):
     pass
 
@@ -83,6 +95,15 @@ class RangeMapDataset(dataset.MapDataset[int]):
           self.start + (index % self._length) * self.step
       )
 
+  def __getitems__(self, indices):
+    with self._stats.record_self_time(num_elements=len(indices)):
+      return [
+          self._stats.record_output_spec(
+              self.start + (index % self._length) * self.step
+          )
+          for index in indices
+      ]
+
   def to_iter_dataset(
       self,
       read_options: options.ReadOptions | None = None,
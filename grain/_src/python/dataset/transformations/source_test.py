@@ -72,6 +72,21 @@ class SourceMapDatasetTest(absltest.TestCase):
     actual_data = [self.lazy_dataset_source[i] for i in indices_to_read]
     self.assertEqual(expected_data, actual_data)
 
+  def test_getitems(self):
+    indices_to_read = [3, 0, 207, 4]
+    expected_data = [self.lazy_dataset_source[i] for i in indices_to_read]
+    actual_data = self.lazy_dataset_source.__getitems__(indices_to_read)
+    self.assertEqual(expected_data, actual_data)
+
+  def test_getitems_uses_bulk_source_read(self):
+    data_source = mock.MagicMock()
+    data_source.__len__.return_value = 5
+    data_source.__getitems__ = mock.MagicMock(return_value=["a", "b"])
+    ds = source.SourceMapDataset(data_source)
+    self.assertEqual(ds.__getitems__([1, 8]), ["a", "b"])
+    data_source.__getitems__.assert_called_once_with([1, 3])
+    data_source.__getitem__.assert_not_called()
+
 
 class RangeMapDatasetTest(absltest.TestCase):
 
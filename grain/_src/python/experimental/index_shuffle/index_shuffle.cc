@@ -89,8 +89,7 @@ uint64_t simon_encrypt(const uint64_t value,
 // B = 2 * W = block size
 template <int B>
 uint64_t index_shuffle(const uint64_t index, const uint64_t max_index,
-                       const uint32_t seed, const uint32_t rounds) {
-  const auto round_keys = generate_keys(seed, rounds);
+                       const std::vector<uint32_t>& round_keys) {
   uint64_t new_index = index;
   while (true) {
     new_index = simon_encrypt<B / 2>(new_index, round_keys);
@@ -100,29 +99,41 @@ uint64_t index_shuffle(const uint64_t index, const uint64_t max_index,
   }
 }
 
+// Applies `index_shuffle<B>` to every element of `indices`.
+template <int B>
+void index_shuffle_many(const uint64_t* indices, uint64_t* output,
+                        const size_t size, const uint64_t max_index,
+                        const std::vector<uint32_t>& round_keys) {
+  for (size_t i = 0; i < size; ++i) {
+    output[i] = index_shuffle<B>(indices[i], max_index, round_keys);
+  }
+}
+
 #undef ROTL
 #undef ROTR
 #undef SIMON_F
 #undef SIMON_RxC
 
-}  // namespace impl
-
-uint64_t index_shuffle(const uint64_t index, const uint64_t max_index,
-                       const uint32_t seed, const uint32_t rounds) {
-  if (max_index == 0) {
-    return 0;
-  }
+// Returns the block size for the cipher given the largest index to permute.
+int block_size_for(const uint64_t max_index) {
   // Block size must be large enough to represent max_index and even (since
   // word size is half of it). We force at least 16 bits as minimum block size
   // since we observed pattern in the permutations below.
   int block_size = static_cast<int>(std::ceil(std::log2(max_index)));
   block_size = std::max(block_size + block_size % 2, kMinBlockSize);
   assert(block_size > 0 && block_size % 2 == 0 && block_size <= 64);
-  // At least 4 rounds and number of rounds must be even.
-  assert(rounds >= 4 && rounds % 2 == 0);
-#define HANDLE_BLOCK_SIZE(B) \
-  case B:                    \
-    return impl::index_shuffle<B>(index, max_index, seed, rounds);
+  return block_size;
+}
+
+// Dispatches to `index_shuffle_many` specialized for `block_size`.
+void index_shuffle_many(const uint64_t* indices, uint64_t* output,
+                        const size_t size, const uint64_t max_index,
+                        const std::vector<uint32_t>& round_keys,
+                        const int block_size) {
+#define HANDLE_BLOCK_SIZE(B)                                       \
+  case B:                                                          \
+    return index_shuffle_many<B>(indices, output, size, max_index, \
+                                 round_keys);
 
   switch (block_size) {
     HANDLE_BLOCK_SIZE(16);
@@ -150,10 +161,46 @@ uint64_t index_shuffle(const uint64_t index, const uint64_t max_index,
     HANDLE_BLOCK_SIZE(60);
     HANDLE_BLOCK_SIZE(62);
     default:
-      return impl::index_shuffle<64>(index, max_index, seed, rounds);
+      return index_shuffle_many<64>(indices, output, size, max_index,
+                                    round_keys);
   }
 #undef HANDLE_BLOCK_SIZE
 }
 
+}  // namespace impl
+
+uint64_t index_shuffle(const uint64_t index, const uint64_t max_index,
+                       const uint32_t seed, const uint32_t rounds) {
+  return IndexShuffler(max_index, seed, rounds)(index);
+}
+
+IndexShuffler::IndexShuffler(const uint64_t max_index, const uint32_t seed,
+                             const uint32_t rounds)
+    : max_index_(max_index), seed_(seed), rounds_(rounds), block_size_(0) {
+  if (max_index == 0) {
+    return;
+  }
+  block_size_ = impl::block_size_for(max_index);
+  // At least 4 rounds and number of rounds must be even.
+  assert(rounds >= 4 && rounds % 2 == 0);
+  round_keys_ = impl::generate_keys(seed, rounds);
+}
+
+uint64_t IndexShuffler::operator()(const uint64_t index) const {
+  uint64_t result;
+  (*this)(&index, &result, 1);
+  return result;
+}
+
+void IndexShuffler::operator()(const uint64_t* indices, uint64_t* output,
+                               const size_t size) const {
+  if (max_index_ == 0) {
+    std::fill(output, output + size, 0);
+    return;
+  }
+  impl::index_shuffle_many(indices, output, size, max_index_, round_keys_,
+                           block_size_);
+}
+
 }  // namespace random
 }  // namespace grain
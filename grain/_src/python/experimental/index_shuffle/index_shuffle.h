@@ -17,7 +17,9 @@ limitations under the License.
 #define GRAIN_RANDOM_RANDOM_INDEX_SHUFFLE_H_
 
 #include <array>
+#include <cstddef>
 #include <cstdint>
+#include <vector>
 
 namespace grain {
 namespace random {
@@ -38,6 +40,36 @@ namespace random {
 uint64_t index_shuffle(uint64_t index, uint64_t max_index, uint32_t seed,
                        uint32_t rounds);
 
+// Same permutation as `index_shuffle` but with the round keys and block size
+// computed once for a fixed (`max_index`, `seed`, `rounds`) triple.
+//
+// Generating round keys dominates the cost of a single `index_shuffle` call, so
+// prefer this class whenever many indices are mapped with the same parameters.
+// Instances are immutable after construction and thus thread-safe.
+class IndexShuffler {
+ public:
+  IndexShuffler(uint64_t max_index, uint32_t seed, uint32_t rounds);
+
+  // Returns the position of `index` in the permutation of [0, ..., max_index].
+  uint64_t operator()(uint64_t index) const;
+
+  // Writes positions of `indices[0, ..., size)` to `output[0, ..., size)`.
+  // `indices` and `output` may point to the same buffer.
+  void operator()(const uint64_t* indices, uint64_t* output,
+                  size_t size) const;
+
+  uint64_t max_index() const { return max_index_; }
+  uint32_t seed() const { return seed_; }
+  uint32_t rounds() const { return rounds_; }
+
+ private:
+  uint64_t max_index_;
+  uint32_t seed_;
+  uint32_t rounds_;
+  int block_size_;
+  std::vector<uint32_t> round_keys_;
+};
+
 }  // namespace random
 }  // namespace grain
 
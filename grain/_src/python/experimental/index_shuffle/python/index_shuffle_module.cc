@@ -1,9 +1,32 @@
+#include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 
+#include <cstdint>
+
 #include "grain/_src/python/experimental/index_shuffle/index_shuffle.h"
 
 namespace py = pybind11;
 
+namespace {
+
+using ::grain::random::IndexShuffler;
+
+py::array_t<uint64_t> shuffle_indices(
+    const IndexShuffler& shuffler,
+    py::array_t<uint64_t, py::array::c_style | py::array::forcecast> indices) {
+  py::array_t<uint64_t> result(indices.request().shape);
+  const uint64_t* input = indices.data();
+  uint64_t* output = result.mutable_data();
+  const size_t size = static_cast<size_t>(indices.size());
+  {
+    py::gil_scoped_release release;
+    shuffler(input, output, size);
+  }
+  return result;
+}
+
+}  // namespace
+
 PYBIND11_MODULE(index_shuffle_module, m) {
   constexpr char kDoc[] =
       "Returns the position of `index` in a permutation of [0, ..., "
@@ -12,4 +35,29 @@ PYBIND11_MODULE(index_shuffle_module, m) {
   m.def("index_shuffle", &::grain::random::index_shuffle, kDoc,
         py::arg("index"), py::arg("max_index"), py::arg("seed"),
         py::arg("rounds"));
+
+  py::class_<IndexShuffler>(
+      m, "IndexShuffler",
+      "Permutation of [0, ..., max_index] with precomputed round keys.\n\n"
+      "Produces the same results as `index_shuffle` with the same arguments.")
+      .def(py::init<uint64_t, uint32_t, uint32_t>(), py::arg("max_index"),
+           py::arg("seed"), py::arg("rounds"))
+      .def("__call__",
+           py::overload_cast<uint64_t>(&IndexShuffler::operator(), py::const_),
+           kDoc, py::arg("index"))
+      .def("shuffle", &shuffle_indices,
+           "Returns positions of all `indices` (a NumPy array) in the "
+           "permutation as a `uint64` array of the same shape.",
+           py::arg("indices"))
+      .def_property_readonly("max_index", &IndexShuffler::max_index)
+      .def_property_readonly("seed", &IndexShuffler::seed)
+      .def_property_readonly("rounds", &IndexShuffler::rounds)
+      .def(py::pickle(
+          [](const IndexShuffler& s) {
+            return py::make_tuple(s.max_index(), s.seed(), s.rounds());
+          },
+          [](py::tuple t) {
+            return IndexShuffler(t[0].cast<uint64_t>(), t[1].cast<uint32_t>(),
+                                 t[2].cast<uint32_t>());
+          }));
 }
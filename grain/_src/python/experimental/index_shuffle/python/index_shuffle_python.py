@@ -16,9 +16,16 @@
 This is roughly 10x slower than the C++ index_shuffle but still sufficiently
 fast for many use cases. Use it if the C++ version (and it's CLIF wrapper) don't
 work for you.
+
+`IndexShuffler` is a vectorized NumPy version of the C++ `IndexShuffler` and
+produces exactly the same permutations.
 """
 
+import functools
 import hashlib
+import math
+
+import numpy as np
 
 
 def _fingerprint(*args) -> int:
@@ -77,3 +84,152 @@ def index_shuffle(index: int, max_index: int, seed: int, rounds: int) -> int:
     index = a * (2**k) + b
     if index <= max_index:
       return int(index)
+
+
+# Must match `kMinBlockSize` in index_shuffle.cc.
+_MIN_BLOCK_SIZE = 16
+_UINT32_MASK = 0xFFFFFFFF
+
+
+def _generate_keys(seed: int, rounds: int) -> list[int]:
+  """Returns round keys, same as `std::seed_seq{seed}.generate()` in C++."""
+  # See [rand.util.seedseq] in the C++ standard for the algorithm.
+  n = rounds
+  keys = [0x8B8B8B8B] * n
+  t = 11 if n >= 623 else 7 if n >= 68 else 5 if n >= 39 else 3 if n >= 7 else (
+      (n - 1) // 2
+  )
+  p = (n - t) // 2
+  q = p + t
+  m = max(2, n)  # The seed sequence has a single element.
+  tempering = lambda x: x ^ (x >> 27)
+  for k in range(m):
+    r1 = (
+        1664525
+        * tempering(keys[k % n] ^ keys[(k + p) % n] ^ keys[(k - 1) % n])
+        & _UINT32_MASK
+    )
+    if k == 0:
+      r2 = r1 + 1
+    elif k == 1:
+      r2 = r1 + k % n + seed
+    else:
+      r2 = r1 + k % n
+    r2 &= _UINT32_MASK
+    keys[(k + p) % n] = (keys[(k + p) % n] + r1) & _UINT32_MASK
+    keys[(k + q) % n] = (keys[(k + q) % n] + r2) & _UINT32_MASK
+    keys[k % n] = r2
+  for k in range(m, m + n):
+    r3 = (
+        1566083941
+        * tempering(
+            (keys[k % n] + keys[(k + p) % n] + keys[(k - 1) % n])
+            & _UINT32_MASK
+        )
+        & _UINT32_MASK
+    )
+    r4 = (r3 - k % n) & _UINT32_MASK
+    keys[(k + p) % n] ^= r3
+    keys[(k + q) % n] ^= r4
+    keys[k % n] = r4
+  return keys
+
+
+class IndexShuffler:
+  """Permutation of `[0, max_index]` with precomputed round keys.
+
+  Vectorized NumPy fallback for the C++ `IndexShuffler`. Maps whole arrays of
+  indices at once and produces the same permutation as the C++ version for the
+  same arguments.
+  """
+
+  def __init__(self, max_index: int, seed: int, rounds: int):
+    if rounds < 4 or rounds % 2:
+      raise ValueError(f"rounds must be an even integer >= 4, got {rounds}.")
+    self._max_index = max_index
+    self._seed = seed
+    self._rounds = rounds
+    if max_index == 0:
+      return
+    block_size = math.ceil(math.log2(float(max_index)))
+    block_size = max(block_size + block_size % 2, _MIN_BLOCK_SIZE)
+    self._block_size = block_size
+    self._word_size = np.uint64(block_size // 2)
+    self._word_mask = np.uint64((1 << (block_size // 2)) - 1)
+    self._round_keys = [
+        np.uint64(k) & self._word_mask for k in _generate_keys(seed, rounds)
+    ]
+
+  @property
+  def max_index(self) -> int:
+    return self._max_index
+
+  @property
+  def seed(self) -> int:
+    return self._seed
+
+  @property
+  def rounds(self) -> int:
+    return self._rounds
+
+  def __reduce__(self):
+    return IndexShuffler, (self._max_index, self._seed, self._rounds)
+
+  def _rotl(self, x: np.ndarray, r: int) -> np.ndarray:
+    r = np.uint64(r)
+    return ((x << r) | (x >> (self._word_size - r))) & self._word_mask
+
+  def _simon_f(self, x: np.ndarray) -> np.ndarray:
+    return (self._rotl(x, 1) & self._rotl(x, 8)) ^ self._rotl(x, 2)
+
+  def _encrypt(self, values: np.ndarray) -> np.ndarray:
+    left = (values >> self._word_size) & self._word_mask
+    right = values & self._word_mask
+    for k1, k2 in zip(self._round_keys[::2], self._round_keys[1::2]):
+      left ^= self._simon_f(right) ^ k1
+      right ^= self._simon_f(left) ^ k2
+    return (left << self._word_size) | right
+
+  @functools.cached_property
+  def _small_domain_permutation(self) -> np.ndarray:
+    """Returns the whole permutation when using the minimal block size.
+
+    Cycle walking on small domains can take many iterations, each of them
+    expensive in Python. Instead we encrypt the whole block once and follow the
+    cipher cycles. Paths between values in `[0, max_index]` are disjoint, so
+    this takes at most `2**_MIN_BLOCK_SIZE` steps in total.
+    """
+    cipher = self._encrypt(
+        np.arange(2**self._block_size, dtype=np.uint64)
+    ).tolist()
+    permutation = np.empty(self._max_index + 1, dtype=np.uint64)
+    for index in range(self._max_index + 1):
+      value = cipher[index]
+      while value > self._max_index:
+        value = cipher[value]
+      permutation[index] = value
+    return permutation
+
+  def shuffle(self, indices: np.ndarray) -> np.ndarray:
+    """Returns positions of `indices` in the permutation as `uint64` array."""
+    indices = np.asarray(indices, dtype=np.uint64)
+    if self._max_index == 0:
+      return np.zeros_like(indices)
+    if (
+        self._block_size == _MIN_BLOCK_SIZE
+        and self._max_index < 2**_MIN_BLOCK_SIZE
+    ):
+      return self._small_domain_permutation[indices]
+    result = self._encrypt(indices.ravel())
+    max_index = np.uint64(self._max_index)
+    # Cycle walking: re-encrypt values outside of [0, max_index] until they
+    # land inside.
+    pending = np.flatnonzero(result > max_index)
+    while pending.size:
+      values = self._encrypt(result[pending])
+      result[pending] = values
+      pending = pending[values > max_index]
+    return result.reshape(indices.shape)
+
+  def __call__(self, index: int) -> int:
+    return int(self.shuffle(np.array([index], dtype=np.uint64))[0])
@@ -13,8 +13,12 @@
 # limitations under the License.
 """Minimal unit test for the Python wrapper of index_shuffle."""
 
+import pickle
+
 from absl.testing import absltest
+from absl.testing import parameterized
 from grain._src.python.experimental.index_shuffle.python import index_shuffle_python
+import numpy as np
 
 
 class IndexShuffleTest(absltest.TestCase):
@@ -46,5 +50,61 @@ class IndexShuffleTest(absltest.TestCase):
     )
 
 
+class IndexShufflerTest(parameterized.TestCase):
+
+  # Expected values are produced by the C++ `IndexShuffler`.
+  @parameterized.parameters(
+      (46_204, 52, 4, [15322, 42521, 7368, 29710, 12124, 24464, 39335, 5072]),
+      (
+          1_234_567_891,
+          27,
+          8,
+          [1120509152, 295335026, 474965618, 813734260, 814618123],
+      ),
+      (
+          2**63 - 1,
+          3,
+          4,
+          [2096495692112496239, 8488411107085014124, 9078293541582667516],
+      ),
+      (9, 1, 4, [5, 7, 6, 0, 4, 8, 9, 2, 1, 3]),
+  )
+  def test_matches_cpp_implementation(self, max_index, seed, rounds, expected):
+    shuffler = index_shuffle_python.IndexShuffler(max_index, seed, rounds)
+    indices = np.arange(len(expected), dtype=np.uint64)
+    np.testing.assert_array_equal(shuffler.shuffle(indices), expected)
+    self.assertEqual([shuffler(i) for i in range(len(expected))], expected)
+
+  @parameterized.parameters(1, 2, 1_000, 46_204, 70_000)
+  def test_is_permutation(self, max_index):
+    shuffler = index_shuffle_python.IndexShuffler(max_index, seed=5, rounds=4)
+    shuffled = shuffler.shuffle(np.arange(max_index + 1))
+    self.assertEqual(shuffled.dtype, np.uint64)
+    np.testing.assert_array_equal(np.sort(shuffled), np.arange(max_index + 1))
+
+  def test_keeps_shape(self):
+    shuffler = index_shuffle_python.IndexShuffler(99, seed=5, rounds=4)
+    indices = np.arange(100).reshape(4, 25)
+    shuffled = shuffler.shuffle(indices)
+    self.assertEqual(shuffled.shape, (4, 25))
+    np.testing.assert_array_equal(
+        shuffled.ravel(), shuffler.shuffle(indices.ravel())
+    )
+
+  def test_single_record(self):
+    shuffler = index_shuffle_python.IndexShuffler(0, seed=0, rounds=4)
+    np.testing.assert_array_equal(shuffler.shuffle(np.zeros(3)), [0, 0, 0])
+
+  def test_pickle(self):
+    shuffler = index_shuffle_python.IndexShuffler(1_000, seed=5, rounds=4)
+    restored = pickle.loads(pickle.dumps(shuffler))
+    self.assertEqual(restored(123), shuffler(123))
+
+  @parameterized.parameters(2, 5)
+  def test_invalid_rounds_raises_value_error(self, rounds):
+    with self.assertRaisesRegex(ValueError, 'rounds must be'):
+      index_shuffle_python.IndexShuffler(10, seed=0, rounds=rounds)
+
+
 if __name__ == '__main__':
   absltest.main()
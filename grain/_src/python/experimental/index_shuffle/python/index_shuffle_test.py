@@ -13,8 +13,11 @@
 # limitations under the License.
 """Minimal unit test for the Python wrapper of index_shuffle."""
 
+import pickle
+
 from absl.testing import absltest
 from grain._src.python.experimental.index_shuffle.python import index_shuffle_module as index_shuffle
+import numpy as np
 
 
 class IndexShuffleTest(absltest.TestCase):
@@ -43,5 +46,41 @@ class IndexShuffleTest(absltest.TestCase):
     )
 
 
+class IndexShufflerTest(absltest.TestCase):
+
+  def test_matches_index_shuffle(self):
+    max_index = 46_204
+    shuffler = index_shuffle.IndexShuffler(max_index, seed=52, rounds=4)
+    expected = [
+        index_shuffle.index_shuffle(x, max_index, seed=52, rounds=4)
+        for x in range(max_index + 1)
+    ]
+    shuffled = shuffler.shuffle(np.arange(max_index + 1, dtype=np.uint64))
+    self.assertEqual(shuffled.dtype, np.uint64)
+    np.testing.assert_array_equal(shuffled, expected)
+    self.assertEqual(shuffler(123), expected[123])
+
+  def test_converts_input_dtype_and_keeps_shape(self):
+    shuffler = index_shuffle.IndexShuffler(99, seed=3, rounds=4)
+    indices = np.arange(100, dtype=np.int64).reshape(4, 25)
+    shuffled = shuffler.shuffle(indices)
+    self.assertEqual(shuffled.shape, (4, 25))
+    np.testing.assert_array_equal(
+        np.sort(shuffled.ravel()), np.arange(100, dtype=np.uint64)
+    )
+
+  def test_single_record(self):
+    shuffler = index_shuffle.IndexShuffler(0, seed=0, rounds=4)
+    np.testing.assert_array_equal(
+        shuffler.shuffle(np.zeros(3, dtype=np.uint64)), [0, 0, 0]
+    )
+
+  def test_pickle(self):
+    shuffler = index_shuffle.IndexShuffler(1_000, seed=5, rounds=4)
+    restored = pickle.loads(pickle.dumps(shuffler))
+    self.assertEqual(restored.max_index, 1_000)
+    self.assertEqual(restored(123), shuffler(123))
+
+
 if __name__ == '__main__':
   absltest.main()
@@ -44,29 +44,58 @@ support and multithreaded elements read.
 from __future__ import annotations
 
 from collections.abc import Iterator
+import atexit
+import contextlib
 import cProfile
+import ctypes
 import dataclasses
+import io
+from multiprocessing import connection
 from multiprocessing import context
 from multiprocessing import pool
 from multiprocessing import queues
+from multiprocessing import reduction
 from multiprocessing import synchronize
+import pickle
 import pstats
 import queue
 import sys
 import threading
+import time
 import traceback
 from typing import Any, Callable, Protocol, TypeVar, Union, runtime_checkable
 
+from absl import flags
 from absl import logging
 import cloudpickle
+from grain._src.core import config
+from grain._src.core import monitoring as grain_monitoring
 from grain._src.core import parallel
 from grain._src.core import tree
 import multiprocessing as mp
+from grain._src.python import autotune
 from grain._src.python import grain_logging
+from grain._src.python import memory_budget
 from grain._src.python import multiprocessing_common
 from grain._src.python import record
 from grain._src.python import shared_memory_array
+from grain._src.python import shared_memory_channel
 from grain._src.python.options import MultiprocessingOptions  # pylint: disable=g-importing-member
+import numpy as np
+
+from grain._src.core import monitoring
+
+_worker_startup_time_metric = monitoring.EventMetric(
+    "/grain/python/grain_pool/worker_startup_time",
+    monitoring.Metadata(
+        description=(
+            "Time from starting a Grain worker process until it is ready to"
+            " produce elements."
+        ),
+        units=monitoring.Units.NANOSECONDS,
+    ),
+    root=grain_monitoring.get_monitoring_root(),
+)
 
 T = TypeVar("T")
 
@@ -74,6 +103,27 @@ T = TypeVar("T")
 _PROCESS_MANAGEMENT_MAX_THREADS = 64
 _PROCESS_JOIN_TIMEOUT = 10
 _QUEUE_WAIT_TIMEOUT = 1
+# Number of slabs in a worker shared memory arena. Several slabs let the worker
+# keep allocating while the consumer holds on to arrays from another slab.
+_ARENA_NUM_SLABS = 4
+# Buffers of at least this many bytes in worker outputs are passed to the main
+# process through shared memory instead of being written to the output queue.
+_OUT_OF_BAND_MIN_BUFFER_SIZE = 1 << 16
+# Serialized element producers of at least this many bytes are passed to the
+# workers through a single shared memory block instead of being copied into
+# the args queue of every worker.
+_SHARED_ELEMENT_PRODUCER_MIN_SIZE = 1 << 20
+# NumPy arrays of at least this many bytes held by element producers are placed
+# into shared memory once and mapped by the workers instead of being pickled.
+_SHARED_ARRAY_MIN_SIZE = 1 << 20
+# With `MultiprocessingOptions.autotune` the `per_worker_buffer_size` can grow up
+# to this multiple of its configured value.
+_AUTOTUNE_MAX_BUFFER_SIZE_MULTIPLIER = 16
+# Number of consumed elements after which the autotuned buffer size is adjusted.
+_AUTOTUNE_WINDOW_SIZE = 32
+# The autotuned buffer grows if the consumer spends more than this fraction of
+# time waiting for elements.
+_AUTOTUNE_MAX_WAIT_FRACTION = 0.05
 # Input queues contain small structures (record metadata), thus they are safe
 # to have a big size.
 _INPUT_QUEUE_MAX_SIZE = 10000
@@ -83,8 +133,8 @@ _INPUT_QUEUE_MAX_SIZE = 10000
 class _ProcessingComplete:
   """Indicates child process finished processing."""
 
-
-_PROCESSING_COMPLETE = _ProcessingComplete()
+  # Generation of the element producer that finished, see `GrainPool.reset`.
+  generation: int = 0
 
 
 @dataclasses.dataclass(slots=True, frozen=True)
@@ -93,6 +143,9 @@ class GrainPoolElement:
 
   record: Any
   worker_index: Any
+  # Size counted against `MultiprocessingOptions.max_buffered_bytes`, must be
+  # released with `GrainPool.release_buffered_bytes` once consumed.
+  nbytes: int = 0
 
 
 class RemoteWorkerError(Exception):
@@ -120,6 +173,90 @@ def _print_profile(preamble: str, profile: cProfile.Profile):
   stats.print_stats()
 
 
+# Collects shared memory blocks created by `dumps_with_shared_arrays` in the
+# current thread. Arrays are only shared while the pool collects them so that
+# the pool can unlink the blocks.
+_shared_arrays_collector = threading.local()
+
+
+@contextlib.contextmanager
+def _collect_shared_arrays() -> (
+    Iterator[list[shared_memory_array.SharedMemoryArrayMetadata]]
+):
+  """Enables sharing arrays and yields the list of created blocks."""
+  shared_arrays = []
+  _shared_arrays_collector.shared_arrays = shared_arrays
+  try:
+    yield shared_arrays
+  finally:
+    _shared_arrays_collector.shared_arrays = None
+
+
+def _open_shared_array(
+    metadata: shared_memory_array.SharedMemoryArrayMetadata,
+) -> np.ndarray:
+  """Maps an array shared by `dumps_with_shared_arrays` without copying."""
+  array = shared_memory_array.SharedMemoryArray.from_metadata(metadata).view(
+      np.ndarray
+  )
+  array.flags.writeable = False
+  return array
+
+
+class _SharedArrayPickler(cloudpickle.Pickler):
+  """Pickler placing large NumPy arrays into shared memory."""
+
+  def __init__(
+      self,
+      file: io.BytesIO,
+      shared_arrays: list[shared_memory_array.SharedMemoryArrayMetadata],
+  ):
+    super().__init__(file)
+    self._shared_arrays = shared_arrays
+
+  def reducer_override(self, obj: Any) -> Any:
+    if (
+        type(obj) is np.ndarray  # pylint: disable=unidiomatic-typecheck
+        and obj.nbytes >= _SHARED_ARRAY_MIN_SIZE
+        and not obj.dtype.hasobject
+    ):
+      shared = shared_memory_array.SharedMemoryArray(obj.shape, obj.dtype)
+      np.copyto(shared, obj, casting="no")
+      self._shared_arrays.append(shared.metadata)
+      return _open_shared_array, (shared.metadata,)
+    return super().reducer_override(obj)
+
+
+def dumps_with_shared_arrays(obj: Any) -> bytes:
+  """Pickles `obj` with cloudpickle sharing large NumPy arrays.
+
+  When called while `GrainPool` serializes an element producer, NumPy arrays of
+  at least `_SHARED_ARRAY_MIN_SIZE` bytes are copied into shared memory once
+  and the workers map them read-only instead of unpickling a copy each. The
+  pool unlinks the shared memory once all workers loaded the element producer.
+  Otherwise, equivalent to `cloudpickle.dumps`.
+
+  Args:
+    obj: Object to pickle.
+
+  Returns:
+    The pickled object.
+  """
+  shared_arrays = getattr(_shared_arrays_collector, "shared_arrays", None)
+  if shared_arrays is None:
+    return cloudpickle.dumps(obj)
+  file = io.BytesIO()
+  created = []
+  try:
+    _SharedArrayPickler(file, created).dump(obj)
+  except Exception:
+    for metadata in created:
+      metadata.close_and_unlink_shm()
+    raise
+  shared_arrays.extend(created)
+  return file.getvalue()
+
+
 @runtime_checkable
 class GetElementProducerFn(Protocol[T]):
   """A callable class able to generate elements with serialization support."""
@@ -135,10 +272,13 @@ class GetElementProducerFn(Protocol[T]):
     i.e. `GetElementProducerFn.deserialize(obj.serialize())` should return the
     same object as `obj: GetElementProducerFn`.
 
+    Large NumPy arrays held by the object are shared with the workers through
+    shared memory, see `dumps_with_shared_arrays`.
+
     Returns:
       a serialized string of myself.
     """
-    return cloudpickle.dumps(self)
+    return dumps_with_shared_arrays(self)
 
   @classmethod
   def deserialize(cls, serialized: bytes) -> GetElementProducerFn[T]:
@@ -154,66 +294,239 @@ class GetElementProducerFn(Protocol[T]):
     return obj
 
 
+def _serialize_element_producer_fn(
+    get_element_producer_fn: GetElementProducerFn[Any],
+) -> bytes:
+  """Serializes `get_element_producer_fn` adding a hint to errors."""
+  try:
+    return get_element_producer_fn.serialize()
+  except Exception as e:
+    if sys.version_info >= (3, 11):
+      e.add_note(
+          "\nCould not serialize transformation function passed to Grain "
+          "workers. This likely means that your data source, sampler or one "
+          "of your transformations cannot be serialized. Please make sure "
+          "that the objects work with cloudpickle.dumps()."
+      )
+    raise e
+
+
+def _make_element_producer(
+    serialized_element_producer_fn: (
+        bytes | shared_memory_array.SharedMemoryArrayMetadata
+    ),
+    *,
+    worker_index: int,
+    worker_count: int,
+) -> Iterator[Any]:
+  """Deserializes the element producer fn and makes the element producer."""
+  if isinstance(
+      serialized_element_producer_fn,
+      shared_memory_array.SharedMemoryArrayMetadata,
+  ):
+    # The block is owned and unlinked by the pool.
+    buffer = shared_memory_array.SharedMemoryArray.from_metadata(
+        serialized_element_producer_fn
+    )
+    element_producer_fn = GetElementProducerFn.deserialize(buffer.data)
+    del buffer
+  else:
+    element_producer_fn = GetElementProducerFn.deserialize(
+        serialized_element_producer_fn
+    )
+  return element_producer_fn(
+      worker_index=worker_index, worker_count=worker_count
+  )
+
+
 def _initialize_and_get_element_producer(
     args_queue: queues.Queue, *, worker_index: int, worker_count: int
 ) -> Iterator[Any]:
-  """Unpickles the element producer from the args queue and closes the queue."""
+  """Unpickles the element producer from the args queue."""
   serialized_init_fn, serialized_element_producer_fn = args_queue.get()
   init_fn: Callable[[], None] = cloudpickle.loads(serialized_init_fn)
   init_fn()
-  element_producer_fn: GetElementProducerFn[Any] = (
-      GetElementProducerFn.deserialize(serialized_element_producer_fn)
+  # The args queue stays open: `GrainPool.reset` sends new element producers
+  # through it.
+  return _make_element_producer(
+      serialized_element_producer_fn,
+      worker_index=worker_index,
+      worker_count=worker_count,
   )
 
-  element_producer = element_producer_fn(
-      worker_index=worker_index, worker_count=worker_count
-  )
-  # args_queue has only a single argument and thus can be safely closed.
-  args_queue.close()
-  return element_producer
+
+def _get_reset_element_producer(
+    args_queue: queues.Queue,
+    termination_event: synchronize.Event,
+    current_generation: ctypes.c_int64 | None,
+    *,
+    worker_index: int,
+    worker_count: int,
+) -> tuple[int, Iterator[Any]] | None:
+  """Waits for the next element producer sent by `GrainPool.reset`.
+
+  Args:
+    args_queue: Queue to read `(generation, serialized_element_producer_fn)`
+      from.
+    termination_event: Event indicating that the pool is shutting down.
+    current_generation: Generation of the last reset.
+    worker_index: Index of the current worker.
+    worker_count: Total number of workers.
+
+  Returns:
+    Generation and the element producer or None if the pool is shutting down.
+  """
+  while not termination_event.is_set():
+    try:
+      args = args_queue.get(timeout=_QUEUE_WAIT_TIMEOUT)
+    except queue.Empty:
+      continue
+    if args is None:
+      # Sent by `GrainPool._shutdown` to wake up the worker.
+      return None
+    generation, serialized_element_producer_fn = args
+    if (
+        current_generation is not None
+        and generation < current_generation.value
+    ):
+      # The pool was reset again, skip deserializing the outdated producer.
+      continue
+    return generation, _make_element_producer(
+        serialized_element_producer_fn,
+        worker_index=worker_index,
+        worker_count=worker_count,
+    )
+  return None
 
 
 def _worker_loop(
     *,
     args_queue: queues.Queue,
     errors_queue: queues.Queue,
-    output_queue: queues.Queue,
+    output_queue: queues.Queue | shared_memory_channel.SharedMemoryChannel,
     termination_event: synchronize.Event,
     worker_index: int,
     worker_count: int,
     enable_profiling: bool,
+    arena_slab_names: list[str] | None = None,
+    elements_ready: synchronize.Semaphore | None = None,
+    current_generation: ctypes.c_int64 | None = None,
+    worker_ready_times: ctypes.Array[ctypes.c_double] | None = None,
+    worker_generations: ctypes.Array[ctypes.c_int64] | None = None,
+    max_buffered_bytes: int | None = None,
+    charged_bytes: ctypes.Array[ctypes.c_int64] | None = None,
+    released_bytes: ctypes.Array[ctypes.c_int64] | None = None,
+    buffer_memory_released: synchronize.Condition | None = None,
+    per_worker_buffer_size: ctypes.c_int64 | None = None,
+    put_elements: ctypes.Array[ctypes.c_int64] | None = None,
+    taken_elements: ctypes.Array[ctypes.c_int64] | None = None,
+    worker_buffer_released: synchronize.Condition | None = None,
 ):
   """Code to be run on each child process."""
   out_of_elements = False
+  generation = 0
+
+  def generation_changed() -> bool:
+    return (
+        current_generation is not None
+        and current_generation.value != generation
+    )
+
+  def should_stop() -> bool:
+    return termination_event.is_set() or generation_changed()
+
   try:
     grain_logging.set_process_identifier_prefix(
         f"PyGrain Worker {worker_index}"
     )
     logging.info("Starting work.")
+    multiprocessing_common.mark_as_worker_process()
+    if arena_slab_names:
+      shared_memory_array.SharedMemoryArray.enable_arena(
+          shared_memory_array.SharedMemoryArena.attach(arena_slab_names)
+      )
     element_producer = _initialize_and_get_element_producer(
         args_queue, worker_index=worker_index, worker_count=worker_count
     )
+    if worker_ready_times is not None:
+      worker_ready_times[worker_index] = time.time()
+    if worker_generations is not None:
+      worker_generations[worker_index] = generation
     profiling_enabled = enable_profiling and worker_index == 0
     if profiling_enabled:
       profile = cProfile.Profile()
       profile.enable()
     # If termination event is set, we terminate and discard remaining elements.
     while not termination_event.is_set():
+      if out_of_elements or generation_changed():
+        # Keep the process alive until the pool is reset with a new element
+        # producer or shut down.
+        reset = _get_reset_element_producer(
+            args_queue,
+            termination_event,
+            current_generation,
+            worker_index=worker_index,
+            worker_count=worker_count,
+        )
+        if reset is None:
+          break
+        generation, element_producer = reset
+        if worker_generations is not None:
+          worker_generations[worker_index] = generation
+        out_of_elements = False
+        continue
       try:
         next_element = next(element_producer)
-        if not multiprocessing_common.add_element_to_queue(  # pytype: disable=wrong-arg-types
-            next_element, output_queue, termination_event.is_set
+        nbytes = 0
+        if max_buffered_bytes is not None:
+          nbytes = autotune.element_nbytes(next_element)
+          if not _wait_for_buffer_memory(
+              nbytes,
+              max_buffered_bytes,
+              charged_bytes,
+              released_bytes,
+              buffer_memory_released,
+              worker_index=worker_index,
+              should_stop=should_stop,
+          ):
+            _unlink_shm_in_structure(next_element)
+            continue
+        if per_worker_buffer_size is not None and not _wait_for_buffer_slot(
+            per_worker_buffer_size,
+            put_elements,
+            taken_elements,
+            worker_buffer_released,
+            worker_index=worker_index,
+            should_stop=should_stop,
+        ):
+          _unlink_shm_in_structure(next_element)
+          if charged_bytes is not None:
+            charged_bytes[worker_index] -= nbytes
+          continue
+        next_element = _dump_out_of_band(next_element, generation, nbytes)
+        if multiprocessing_common.add_element_to_queue(  # pytype: disable=wrong-arg-types
+            next_element, output_queue, should_stop
         ):
+          if elements_ready is not None:
+            elements_ready.release()
+        else:
           # We failed to put the element into the output queue because the
-          # termination event was set. The element may contain a shared memory
-          # block reference that has to be cleaned up.
+          # termination event was set or the pool was reset. The element may
+          # contain a shared memory block reference that has to be cleaned up.
           _unlink_shm_in_structure(next_element)
+          if charged_bytes is not None:
+            charged_bytes[worker_index] -= nbytes
+          if put_elements is not None:
+            put_elements[worker_index] -= 1
       except StopIteration:
         out_of_elements = True
-        multiprocessing_common.add_element_to_queue(  # pytype: disable=wrong-arg-types
-            _ProcessingComplete(), output_queue, termination_event.is_set
-        )
-        break
+        if (
+            multiprocessing_common.add_element_to_queue(  # pytype: disable=wrong-arg-types
+                _ProcessingComplete(generation), output_queue, should_stop
+            )
+            and elements_ready is not None
+        ):
+          elements_ready.release()
     if profiling_enabled:
       profile.disable()
       _print_profile(f"PROFILE OF PROCESS WITH IDX {worker_index}.", profile)
@@ -240,12 +553,11 @@ def _worker_loop(
     termination_event.set()
 
   if termination_event.is_set():
-    if not out_of_elements:
-      # Since the termination event is set the consumer will not get any more
-      # elements from the output queue. The elements may contain reference to
-      # shared memory blocks that have to be cleaned up.
-      while not output_queue.empty():
-        _unlink_shm_in_structure(output_queue.get_nowait())
+    # Since the termination event is set the consumer will not get any more
+    # elements from the output queue. The elements may contain reference to
+    # shared memory blocks that have to be cleaned up.
+    while not output_queue.empty():
+      _unlink_shm_in_structure(output_queue.get_nowait())
     # When adding elements to the queue, element is put in a buffer and a
     # background thread flushes the elements through the pipe. The process that
     # writes to the queue joins that thread automatically on exit. We call
@@ -255,18 +567,232 @@ def _worker_loop(
   logging.info("Process %i exiting.", worker_index)
 
 
+def _wait_for_buffer_memory(
+    nbytes: int,
+    max_buffered_bytes: int,
+    charged_bytes: ctypes.Array[ctypes.c_int64],
+    released_bytes: ctypes.Array[ctypes.c_int64],
+    buffer_memory_released: synchronize.Condition,
+    *,
+    worker_index: int,
+    should_stop: Callable[[], bool],
+) -> bool:
+  """Waits until an element of `nbytes` fits into the buffers and charges it.
+
+  Each worker counts the bytes it has put into its output queue in
+  `charged_bytes` and the main process counts the bytes it has consumed in
+  `released_bytes`, so each counter has a single writer. A worker without
+  buffered elements can always put one. Otherwise a worker the main process
+  reads from next in round-robin order could wait for bytes buffered by other
+  workers that are only consumed after its element.
+
+  Args:
+    nbytes: Size of the element.
+    max_buffered_bytes: Budget shared by all workers.
+    charged_bytes: Bytes put into the output queue by each worker.
+    released_bytes: Bytes consumed by the main process from each worker.
+    buffer_memory_released: Notified by the main process when it consumes
+      elements, resets the pool or shuts it down.
+    worker_index: Index of the current worker.
+    should_stop: Checked while waiting, the wait is abandoned once it returns
+      True.
+
+  Returns:
+    Whether the element was charged.
+  """
+  with buffer_memory_released:
+    while True:
+      own_buffered_bytes = (
+          charged_bytes[worker_index] - released_bytes[worker_index]
+      )
+      buffered_bytes = sum(charged_bytes) - sum(released_bytes)
+      if (
+          own_buffered_bytes <= 0
+          or buffered_bytes + nbytes <= max_buffered_bytes
+      ):
+        charged_bytes[worker_index] += nbytes
+        return True
+      if should_stop():
+        return False
+      # The timeout only guards against a main process that died without
+      # notifying the workers.
+      buffer_memory_released.wait(_QUEUE_WAIT_TIMEOUT)
+
+
+def _wait_for_buffer_slot(
+    per_worker_buffer_size: ctypes.c_int64,
+    put_elements: ctypes.Array[ctypes.c_int64],
+    taken_elements: ctypes.Array[ctypes.c_int64],
+    worker_buffer_released: synchronize.Condition,
+    *,
+    worker_index: int,
+    should_stop: Callable[[], bool],
+) -> bool:
+  """Waits until the worker buffers fewer than `per_worker_buffer_size` elements.
+
+  With `MultiprocessingOptions.autotune` the output queues have room for the
+  largest `per_worker_buffer_size` and the main process tunes the size shared
+  with the workers. Each worker counts the elements it has put into its output
+  queue in `put_elements` and the main process the elements it has taken from
+  it in `taken_elements`.
+
+  Args:
+    per_worker_buffer_size: Current number of elements each worker may buffer.
+    put_elements: Elements put into the output queue by each worker.
+    taken_elements: Elements taken by the main process from each worker.
+    worker_buffer_released: Notified by the main process when it takes
+      elements, changes `per_worker_buffer_size`, resets the pool or shuts it
+      down.
+    worker_index: Index of the current worker.
+    should_stop: Checked while waiting, the wait is abandoned once it returns
+      True.
+
+  Returns:
+    Whether the element was counted in `put_elements`.
+  """
+  with worker_buffer_released:
+    while (
+        put_elements[worker_index] - taken_elements[worker_index]
+        >= per_worker_buffer_size.value
+    ):
+      if should_stop():
+        return False
+      # The timeout only guards against a main process that died without
+      # notifying the workers.
+      worker_buffer_released.wait(_QUEUE_WAIT_TIMEOUT)
+    put_elements[worker_index] += 1
+    return True
+
+
 def _unlink_shm_if_metadata(obj: Any):
   if isinstance(obj, shared_memory_array.SharedMemoryArrayMetadata):
     obj.close_and_unlink_shm()
 
 
 def _unlink_shm_in_structure(structure: Any):
+  if isinstance(structure, _OutOfBandElement):
+    structure = _load_out_of_band(structure)
   if isinstance(structure, record.Record):
     _unlink_shm_in_structure(structure.data)
   else:
     tree.map_structure(_unlink_shm_if_metadata, structure)
 
 
+class _OutOfBandBytes:
+  """Pickles a `bytes`, `bytearray` or `str` value as an out-of-band buffer.
+
+  Pickle protocol 5 passes buffers of NumPy arrays out-of-band but always
+  serializes built-in strings in-band.
+  """
+
+  __slots__ = ("value",)
+
+  def __init__(self, value: bytes | bytearray | str):
+    self.value = value
+
+  def __reduce_ex__(self, protocol):
+    if isinstance(self.value, str):
+      return str, (pickle.PickleBuffer(self.value.encode()), "utf-8")
+    return type(self.value), (pickle.PickleBuffer(self.value),)
+
+
+def _prepare_leaf_for_out_of_band(leaf: Any) -> Any:
+  if (
+      isinstance(leaf, (bytes, bytearray, str))
+      and len(leaf) >= _OUT_OF_BAND_MIN_BUFFER_SIZE
+  ):
+    return _OutOfBandBytes(leaf)
+  return leaf
+
+
+class _OutOfBandPickler(reduction.ForkingPickler):
+  """Pickler of `multiprocessing.Queue` that makes large arrays contiguous.
+
+  Only C- or Fortran-contiguous arrays are pickled as out-of-band buffers, so
+  other arrays are copied once here instead of being serialized in-band.
+  """
+
+  def reducer_override(self, obj):
+    if (
+        type(obj) is np.ndarray  # pylint: disable=unidiomatic-typecheck
+        and obj.nbytes >= _OUT_OF_BAND_MIN_BUFFER_SIZE
+        and not obj.dtype.hasobject
+        and not (obj.flags.c_contiguous or obj.flags.f_contiguous)
+    ):
+      return np.ascontiguousarray(obj).__reduce_ex__(5)
+    return NotImplemented
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class _OutOfBandElement:
+  """Element pickled with its large buffers placed in shared memory."""
+
+  data: bytes
+  buffers: list[shared_memory_array.SharedMemoryArrayMetadata]
+  # Generation of the element producer, see `GrainPool.reset`.
+  generation: int = 0
+  # Size charged against `MultiprocessingOptions.max_buffered_bytes`.
+  nbytes: int = 0
+
+
+def _dump_out_of_band(
+    element: Any, generation: int = 0, nbytes: int = 0
+) -> _OutOfBandElement:
+  """Pickles `element` moving buffers of large leaves to shared memory.
+
+  Every buffer of at least `_OUT_OF_BAND_MIN_BUFFER_SIZE` bytes the pickler
+  produces, e.g. of NumPy arrays nested in arbitrary objects, is copied once
+  into a shared memory segment. Large `bytes`, `bytearray` and `str` leaves of
+  the element's structure are passed the same way.
+
+  Args:
+    element: Element produced by the worker.
+    generation: Generation of the element producer.
+    nbytes: Size charged against `MultiprocessingOptions.max_buffered_bytes`.
+
+  Returns:
+    The pickled element with the metadata of its shared memory buffers.
+  """
+  if isinstance(element, record.Record):
+    element = record.Record(
+        element.metadata,
+        tree.map_structure(_prepare_leaf_for_out_of_band, element.data),
+    )
+  else:
+    element = tree.map_structure(_prepare_leaf_for_out_of_band, element)
+  buffers = []
+
+  def buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+    raw = buffer.raw()
+    if raw.nbytes < _OUT_OF_BAND_MIN_BUFFER_SIZE:
+      return True
+    shm = shared_memory_array.SharedMemoryArray((raw.nbytes,), np.uint8)
+    shm[:] = np.frombuffer(raw, np.uint8)
+    buffers.append(shm.metadata)
+    return False
+
+  file = io.BytesIO()
+  try:
+    _OutOfBandPickler(file, 5, True, buffer_callback).dump(element)
+  except Exception:
+    for metadata in buffers:
+      metadata.close_and_unlink_shm()
+    raise
+  return _OutOfBandElement(file.getvalue(), buffers, generation, nbytes)
+
+
+def _load_out_of_band(element: _OutOfBandElement) -> Any:
+  """Unpickles `element` on top of its shared memory buffers."""
+  buffers = []
+  for metadata in element.buffers:
+    buffer = shared_memory_array.SharedMemoryArray.from_metadata(metadata)
+    # Unpickled objects refer to the buffer which unlinks the shared memory
+    # once they are all deleted.
+    buffer.unlink_on_del()
+    buffers.append(buffer)
+  return pickle.loads(element.data, buffers=buffers)
+
+
 class GrainPool(Iterator[T]):
   """Pool to parallelize processing of Grain pipelines among a set of processes."""
 
@@ -295,25 +821,89 @@ class GrainPool(Iterator[T]):
     self.processes = []
     self.termination_event = ctx.Event()
     self.completed_processes = set()
+    self._processing_failed = False
+    self._deterministic = options.deterministic
+    # In non-deterministic mode workers release the semaphore after putting an
+    # element into their output queue.
+    self._elements_ready = None if self._deterministic else ctx.Semaphore(0)
+    # Incremented by `reset`. Workers tag their elements with the generation of
+    # their element producer so that elements produced before the reset can be
+    # discarded.
+    self._generation = 0
+    self._current_generation = ctx.RawValue(ctypes.c_int64, 0)
+    # Times when the worker processes were started and when they became ready
+    # to produce elements, the latter are set by the workers.
+    self._worker_start_times = ctx.RawArray(ctypes.c_double, self.num_processes)
+    self._worker_ready_times = ctx.RawArray(ctypes.c_double, self.num_processes)
+    self._reported_startup_latency = [False] * self.num_processes
+    # Generations of the element producers loaded by the workers and shared
+    # memory blocks holding large serialized element producers or arrays shared
+    # by them together with their generation. A block is unlinked once all
+    # workers loaded its generation.
+    self._worker_generations = ctx.RawArray(
+        ctypes.c_int64, [-1] * self.num_processes
+    )
+    self._shared_memory_blocks: list[
+        tuple[int, shared_memory_array.SharedMemoryArrayMetadata]
+    ] = []
+    # With `max_buffered_bytes` the workers count the bytes of the elements
+    # they put into their output queues and the main process the bytes it has
+    # consumed, see `_wait_for_buffer_memory`. Workers waiting for memory block
+    # on the condition until the main process consumes elements.
+    self._max_buffered_bytes = options.max_buffered_bytes
+    self._charged_bytes = None
+    self._released_bytes = None
+    self._buffer_memory_released = None
+    self._released_bytes_lock = threading.Lock()
+    self._reported_buffered_bytes = 0
+    if self._max_buffered_bytes is not None:
+      self._charged_bytes = ctx.RawArray(ctypes.c_int64, self.num_processes)
+      self._released_bytes = ctx.RawArray(ctypes.c_int64, self.num_processes)
+      self._buffer_memory_released = ctx.Condition()
+    # With `autotune` the output queues have room for the largest
+    # `per_worker_buffer_size` and the workers wait until they buffer fewer
+    # elements than the tuned size, see `_wait_for_buffer_slot`.
+    self._per_worker_buffer_size = None
+    self._put_elements = None
+    self._taken_elements = None
+    self._worker_buffer_released = None
+    output_queue_size = options.per_worker_buffer_size
+    if options.autotune:
+      self._per_worker_buffer_size = ctx.RawValue(
+          ctypes.c_int64, options.per_worker_buffer_size
+      )
+      self._put_elements = ctx.RawArray(ctypes.c_int64, self.num_processes)
+      self._taken_elements = ctx.RawArray(ctypes.c_int64, self.num_processes)
+      self._worker_buffer_released = ctx.Condition()
+      output_queue_size *= _AUTOTUNE_MAX_BUFFER_SIZE_MULTIPLIER
+    # Shared memory arenas the workers allocate arrays from. The pool owns them
+    # and unlinks them on shutdown.
+    self._arenas = []
     # Queue to propagate errors from child processes to the parent. Note that
     # this queue is shared by all child processes.
     self.worker_error_queue = ctx.Queue(self.num_processes)
 
-    try:
-      get_element_producer_fn = get_element_producer_fn.serialize()
-    except Exception as e:
-      if sys.version_info >= (3, 11):
-        e.add_note(
-            "\nCould not serialize transformation function passed to Grain "
-            "workers. This likely means that your data source, sampler or one "
-            "of your transformations cannot be serialized. Please make sure "
-            "that the objects work with cloudpickle.dumps()."
-        )
-      raise e
+    # Serialize once and send the same bytes to every worker.
+    get_element_producer_fn = self._share_element_producer_fn(
+        get_element_producer_fn
+    )
+    worker_init_fn = cloudpickle.dumps(lambda: None)
 
     for worker_index in range(self.num_processes):
-      worker_args_queue = ctx.Queue(1)
-      worker_output_queue = ctx.Queue(options.per_worker_buffer_size)
+      # Besides the initial arguments, the queue receives new element producers
+      # from `reset`.
+      worker_args_queue = ctx.Queue()
+      if options.shared_memory_channel_size > 0:
+        # Slots keep their size when the channel has room for more elements.
+        worker_output_queue = shared_memory_channel.SharedMemoryChannel(
+            ctx,
+            output_queue_size,
+            options.shared_memory_channel_size
+            * output_queue_size
+            // options.per_worker_buffer_size,
+        )
+      else:
+        worker_output_queue = ctx.Queue(output_queue_size)
       process_kwargs = {
           "args_queue": worker_args_queue,
           "errors_queue": self.worker_error_queue,
@@ -322,13 +912,29 @@ class GrainPool(Iterator[T]):
           "worker_index": worker_index,
           "worker_count": options.num_workers,
           "enable_profiling": options.enable_profiling,
+          "elements_ready": self._elements_ready,
+          "current_generation": self._current_generation,
+          "worker_ready_times": self._worker_ready_times,
+          "worker_generations": self._worker_generations,
+          "max_buffered_bytes": self._max_buffered_bytes,
+          "charged_bytes": self._charged_bytes,
+          "released_bytes": self._released_bytes,
+          "buffer_memory_released": self._buffer_memory_released,
+          "per_worker_buffer_size": self._per_worker_buffer_size,
+          "put_elements": self._put_elements,
+          "taken_elements": self._taken_elements,
+          "worker_buffer_released": self._worker_buffer_released,
       }
+      if options.shared_memory_arena_size > 0:
+        arena = shared_memory_array.SharedMemoryArena.create(
+            options.shared_memory_arena_size, _ARENA_NUM_SLABS
+        )
+        self._arenas.append(arena)
+        process_kwargs["arena_slab_names"] = arena.slab_names
       # The process kwargs must all be pickable and will be unpickle before
       # absl.app.run() is called. We send arguments via a queue to ensure that
       # they are unpickled after absl.app.run() was called in the child
       # processes.
-      worker_init_fn = lambda: None
-      worker_init_fn = cloudpickle.dumps(worker_init_fn)
       worker_args_queue.put((worker_init_fn, get_element_producer_fn))
       process = ctx.Process(  # pytype: disable=attribute-error  # re-none
           target=_worker_loop, kwargs=process_kwargs, daemon=True
@@ -337,11 +943,14 @@ class GrainPool(Iterator[T]):
       self.worker_output_queues.append(worker_output_queue)
       self.processes.append(process)
 
-    logging.info("Grain pool will start child processes.")
+    logging.info(
+        "Grain pool will start child processes with the %s start method.",
+        ctx.get_start_method(),
+    )
     parallel.run_in_parallel(
-        function=lambda child_process: child_process.start(),
+        function=self._start_process,
         list_of_kwargs_to_function=[
-            {"child_process": p} for p in self.processes
+            {"worker_index": i} for i in range(self.num_processes)
         ],
         num_workers=min(_PROCESS_MANAGEMENT_MAX_THREADS, self.num_processes),
     )
@@ -351,6 +960,104 @@ class GrainPool(Iterator[T]):
   def __iter__(self) -> GrainPool:
     return self
 
+  def _start_process(self, worker_index: int) -> None:
+    self._worker_start_times[worker_index] = time.time()
+    self.processes[worker_index].start()
+
+  def worker_startup_latencies(self) -> list[float | None]:
+    """Returns seconds each worker took to start, None if not yet started.
+
+    The startup includes starting the interpreter, importing modules and
+    unpickling the element producer.
+    """
+    return [
+        ready_time - start_time if ready_time else None
+        for start_time, ready_time in zip(
+            self._worker_start_times, self._worker_ready_times
+        )
+    ]
+
+  def _report_startup_latency(self, worker_index: int) -> None:
+    if self._reported_startup_latency[worker_index]:
+      return
+    latency = self.worker_startup_latencies()[worker_index]
+    if latency is None:
+      return
+    self._reported_startup_latency[worker_index] = True
+    logging.info("Worker %i started in %.2f s.", worker_index, latency)
+    _worker_startup_time_metric.Record(int(latency * 1e9))
+
+  def can_reset(self) -> bool:
+    """Returns whether the worker processes can be reused by `reset`."""
+    return not self.termination_event.is_set()
+
+  def reset(
+      self,
+      get_element_producer_fn: GetElementProducerFn[T],
+      worker_index_to_start_reading: int = 0,
+  ) -> None:
+    """Replaces element producers of the workers without restarting them.
+
+    Elements produced by the previous element producers that haven't been read
+    yet are discarded. Must not be called concurrently with `__next__`.
+
+    Args:
+      get_element_producer_fn: Callable that returns an iterator over the
+        elements given the process index and process count.
+      worker_index_to_start_reading: index of worker to start reading output
+        batches from (needed for checkpointing support).
+    """
+    if not self.can_reset():
+      raise ValueError("Cannot reset a GrainPool that was shut down.")
+    self._unlink_loaded_element_producer_fns()
+    self._generation += 1
+    serialized_element_producer_fn = self._share_element_producer_fn(
+        get_element_producer_fn
+    )
+    self._current_generation.value = self._generation
+    self._notify_buffer_released()
+    for args_queue in self.worker_args_queues:
+      args_queue.put((self._generation, serialized_element_producer_fn))
+    self.completed_processes = set()
+    self._next_worker_index = worker_index_to_start_reading
+
+  def _share_element_producer_fn(
+      self, get_element_producer_fn: GetElementProducerFn[T]
+  ) -> bytes | shared_memory_array.SharedMemoryArrayMetadata:
+    """Serializes the element producer fn to be sent to all workers.
+
+    Large arrays held by the element producer fn and large serialized element
+    producer fns are placed into shared memory.
+
+    Args:
+      get_element_producer_fn: Element producer fn to serialize.
+
+    Returns:
+      The serialized element producer fn or its shared memory block.
+    """
+    with _collect_shared_arrays() as shared_arrays:
+      serialized = _serialize_element_producer_fn(get_element_producer_fn)
+    self._shared_memory_blocks.extend(
+        (self._generation, metadata) for metadata in shared_arrays
+    )
+    if len(serialized) < _SHARED_ELEMENT_PRODUCER_MIN_SIZE:
+      return serialized
+    buffer = shared_memory_array.SharedMemoryArray((len(serialized),), np.uint8)
+    buffer[:] = np.frombuffer(serialized, np.uint8)
+    self._shared_memory_blocks.append((self._generation, buffer.metadata))
+    return buffer.metadata
+
+  def _unlink_loaded_element_producer_fns(self) -> None:
+    """Unlinks shared memory blocks of generations all workers have loaded."""
+    if not self._shared_memory_blocks:
+      return
+    loaded_generation = min(self._worker_generations)
+    while (
+        self._shared_memory_blocks
+        and self._shared_memory_blocks[0][0] <= loaded_generation
+    ):
+      self._shared_memory_blocks.pop(0)[1].close_and_unlink_shm()
+
   def _process_failed(self, worker_index: int) -> bool:
     exit_code = self.processes[worker_index].exitcode
     return exit_code is not None and exit_code != 0
@@ -361,8 +1068,14 @@ class GrainPool(Iterator[T]):
   def _update_next_worker_index(self) -> None:
     self._next_worker_index = (self._next_worker_index + 1) % self.num_processes
 
-  def __next__(self) -> GrainPoolElement:
-    processing_failed = False
+  def _find_failed_process(self) -> int | None:
+    for worker_index in range(self.num_processes):
+      if self._process_failed(worker_index):
+        return worker_index
+    return None
+
+  def _next_in_order(self) -> GrainPoolElement | None:
+    """Returns the next element reading the workers in round-robin order."""
     while (
         not self.termination_event.is_set()
         and len(self.completed_processes) < self.num_processes
@@ -376,7 +1089,16 @@ class GrainPool(Iterator[T]):
             timeout=_QUEUE_WAIT_TIMEOUT
         )
         logging.debug("Read element from process: %s", self._next_worker_index)
-        if element == _PROCESSING_COMPLETE:
+        if not isinstance(element, _ProcessingComplete):
+          self._take_buffered_element(element_worker_index)
+        if element.generation != self._generation:
+          # Produced before the last reset.
+          self.release_buffered_bytes(
+              element_worker_index, getattr(element, "nbytes", 0)
+          )
+          _unlink_shm_in_structure(element)
+          continue
+        if isinstance(element, _ProcessingComplete):
           logging.info(
               "Processing complete for process with worker_index %i",
               self._next_worker_index,
@@ -385,19 +1107,115 @@ class GrainPool(Iterator[T]):
           self._update_next_worker_index()
         else:
           self._update_next_worker_index()
-          return GrainPoolElement(element, element_worker_index)
+          return GrainPoolElement(
+              _load_out_of_band(element), element_worker_index, element.nbytes
+          )
       except queue.Empty:
         logging.debug("Got no element from process %s", self._next_worker_index)
         if self._process_failed(self._next_worker_index):
-          processing_failed = True
+          self._processing_failed = True
           logging.info(
               "Process with idx %i Failed (Exitcode: %s).",
               self._next_worker_index,
               self.processes[self._next_worker_index].exitcode,
           )
           break
+    return None
+
+  def _get_first_ready(self) -> tuple[int, Any] | None:
+    """Returns the first available element scanning from the next worker."""
+    for _ in range(self.num_processes):
+      worker_index = self._next_worker_index
+      self._update_next_worker_index()
+      if worker_index in self.completed_processes:
+        continue
+      try:
+        return worker_index, self.worker_output_queues[worker_index].get_nowait()
+      except queue.Empty:
+        pass
+    return None
+
+  def _wait_for_transferred_elements(self) -> None:
+    """Waits until elements signalled by workers can be read from the queues.
+
+    `multiprocessing.Queue.put` returns before the queue's feeder thread writes
+    the element to the pipe, so a worker may signal an element that can't be
+    read yet.
+    """
+    readers = [
+        output_queue._reader  # pylint: disable=protected-access
+        for worker_index, output_queue in enumerate(self.worker_output_queues)
+        if worker_index not in self.completed_processes
+        and isinstance(output_queue, queues.Queue)
+    ]
+    if readers:
+      connection.wait(readers, timeout=_QUEUE_WAIT_TIMEOUT)
+    else:
+      # Elements are readable from shared memory channels once signalled.
+      time.sleep(0)
+
+  def _next_first_ready(self) -> GrainPoolElement | None:
+    """Returns the next element from whichever worker has one ready."""
+    assert self._elements_ready is not None
+    ready = False
+    while (
+        not self.termination_event.is_set()
+        and len(self.completed_processes) < self.num_processes
+    ):
+      if not ready:
+        ready = self._elements_ready.acquire(timeout=_QUEUE_WAIT_TIMEOUT)
+      result = self._get_first_ready() if ready else None
+      if result is None:
+        # Either no worker has produced an element or the element is still
+        # being transferred.
+        failed_worker_index = self._find_failed_process()
+        if failed_worker_index is not None:
+          self._processing_failed = True
+          self._next_worker_index = failed_worker_index
+          logging.info(
+              "Process with idx %i Failed (Exitcode: %s).",
+              failed_worker_index,
+              self.processes[failed_worker_index].exitcode,
+          )
+          break
+        if ready:
+          self._wait_for_transferred_elements()
+        continue
+      ready = False
+      worker_index, element = result
+      if not isinstance(element, _ProcessingComplete):
+        self._take_buffered_element(worker_index)
+      if element.generation != self._generation:
+        # Produced before the last reset.
+        self.release_buffered_bytes(worker_index, getattr(element, "nbytes", 0))
+        _unlink_shm_in_structure(element)
+        continue
+      if isinstance(element, _ProcessingComplete):
+        logging.info(
+            "Processing complete for process with worker_index %i",
+            worker_index,
+        )
+        self.completed_processes.add(worker_index)
+        continue
+      return GrainPoolElement(
+          _load_out_of_band(element), worker_index, element.nbytes
+      )
+    return None
 
-    if processing_failed or self.termination_event.is_set():
+  def __next__(self) -> GrainPoolElement:
+    if self._deterministic:
+      element = self._next_in_order()
+    else:
+      element = self._next_first_ready()
+    if element is not None:
+      self._report_startup_latency(element.worker_index)
+      if self._charged_bytes is not None:
+        self._report_buffered_bytes()
+      if self._shared_memory_blocks:
+        self._unlink_loaded_element_producer_fns()
+      return element
+
+    if self._processing_failed or self.termination_event.is_set():
       logging.error("Processing Failed. Shutting down.")
       self._shutdown()
 
@@ -419,6 +1237,73 @@ class GrainPool(Iterator[T]):
     # Processing successfully completed.
     raise StopIteration
 
+  def release_buffered_bytes(self, worker_index: int, nbytes: int) -> None:
+    """Marks an element of `nbytes` produced by the worker as consumed.
+
+    Must be called for every element returned by the pool once it leaves the
+    consumer's buffers when `MultiprocessingOptions.max_buffered_bytes` is set.
+
+    Args:
+      worker_index: Index of the worker that produced the element.
+      nbytes: `GrainPoolElement.nbytes` of the element.
+    """
+    if self._released_bytes is None or not nbytes:
+      return
+    with self._released_bytes_lock, self._buffer_memory_released:
+      self._released_bytes[worker_index] += nbytes
+      self._buffer_memory_released.notify_all()
+    self._report_buffered_bytes()
+
+  def _notify_buffer_released(self) -> None:
+    """Wakes up the workers waiting for buffer memory or slots to re-check."""
+    for condition in (
+        self._buffer_memory_released,
+        self._worker_buffer_released,
+    ):
+      if condition is not None:
+        with condition:
+          condition.notify_all()
+
+  def _take_buffered_element(self, worker_index: int) -> None:
+    """Counts an element taken from the worker's output queue."""
+    if self._taken_elements is None:
+      return
+    with self._worker_buffer_released:
+      self._taken_elements[worker_index] += 1
+      self._worker_buffer_released.notify_all()
+
+  def set_per_worker_buffer_size(self, per_worker_buffer_size: int) -> None:
+    """Sets the number of elements each worker buffers in its output queue.
+
+    Only has an effect with `MultiprocessingOptions.autotune`.
+
+    Args:
+      per_worker_buffer_size: The new buffer size, at most
+        `_AUTOTUNE_MAX_BUFFER_SIZE_MULTIPLIER` times the configured one.
+    """
+    if (
+        self._per_worker_buffer_size is None
+        or self._per_worker_buffer_size.value == per_worker_buffer_size
+    ):
+      return
+    with self._worker_buffer_released:
+      self._per_worker_buffer_size.value = per_worker_buffer_size
+      self._worker_buffer_released.notify_all()
+
+  def buffered_bytes(self) -> int:
+    """Returns the bytes of elements produced by the workers not consumed yet."""
+    if self._charged_bytes is None:
+      return 0
+    with self._released_bytes_lock:
+      return sum(self._charged_bytes) - sum(self._released_bytes)
+
+  def _report_buffered_bytes(self) -> None:
+    buffered_bytes = self.buffered_bytes()
+    with self._released_bytes_lock:
+      delta = buffered_bytes - self._reported_buffered_bytes
+      self._reported_buffered_bytes = buffered_bytes
+    memory_budget.update_buffered_bytes("mp_prefetch", delta)
+
   def __del__(self):
     self._shutdown()
 
@@ -434,6 +1319,11 @@ class GrainPool(Iterator[T]):
     logging.info("Shutting down multiprocessing system.")
     try:
       self.termination_event.set()
+      self._notify_buffer_released()
+      # Wake up the workers waiting for a new element producer.
+      for process, args_queue in zip(self.processes, self.worker_args_queues):
+        if process.is_alive():
+          args_queue.put(None)
       # Not joining here will cause the children to be zombie after they finish.
       # Need to join or call active_children.
       for process in self.processes:
@@ -445,6 +1335,200 @@ class GrainPool(Iterator[T]):
         if process.is_alive():
           logging.info("Forcibly terminating process with pid %i", process.pid)
           process.terminate()
+      # Arrays that are still alive keep their slabs mapped.
+      for arena in self._arenas:
+        arena.unlink()
+      self._arenas = []
+      for _, metadata in self._shared_memory_blocks:
+        metadata.close_and_unlink_shm()
+      self._shared_memory_blocks = []
+      for output_queue in self.worker_output_queues:
+        if isinstance(output_queue, shared_memory_channel.SharedMemoryChannel):
+          output_queue.unlink()
+      # Elements left in the buffers are discarded.
+      memory_budget.update_buffered_bytes(
+          "mp_prefetch", -self._reported_buffered_bytes
+      )
+      self._reported_buffered_bytes = 0
+
+
+def _get_context(options: MultiprocessingOptions) -> context.BaseContext:
+  """Returns the multiprocessing context to start workers with."""
+  if options.start_method not in mp.get_all_start_methods():
+    raise ValueError(
+        f"Unsupported start method {options.start_method!r}, expected one of"
+        f" {mp.get_all_start_methods()}."
+    )
+  ctx = mp.get_context(options.start_method)
+  if options.start_method == "forkserver":
+    # Workers forked from the server don't need to import Grain and its
+    # dependencies again. Only takes effect if the server isn't running yet.
+    ctx.set_forkserver_preload([__name__, *options.forkserver_preload])
+  return ctx
+
+
+class _NoElementsProducerFn(GetElementProducerFn[Any]):
+  """Element producer that doesn't produce any elements."""
+
+  def __call__(self, *, worker_index: int, worker_count: int) -> Iterator[Any]:
+    del self, worker_index, worker_count
+    return iter(())
+
+
+def _persistent_pool_max_workers() -> int:
+  """Returns the `grain_py_persistent_pool_max_workers` config option."""
+  if flags.FLAGS.is_parsed():
+    return config.config.py_persistent_pool_max_workers
+  # Flags aren't parsed when the program doesn't use `absl.app`, e.g. under
+  # pytest. Use the default or the value set with `config.update`.
+  return flags.FLAGS["grain_py_persistent_pool_max_workers"].value
+
+
+class _PersistentPool:
+  """Process-wide pool of worker processes shared by multiple pipelines.
+
+  Pipelines lease a `GrainPool` with `num_workers` workers and return it once
+  they are done. Workers are not shared between pipelines running at the same
+  time: each pipeline leases exactly `num_workers` workers for its lifetime.
+  Returned pools stay idle until a pipeline leases them again. Idle pools are
+  keyed by all fields of `MultiprocessingOptions`, so only a pipeline with
+  identical options reuses them; their workers are then reset with the new
+  element producer instead of spawning new processes. The total number of
+  leased and idle workers is capped by the
+  `grain_py_persistent_pool_max_workers` config option, the least recently
+  used idle pools are shut down to make room.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    # Idle pools with their options key, the least recently used first.
+    self._idle_pools: list[tuple[tuple[Any, ...], GrainPool]] = []
+    self._num_leased_workers = 0
+    self._atexit_registered = False
+
+  @property
+  def num_leased_workers(self) -> int:
+    return self._num_leased_workers
+
+  @property
+  def num_idle_workers(self) -> int:
+    return sum(g_pool.num_processes for _, g_pool in self._idle_pools)
+
+  def lease(
+      self,
+      ctx: context.BaseContext,
+      *,
+      get_element_producer_fn: GetElementProducerFn[T],
+      worker_index_to_start_reading: int,
+      options: MultiprocessingOptions,
+  ) -> GrainPool[T]:
+    """Returns an idle pool with matching options or starts a new one."""
+    key = dataclasses.astuple(options)
+    to_shutdown = []
+    g_pool = None
+    with self._lock:
+      if not self._atexit_registered:
+        atexit.register(self.shutdown)
+        self._atexit_registered = True
+      for i, (idle_key, idle_pool) in enumerate(self._idle_pools):
+        if idle_key == key:
+          g_pool = self._idle_pools.pop(i)[1]
+          break
+      if g_pool is None:
+        max_workers = _persistent_pool_max_workers()
+        if max_workers > 0:
+          while (
+              self._idle_pools
+              and self._num_leased_workers
+              + self.num_idle_workers
+              + options.num_workers
+              > max_workers
+          ):
+            to_shutdown.append(self._idle_pools.pop(0)[1])
+          if self._num_leased_workers + options.num_workers > max_workers:
+            raise ValueError(
+                f"Can't lease {options.num_workers} workers from the persistent"
+                f" pool: {self._num_leased_workers} of {max_workers} workers"
+                " are already leased. Consider increasing"
+                " `grain_py_persistent_pool_max_workers`."
+            )
+      self._num_leased_workers += options.num_workers
+    for idle_pool in to_shutdown:
+      idle_pool._shutdown()  # pylint: disable=protected-access
+    try:
+      if g_pool is not None and g_pool.can_reset():
+        logging.info("Reusing %i idle workers.", g_pool.num_processes)
+        g_pool.reset(get_element_producer_fn, worker_index_to_start_reading)
+        return g_pool
+      return GrainPool(
+          ctx=ctx,
+          get_element_producer_fn=get_element_producer_fn,
+          worker_index_to_start_reading=worker_index_to_start_reading,
+          options=options,
+      )
+    except Exception:
+      with self._lock:
+        self._num_leased_workers -= options.num_workers
+      raise
+
+  def release(
+      self, g_pool: GrainPool[Any], options: MultiprocessingOptions
+  ) -> None:
+    """Returns a leased pool, its workers become idle."""
+    can_reset = g_pool.can_reset()
+    if can_reset:
+      # Let the workers drop the pipeline instead of producing elements that
+      # are never read.
+      g_pool.reset(_NoElementsProducerFn())
+    with self._lock:
+      self._num_leased_workers -= g_pool.num_processes
+      if can_reset:
+        self._idle_pools.append((dataclasses.astuple(options), g_pool))
+    if not can_reset:
+      g_pool._shutdown()  # pylint: disable=protected-access
+
+  def shutdown(self) -> None:
+    """Shuts down all idle pools."""
+    with self._lock:
+      idle_pools, self._idle_pools = self._idle_pools, []
+    for _, g_pool in idle_pools:
+      g_pool._shutdown()  # pylint: disable=protected-access
+
+
+_persistent_pool = _PersistentPool()
+
+
+def _start_grain_pool(
+    ctx: context.BaseContext,
+    *,
+    get_element_producer_fn: GetElementProducerFn[T],
+    worker_index_to_start_reading: int,
+    options: MultiprocessingOptions,
+) -> GrainPool[T]:
+  """Starts a `GrainPool` or leases it from the persistent pool."""
+  if options.use_persistent_pool:
+    return _persistent_pool.lease(
+        ctx,
+        get_element_producer_fn=get_element_producer_fn,
+        worker_index_to_start_reading=worker_index_to_start_reading,
+        options=options,
+    )
+  return GrainPool(
+      ctx=ctx,
+      get_element_producer_fn=get_element_producer_fn,
+      worker_index_to_start_reading=worker_index_to_start_reading,
+      options=options,
+  )
+
+
+def _stop_grain_pool(
+    g_pool: GrainPool[Any], options: MultiprocessingOptions
+) -> None:
+  """Shuts down `g_pool` or returns it to the persistent pool."""
+  if options.use_persistent_pool:
+    _persistent_pool.release(g_pool, options)
+  else:
+    g_pool._shutdown()  # pylint: disable=protected-access
 
 
 @dataclasses.dataclass(slots=True, frozen=True)
@@ -454,6 +1538,8 @@ class _ReaderQueueElement:
   async_result: pool.AsyncResult[Any]
   # index of worker producing the element in [0, worker_count]
   worker_index: int
+  # See `GrainPoolElement.nbytes`.
+  nbytes: int = 0
 
 
 @dataclasses.dataclass(frozen=True)
@@ -467,6 +1553,118 @@ _QueueElement = Union[
 ]
 
 
+class _BufferAutotuner:
+  """Tunes `per_worker_buffer_size` of `MultiProcessIterator`.
+
+  The reader thread acquires a slot before adding an element to the reader
+  queue and the consumer releases it after taking the element. There are
+  `num_workers * per_worker_buffer_size` slots and the workers buffer up to
+  `per_worker_buffer_size` elements each in their output queues. Every
+  `_AUTOTUNE_WINDOW_SIZE` elements the size is adjusted: it doubles if the
+  consumer spent more than `_AUTOTUNE_MAX_WAIT_FRACTION` of the time waiting
+  for elements and shrinks if the reader queue stayed at least half full. The
+  elements buffered in the reader queue and the worker output queues never
+  hold more than `memory_budget` bytes of arrays and strings on average.
+  """
+
+  def __init__(
+      self, num_workers: int, per_worker_buffer_size: int, memory_budget: int
+  ):
+    self._num_workers = num_workers
+    self._min_per_worker_buffer_size = per_worker_buffer_size
+    self._max_per_worker_buffer_size = (
+        per_worker_buffer_size * _AUTOTUNE_MAX_BUFFER_SIZE_MULTIPLIER
+    )
+    self._memory_budget = memory_budget
+    self._per_worker_buffer_size = per_worker_buffer_size
+    self._buffered = 0
+    self._average_element_nbytes = None
+    self._condition = threading.Condition()
+    self._reset_window()
+
+  def _reset_window(self) -> None:
+    self._window_start = time.perf_counter()
+    self._window_elements = 0
+    self._window_wait_time = 0.0
+    self._window_min_buffered = (
+        self._num_workers * self._max_per_worker_buffer_size
+    )
+
+  @property
+  def per_worker_buffer_size(self) -> int:
+    return self._per_worker_buffer_size
+
+  @property
+  def limit(self) -> int:
+    """Returns the number of elements the reader queue may hold."""
+    return self._num_workers * self._per_worker_buffer_size
+
+  def clear(self) -> None:
+    """Forgets buffered elements when the reader queue is recreated."""
+    with self._condition:
+      self._buffered = 0
+      self._reset_window()
+
+  def acquire(self, should_stop: Callable[[], bool]) -> bool:
+    """Waits for a free slot, returns False if `should_stop` became True."""
+    with self._condition:
+      while self._buffered >= self.limit:
+        if should_stop():
+          return False
+        self._condition.wait(_QUEUE_WAIT_TIMEOUT)
+      self._buffered += 1
+      return True
+
+  def release(self, wait_time: float, element_nbytes: int) -> None:
+    """Releases a slot after the consumer waited `wait_time` seconds for it."""
+    with self._condition:
+      self._buffered = max(self._buffered - 1, 0)
+      self._window_min_buffered = min(self._window_min_buffered, self._buffered)
+      self._window_elements += 1
+      self._window_wait_time += wait_time
+      if self._average_element_nbytes is None:
+        self._average_element_nbytes = float(element_nbytes)
+      else:
+        self._average_element_nbytes += 0.1 * (
+            element_nbytes - self._average_element_nbytes
+        )
+      if self._window_elements >= _AUTOTUNE_WINDOW_SIZE:
+        self._adjust_per_worker_buffer_size()
+        self._reset_window()
+      self._condition.notify()
+
+  def _adjust_per_worker_buffer_size(self) -> None:
+    elapsed = time.perf_counter() - self._window_start
+    max_size = self._max_per_worker_buffer_size
+    if self._average_element_nbytes:
+      # Elements are buffered both in the worker output queues and in the
+      # reader queue.
+      max_size = min(
+          max_size,
+          int(
+              self._memory_budget
+              // (2 * self._num_workers * self._average_element_nbytes)
+          ),
+      )
+    size = self._per_worker_buffer_size
+    if self._window_wait_time > _AUTOTUNE_MAX_WAIT_FRACTION * elapsed:
+      size *= 2
+    elif self._window_min_buffered >= self.limit // 2:
+      limit = self.limit - self._window_min_buffered // 2
+      size = -(-limit // self._num_workers)
+    size = max(self._min_per_worker_buffer_size, min(size, max_size))
+    if size != self._per_worker_buffer_size:
+      logging.debug(
+          "Changing per_worker_buffer_size from %d to %d, consumer waited"
+          " %.3fs out of %.3fs.",
+          self._per_worker_buffer_size,
+          size,
+          self._window_wait_time,
+          elapsed,
+      )
+      self._per_worker_buffer_size = size
+
+
 class MultiProcessIteratorInvalidStateError(Exception):
   """Raised when iterator is an invalid state and can't be iterated on."""
 
@@ -478,7 +1676,10 @@ class MultiProcessIterator(Iterator[T]):
   resources. As such, it must be used within a "with" statement.
 
   Wraps `GrainPool` adding lifecycle management, multithreaded elements read and
-  recording the last worker index useful for checkpointing.
+  recording the last worker index useful for checkpointing. The worker processes
+  are stopped, or returned to the persistent pool, once the iterator reaches the
+  end of the elements or fails. `reset` reuses them while iteration is in
+  progress and starts new ones otherwise.
   """
 
   def __init__(
@@ -503,6 +1704,17 @@ class MultiProcessIterator(Iterator[T]):
     self._reader_thread_pool = None
     self._termination_event = None
     self._reader_thread = None
+    # Holds the `GrainPool` once the reader thread created it. The pool outlives
+    # the reader thread so that `reset` can reuse the worker processes.
+    self._grain_pool: list[GrainPool] = []
+    self._processing_complete = False
+    self._buffer_autotuner = None
+    if multiprocessing_options.autotune:
+      self._buffer_autotuner = _BufferAutotuner(
+          multiprocessing_options.num_workers,
+          multiprocessing_options.per_worker_buffer_size,
+          multiprocessing_options.autotune_memory_budget,
+      )
 
   def __del__(self):
     if self._reader_thread:
@@ -515,12 +1727,22 @@ class MultiProcessIterator(Iterator[T]):
     if self._reader_thread:
       return
 
+    self._start_reader_thread()
+    shared_memory_array.SharedMemoryArray.enable_async_del(
+        self._multiprocessing_options.num_workers
+    )
+
+  def _start_reader_thread(self) -> None:
     max_buffered_elements = (
         self._multiprocessing_options.num_workers
         * self._multiprocessing_options.per_worker_buffer_size
     )
-    self._reader_queue = queue.Queue(maxsize=max_buffered_elements)
     self._reader_thread_pool = pool.ThreadPool(max_buffered_elements)
+    if self._buffer_autotuner is not None:
+      # The autotuner limits the number of buffered elements.
+      self._buffer_autotuner.clear()
+      max_buffered_elements *= _AUTOTUNE_MAX_BUFFER_SIZE_MULTIPLIER
+    self._reader_queue = queue.Queue(maxsize=max_buffered_elements)
     self._termination_event = threading.Event()
     self._reader_thread = threading.Thread(
         target=MultiProcessIterator._process_elements,
@@ -531,12 +1753,12 @@ class MultiProcessIterator(Iterator[T]):
             self._reader_thread_pool,
             self._termination_event,
             self._last_worker_index + 1,
+            self._grain_pool,
+            self._buffer_autotuner,
         ),
     )
+    self._processing_complete = False
     self._reader_thread.start()
-    shared_memory_array.SharedMemoryArray.enable_async_del(
-        self._multiprocessing_options.num_workers
-    )
 
   def stop_prefetch(self) -> None:
     """Cleans up prefetching threads."""
@@ -544,17 +1766,70 @@ class MultiProcessIterator(Iterator[T]):
     if not self._reader_thread:
       return
 
+    self._stop_reader_thread()
+    if self._grain_pool:
+      _stop_grain_pool(self._grain_pool.pop(), self._multiprocessing_options)
+
+  def reset(
+      self,
+      get_element_producer_fn: GetElementProducerFn,
+      worker_index_to_start_reading: int,
+  ) -> None:
+    """Restarts iteration with new element producers.
+
+    If prefetching has started, the worker processes are kept alive and receive
+    the new element producer instead of being restarted. Elements prefetched
+    before the reset are discarded.
+
+    Args:
+      get_element_producer_fn: factory making record iterators for each child
+        process.
+      worker_index_to_start_reading: Index of the next worker to read from.
+    """
+    self._get_element_producer_fn = get_element_producer_fn
+    self._last_worker_index = worker_index_to_start_reading - 1
+    if not self._reader_thread:
+      if self._processing_complete:
+        # Prefetching was stopped at the end of iteration, restart it.
+        self._start_reader_thread()
+      return
+    self._stop_reader_thread()
+    if self._grain_pool:
+      g_pool = self._grain_pool[0]
+      if g_pool.can_reset():
+        g_pool.reset(get_element_producer_fn, worker_index_to_start_reading)
+      else:
+        _stop_grain_pool(self._grain_pool.pop(), self._multiprocessing_options)
+    self._start_reader_thread()
+
+  def _stop_reader_thread(self) -> None:
     # pytype: disable=attribute-error
     self._termination_event.set()
+    # The reader thread may wait for workers that wait for buffered bytes to be
+    # released, see `MultiprocessingOptions.max_buffered_bytes`.
+    self._discard_reader_queue()
     self._reader_thread_pool.close()
     self._reader_thread.join()
     self._reader_thread_pool.join()
     # pytype: enable=attribute-error
+    self._discard_reader_queue()
     self._termination_event = None
     self._reader_thread_pool = None
     self._reader_thread = None
     self._reader_queue = None
 
+  def _discard_reader_queue(self) -> None:
+    """Discards the elements in the reader queue releasing their bytes."""
+    while self._grain_pool:
+      try:
+        element = self._reader_queue.get_nowait()  # pytype: disable=attribute-error
+      except queue.Empty:
+        break
+      if isinstance(element, _ReaderQueueElement):
+        self._grain_pool[0].release_buffered_bytes(
+            element.worker_index, element.nbytes
+        )
+
   def __enter__(self):
     self.start_prefetch()
     return self
@@ -588,9 +1863,10 @@ class MultiProcessIterator(Iterator[T]):
       thread_pool: pool.ThreadPool,
       termination_event: threading.Event,
       worker_index_to_start_reading: int,
+      grain_pool: list[GrainPool],
+      buffer_autotuner: _BufferAutotuner | None,
   ) -> None:
     """Processes elements read from grain pool asynchronously."""
-    ctx = mp.get_context("spawn")
 
     def read_thread_should_stop():
       return (
@@ -598,29 +1874,42 @@ class MultiProcessIterator(Iterator[T]):
       )
 
     try:
-      with GrainPool(
-          ctx=ctx,
-          get_element_producer_fn=get_element_producer_fn,
-          worker_index_to_start_reading=worker_index_to_start_reading,
-          options=multiprocessing_options,
-      ) as g_pool:
-        for element in g_pool:
-          if read_thread_should_stop():
-            break
-          # Note: We use a thread pool for opening the shared memory because
-          # in some cases the calls to `shm_open` can actually become the
-          # bottleneck for a single thread.
-          async_result = thread_pool.apply_async(
-              MultiProcessIterator._open_shared_memory_for_structure,
-              args=(element.record,),
+      if not grain_pool:
+        grain_pool.append(
+            _start_grain_pool(
+                _get_context(multiprocessing_options),
+                get_element_producer_fn=get_element_producer_fn,
+                worker_index_to_start_reading=worker_index_to_start_reading,
+                options=multiprocessing_options,
+            )
+        )
+      for element in grain_pool[0]:
+        if read_thread_should_stop() or (
+            buffer_autotuner is not None
+            and not buffer_autotuner.acquire(read_thread_should_stop)
+        ):
+          grain_pool[0].release_buffered_bytes(
+              element.worker_index, element.nbytes
           )
-          multiprocessing_common.add_element_to_queue(
-              _ReaderQueueElement(
-                  async_result,
-                  element.worker_index,
-              ),
-              reader_queue,
-              read_thread_should_stop,
+          break
+        # Note: We use a thread pool for opening the shared memory because
+        # in some cases the calls to `shm_open` can actually become the
+        # bottleneck for a single thread.
+        async_result = thread_pool.apply_async(
+            MultiProcessIterator._open_shared_memory_for_structure,
+            args=(element.record,),
+        )
+        if not multiprocessing_common.add_element_to_queue(
+            _ReaderQueueElement(
+                async_result,
+                element.worker_index,
+                element.nbytes,
+            ),
+            reader_queue,
+            read_thread_should_stop,
+        ):
+          grain_pool[0].release_buffered_bytes(
+              element.worker_index, element.nbytes
           )
     # This exception could arise from user-provide code. Propagating it to
     # the main thread to re-raise it as is.
@@ -629,6 +1918,9 @@ class MultiProcessIterator(Iterator[T]):
           e, reader_queue, read_thread_should_stop
       )
       return
+    finally:
+      if grain_pool and not threading.main_thread().is_alive():
+        grain_pool.pop()._shutdown()  # pylint: disable=protected-access
     multiprocessing_common.add_element_to_queue(
         _GrainPoolProcessingComplete(),
         reader_queue,
@@ -655,21 +1947,31 @@ class MultiProcessIterator(Iterator[T]):
   def get_last_worker_index(self):
     return self._last_worker_index
 
+  def _complete_processing(self) -> None:
+    """Stops prefetching once the consumer reached the end of iteration."""
+    self._processing_complete = True
+    self.stop_prefetch()
+
   def __next__(self):
+    if self._processing_complete:
+      raise StopIteration
     if not self._can_iterate():
       raise MultiProcessIteratorInvalidStateError(
           "MultiProcessIterator is in an invalid state. Note that"
           " MultiProcessIterator should be used with a 'with' statement."
       )
+    start_time = time.perf_counter()
     element = multiprocessing_common.get_element_from_queue(
         self._reader_queue, self._termination_event.is_set  # pytype: disable=attribute-error
     )
     if isinstance(element, Exception):
+      self._complete_processing()
       raise element
     if (
         element == _GRAIN_POOL_PROCESSING_COMPLETE
         or element == multiprocessing_common.SYSTEM_TERMINATED
     ):
+      self._complete_processing()
       raise StopIteration
 
     if not isinstance(element, _ReaderQueueElement):
@@ -682,5 +1984,17 @@ class MultiProcessIterator(Iterator[T]):
     )
     if isinstance(result, multiprocessing_common._SystemTerminated):  # pylint: disable=protected-access
       raise StopIteration
+    if self._buffer_autotuner is not None:
+      self._buffer_autotuner.release(
+          time.perf_counter() - start_time, autotune.element_nbytes(result)
+      )
+      if self._grain_pool:
+        self._grain_pool[0].set_per_worker_buffer_size(
+            self._buffer_autotuner.per_worker_buffer_size
+        )
+    if element.nbytes and self._grain_pool:
+      self._grain_pool[0].release_buffered_bytes(
+          element.worker_index, element.nbytes
+      )
     self._last_worker_index = element.worker_index
     return result
@@ -14,20 +14,26 @@
 """Tests for GrainPool."""
 
 from collections.abc import Iterator
+import dataclasses
 import multiprocessing
 import os
 import signal
 import sys
+import time
 from typing import Any
+from unittest import mock
 
 from absl.testing import absltest
 from absl.testing import parameterized
+import cloudpickle
 from grain._src.core import config
 import multiprocessing as mp
 from grain._src.python import data_sources
 from grain._src.python import grain_pool as gp
 from grain._src.python import record
+from grain._src.python import shared_memory_array
 from grain._src.python.options import MultiprocessingOptions  # pylint: disable=g-importing-member
+import numpy as np
 
 
 class GrainPoolTest(absltest.TestCase):
@@ -186,6 +192,128 @@ class GrainPoolTest(absltest.TestCase):
     for child_process in child_processes:
       self._join_and_assert_process_exitcode(child_process)
 
+  def test_pool_shares_large_element_producer_fn(self):
+    with mock.patch.object(gp, "_SHARED_ELEMENT_PRODUCER_MIN_SIZE", 0):
+      with gp.GrainPool(
+          ctx=mp.get_context("spawn"),
+          get_element_producer_fn=_make_uniform_element_producer_fn(),
+          options=MultiprocessingOptions(num_workers=2),
+      ) as grain_pool:
+        self.assertLen(grain_pool._shared_memory_blocks, 1)
+        self.assertEqual([e.record for e in grain_pool], list(range(10)))
+        grain_pool.reset(_make_uniform_element_producer_fn(5), 1)
+        self.assertEqual([e.record for e in grain_pool], [7, 6, 9, 8])
+        # Blocks are unlinked once all workers loaded the element producer.
+        self.assertEmpty(grain_pool._shared_memory_blocks)
+
+  def test_pool_shares_large_arrays(self):
+    get_element_producer_fn = LookupTableElementProducerFn()
+    with gp.GrainPool(
+        ctx=mp.get_context("spawn"),
+        get_element_producer_fn=get_element_producer_fn,
+        options=MultiprocessingOptions(num_workers=2),
+    ) as grain_pool:
+      self.assertLen(grain_pool._shared_memory_blocks, 1)
+      # Workers map the shared array read-only.
+      self.assertEqual(
+          [e.record for e in grain_pool],
+          [(False, 0), (False, 1000), (False, 2000), (False, 3000)],
+      )
+      self.assertEmpty(grain_pool._shared_memory_blocks)
+    # Outside of the pool the arrays are pickled as usual.
+    self.assertLen(
+        gp.dumps_with_shared_arrays(get_element_producer_fn),
+        len(cloudpickle.dumps(get_element_producer_fn)),
+    )
+
+  def test_dump_out_of_band_passes_large_buffers_in_shared_memory(self):
+    size = gp._OUT_OF_BAND_MIN_BUFFER_SIZE
+    for value in (
+        b"x" * size,
+        "x" * size,
+        ArrayHolder(np.ones(size, np.uint8)),
+        record.Record(record.RecordMetadata(0), b"x" * size),
+    ):
+      with self.subTest(type(value).__name__):
+        element = gp._dump_out_of_band(value)
+        self.assertLen(element.buffers, 1)
+        self.assertLess(len(element.data), 1000)
+        loaded = gp._load_out_of_band(element)
+        if isinstance(value, ArrayHolder):
+          np.testing.assert_array_equal(loaded.array, value.array)
+        elif isinstance(value, record.Record):
+          self.assertEqual(loaded.data, value.data)
+        else:
+          self.assertEqual(loaded, value)
+
+  def test_dump_out_of_band_keeps_small_buffers_in_band(self):
+    element = gp._dump_out_of_band(
+        {"bytes": b"x" * 100, "array": np.ones(100, np.uint8)}
+    )
+    self.assertEmpty(element.buffers)
+    self.assertEqual(gp._load_out_of_band(element)["bytes"], b"x" * 100)
+
+  def test_reports_worker_startup_latency(self):
+    with gp.GrainPool(
+        ctx=mp.get_context("spawn"),
+        get_element_producer_fn=_make_uniform_element_producer_fn(),
+        options=MultiprocessingOptions(num_workers=2),
+    ) as grain_pool:
+      self.assertLen(list(grain_pool), 10)
+      latencies = grain_pool.worker_startup_latencies()
+    self.assertLen(latencies, 2)
+    for latency in latencies:
+      self.assertIsNotNone(latency)
+      self.assertGreater(latency, 0)
+
+  def test_pool_sets_per_worker_buffer_size(self):
+
+    def wait_for_put_elements(grain_pool: gp.GrainPool, expected: int):
+      deadline = time.time() + 60
+      while grain_pool._put_elements[0] < expected and time.time() < deadline:
+        time.sleep(0.1)
+      # Give the worker time to exceed the buffer size if it doesn't wait.
+      time.sleep(0.5)
+      self.assertEqual(grain_pool._put_elements[0], expected)
+
+    with gp.GrainPool(
+        ctx=mp.get_context("spawn"),
+        get_element_producer_fn=_make_uniform_element_producer_fn(),
+        options=MultiprocessingOptions(
+            num_workers=1, per_worker_buffer_size=2, autotune=True
+        ),
+    ) as grain_pool:
+      wait_for_put_elements(grain_pool, 2)
+      grain_pool.set_per_worker_buffer_size(5)
+      wait_for_put_elements(grain_pool, 5)
+      self.assertEqual(next(grain_pool).record, 0)
+      wait_for_put_elements(grain_pool, 6)
+      self.assertEqual([e.record for e in grain_pool], list(range(1, 10)))
+
+  def test_pool_reset(self):
+    options = MultiprocessingOptions(num_workers=2, per_worker_buffer_size=1)
+    with gp.GrainPool(
+        ctx=mp.get_context("spawn"),
+        get_element_producer_fn=_make_uniform_element_producer_fn(),
+        options=options,
+    ) as grain_pool:
+      pids = [p.pid for p in grain_pool.processes]
+      self.assertEqual(
+          [next(grain_pool).record for _ in range(3)], [0, 1, 2]
+      )
+      # Reset in the middle of iteration.
+      grain_pool.reset(_make_uniform_element_producer_fn(5), 1)
+      self.assertEqual([e.record for e in grain_pool], [7, 6, 9, 8])
+      # Reset after all elements were produced.
+      grain_pool.reset(_make_uniform_element_producer_fn())
+      self.assertEqual([e.record for e in grain_pool], list(range(10)))
+      self.assertEqual([p.pid for p in grain_pool.processes], pids)
+      self.assertTrue(all(p.is_alive() for p in grain_pool.processes))
+    for child_process in grain_pool.processes:
+      self._join_and_assert_process_exitcode(child_process)
+    with self.assertRaisesRegex(ValueError, "shut down"):
+      grain_pool.reset(_make_uniform_element_producer_fn())
+
 
 def _make_uniform_element_producer_fn(
     last_seen_index: int = -1,
@@ -220,6 +348,90 @@ class NonUniformElementProducerFn(gp.GetElementProducerFn):
       yield worker_index
 
 
+class SlowFirstWorkerElementProducerFn(gp.GetElementProducerFn):
+
+  def __call__(self, *, worker_index: int, worker_count: int) -> Iterator[int]:
+    del self
+    for i in range(6)[worker_index::worker_count]:
+      if worker_index == 0:
+        time.sleep(2)
+      yield i
+
+
+class SharedMemoryArrayElementProducerFn(gp.GetElementProducerFn):
+
+  def __call__(
+      self, *, worker_index: int, worker_count: int
+  ) -> Iterator[tuple[bool, shared_memory_array.SharedMemoryArrayMetadata]]:
+    del self
+    for i in range(100)[worker_index::worker_count]:
+      # Every 10th array is too big for the arena.
+      size = 128 if i % 10 else 1 << 20
+      arr = shared_memory_array.SharedMemoryArray((size,), np.int64)
+      arr.fill(i)
+      yield arr.metadata
+
+
+@dataclasses.dataclass
+class ArrayHolder:
+  array: np.ndarray
+
+
+def _make_large_element(i: int) -> dict[str, Any]:
+  size = gp._OUT_OF_BAND_MIN_BUFFER_SIZE
+  return {
+      "bytes": bytes([i]) * size,
+      "str": str(i) * size,
+      "array": np.full((size,), i),
+      "dataclass": ArrayHolder(np.full((size,), i)),
+      "strided_array": np.full((2, size), i)[:, ::2],
+      "fortran_array": np.asfortranarray(np.full((2, size), i)),
+      "small": (i, [i], b"small"),
+  }
+
+
+class LargeElementProducerFn(gp.GetElementProducerFn):
+
+  def __call__(
+      self, *, worker_index: int, worker_count: int
+  ) -> Iterator[dict[str, Any]]:
+    del self
+    for i in range(6)[worker_index::worker_count]:
+      yield _make_large_element(i)
+
+
+class LargeInBandElementProducerFn(gp.GetElementProducerFn):
+
+  def __call__(
+      self, *, worker_index: int, worker_count: int
+  ) -> Iterator[list[int]]:
+    del self
+    for i in range(10)[worker_index::worker_count]:
+      yield [i] * 1_000_000
+
+
+class LookupTableElementProducerFn(gp.GetElementProducerFn):
+
+  def __init__(self):
+    self._table = np.arange(1 << 18)
+
+  def __call__(
+      self, *, worker_index: int, worker_count: int
+  ) -> Iterator[tuple[bool, int]]:
+    for i in range(4)[worker_index::worker_count]:
+      yield self._table.flags.writeable, int(self._table[i * 1000])
+
+
+class KiloByteElementProducerFn(gp.GetElementProducerFn):
+
+  def __call__(
+      self, *, worker_index: int, worker_count: int
+  ) -> Iterator[np.ndarray]:
+    del self
+    for i in range(20)[worker_index::worker_count]:
+      yield np.full(1000, i, dtype=np.uint8)
+
+
 class MultiProcessIteratorTest(parameterized.TestCase):
 
   @parameterized.named_parameters(
@@ -260,6 +472,28 @@ class MultiProcessIteratorTest(parameterized.TestCase):
               record.Record(record.RecordMetadata(i), i) for i in range(5)
           ],
       ),
+      dict(
+          testcase_name="shared_memory_channel",
+          get_element_producer_fn=NonUniformElementProducerFn(),
+          multiprocessing_options=MultiprocessingOptions(
+              num_workers=3,
+              per_worker_buffer_size=2,
+              shared_memory_channel_size=4096,
+          ),
+          worker_index_to_start_reading=0,
+          expected=[1, 2, 1, 2, 1, 2, 2, 2, 2],
+      ),
+      dict(
+          testcase_name="forkserver",
+          get_element_producer_fn=_make_uniform_element_producer_fn(),
+          multiprocessing_options=MultiprocessingOptions(
+              num_workers=2,
+              start_method="forkserver",
+              forkserver_preload=("numpy",),
+          ),
+          worker_index_to_start_reading=0,
+          expected=list(range(10)),
+      ),
   )
   def test_produces_correct_data(
       self,
@@ -336,6 +570,119 @@ class MultiProcessIteratorTest(parameterized.TestCase):
       actual_last_worker_index = iterator.get_last_worker_index()
     self.assertEqual(actual_last_worker_index, expected_last_worker_index)
 
+  def test_allocates_from_shared_memory_arena(self):
+    with gp.MultiProcessIterator(
+        SharedMemoryArrayElementProducerFn(),
+        MultiprocessingOptions(
+            num_workers=2, shared_memory_arena_size=1 << 20
+        ),
+        0,
+    ) as iterator:
+      for i, arr in enumerate(iterator):
+        self.assertIsInstance(arr, shared_memory_array.SharedMemoryArray)
+        self.assertEqual(arr.metadata.offset is None, i % 10 == 0)
+        np.testing.assert_array_equal(arr, np.full_like(arr, i))
+
+  @parameterized.named_parameters(
+      dict(testcase_name="queue", shared_memory_channel_size=0),
+      # Elements don't fit into the channel slots.
+      dict(testcase_name="shared_memory_channel", shared_memory_channel_size=64),
+  )
+  def test_passes_large_buffers_out_of_band(
+      self, shared_memory_channel_size: int
+  ):
+    with gp.MultiProcessIterator(
+        LargeElementProducerFn(),
+        MultiprocessingOptions(
+            num_workers=2,
+            shared_memory_channel_size=shared_memory_channel_size,
+        ),
+        0,
+    ) as iterator:
+      for i, element in enumerate(iterator):
+        expected = _make_large_element(i)
+        self.assertEqual(element["bytes"], expected["bytes"])
+        self.assertEqual(element["str"], expected["str"])
+        self.assertEqual(element["small"], expected["small"])
+        for key in ("array", "strided_array", "fortran_array"):
+          np.testing.assert_array_equal(element[key], expected[key])
+        np.testing.assert_array_equal(
+            element["dataclass"].array, expected["dataclass"].array
+        )
+        # Arrays are backed by shared memory without copies.
+        for array in (element["strided_array"], element["dataclass"].array):
+          base = array
+          while type(base) is np.ndarray:  # pylint: disable=unidiomatic-typecheck
+            base = base.base
+          self.assertIsInstance(base, shared_memory_array.SharedMemoryArray)
+        self.assertTrue(element["fortran_array"].flags.f_contiguous)
+
+  @parameterized.named_parameters(
+      dict(
+          testcase_name="queue",
+          multiprocessing_options=MultiprocessingOptions(num_workers=2),
+      ),
+      dict(
+          testcase_name="shared_memory_channel",
+          multiprocessing_options=MultiprocessingOptions(
+              num_workers=2,
+              per_worker_buffer_size=2,
+              shared_memory_channel_size=4096,
+          ),
+      ),
+      dict(
+          testcase_name="non_deterministic",
+          multiprocessing_options=MultiprocessingOptions(
+              num_workers=2, deterministic=False
+          ),
+      ),
+  )
+  def test_reset_reuses_worker_processes(
+      self, multiprocessing_options: MultiprocessingOptions
+  ):
+    iterator = gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(), multiprocessing_options, 0
+    )
+    with iterator:
+      self.assertLen([next(iterator) for _ in range(3)], 3)
+      pids = [p.pid for p in iterator._grain_pool[0].processes]
+      iterator.reset(_make_uniform_element_producer_fn(5), 1)
+      self.assertLen([next(iterator) for _ in range(2)], 2)
+      iterator.reset(_make_uniform_element_producer_fn(), 0)
+      self.assertLen([next(iterator) for _ in range(2)], 2)
+      self.assertEqual(
+          [p.pid for p in iterator._grain_pool[0].processes], pids
+      )
+      iterator.reset(_make_uniform_element_producer_fn(5), 1)
+      self.assertCountEqual(list(iterator), [6, 7, 8, 9])
+
+  def test_stops_workers_at_end_of_iteration(self):
+    iterator = gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(),
+        MultiprocessingOptions(num_workers=2),
+        0,
+    )
+    with iterator:
+      self.assertEqual(next(iterator), 0)
+      processes = iterator._grain_pool[0].processes
+      self.assertEqual(list(iterator), list(range(1, 10)))
+      self.assertEmpty(iterator._grain_pool)
+      self.assertFalse(any(p.is_alive() for p in processes))
+      with self.assertRaises(StopIteration):
+        next(iterator)
+      # Resetting after the end of iteration starts new workers.
+      iterator.reset(_make_uniform_element_producer_fn(5), 1)
+      self.assertEqual(list(iterator), [7, 6, 9, 8])
+
+  def test_fails_with_unsupported_start_method(self):
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(),
+        MultiprocessingOptions(num_workers=2, start_method="teleport"),
+        0,
+    ) as iterator:
+      with self.assertRaisesRegex(ValueError, "Unsupported start method"):
+        next(iterator)
+
   def test_fails_with_zero_workers(self):
     with self.assertRaisesRegex(
         ValueError, "Number of processes must be at least 1"
@@ -347,7 +694,54 @@ class MultiProcessIteratorTest(parameterized.TestCase):
       ) as iterator:
         list(iterator)
 
-  def test_propagates_error(self):
+  @parameterized.named_parameters(
+      dict(testcase_name="queue", shared_memory_channel_size=0),
+      dict(testcase_name="shared_memory_channel", shared_memory_channel_size=1024),
+  )
+  def test_non_deterministic_reads_first_ready_worker(
+      self, shared_memory_channel_size: int
+  ):
+    with gp.MultiProcessIterator(
+        SlowFirstWorkerElementProducerFn(),
+        MultiprocessingOptions(
+            num_workers=2,
+            per_worker_buffer_size=3,
+            shared_memory_channel_size=shared_memory_channel_size,
+            deterministic=False,
+        ),
+        0,
+    ) as iterator:
+      actual = []
+      worker_indices = []
+      for element in iterator:
+        actual.append(element)
+        worker_indices.append(iterator.get_last_worker_index())
+    # Worker 1 doesn't wait for the slow worker 0.
+    self.assertEqual(actual[:3], [1, 3, 5])
+    self.assertEqual(worker_indices[:3], [1, 1, 1])
+    self.assertEqual(actual[3:], [0, 2, 4])
+    self.assertEqual(worker_indices[3:], [0, 0, 0])
+
+  def test_non_deterministic_waits_for_elements_in_transfer(self):
+    with mock.patch.object(
+        gp.GrainPool,
+        "_get_first_ready",
+        autospec=True,
+        side_effect=gp.GrainPool._get_first_ready,
+    ) as get_first_ready:
+      with gp.MultiProcessIterator(
+          LargeInBandElementProducerFn(),
+          MultiprocessingOptions(num_workers=2, deterministic=False),
+          0,
+      ) as iterator:
+        actual = sorted(element[0] for element in iterator)
+    self.assertEqual(actual, list(range(10)))
+    # Scans that find no element wait for the queues instead of spinning while
+    # the large elements are written to the pipes.
+    self.assertLess(get_first_ready.call_count, 50)
+
+  @parameterized.parameters(True, False)
+  def test_propagates_error(self, deterministic: bool):
     error_msg = "very unique error"
 
     class FailingGetElementProducerFn(gp.GetElementProducerFn):
@@ -362,13 +756,14 @@ class MultiProcessIteratorTest(parameterized.TestCase):
 
     with gp.MultiProcessIterator(
         failing_get_element_producer_fn,
-        MultiprocessingOptions(num_workers=2),
+        MultiprocessingOptions(num_workers=2, deterministic=deterministic),
         0,
     ) as iterator:
       with self.assertRaisesRegex(gp.RemoteWorkerError, error_msg):
         list(iterator)
 
-  def test_reports_worker_crash(self):
+  @parameterized.parameters(True, False)
+  def test_reports_worker_crash(self, deterministic: bool):
 
     class FailingGetElementProducerFn(gp.GetElementProducerFn):
 
@@ -382,7 +777,7 @@ class MultiProcessIteratorTest(parameterized.TestCase):
 
     with gp.MultiProcessIterator(
         failing_get_element_producer_fn,
-        MultiprocessingOptions(num_workers=2),
+        MultiprocessingOptions(num_workers=2, deterministic=deterministic),
         0,
     ) as iterator:
       with self.assertRaisesRegex(
@@ -421,5 +816,175 @@ class MultiProcessIteratorTest(parameterized.TestCase):
         list(iterator)
 
 
+  @parameterized.parameters(True, False)
+  def test_limits_buffered_bytes(self, deterministic: bool):
+    options = MultiprocessingOptions(
+        num_workers=2,
+        per_worker_buffer_size=10,
+        deterministic=deterministic,
+        max_buffered_bytes=2500,
+    )
+    with gp.MultiProcessIterator(
+        KiloByteElementProducerFn(), options, 0
+    ) as iterator:
+      first = next(iterator)
+      # Give the workers time to fill their buffers.
+      time.sleep(2)
+      g_pool = iterator._grain_pool[0]
+      # A worker with an empty buffer may exceed the budget by one element.
+      self.assertBetween(g_pool.buffered_bytes(), 1000, 3500)
+      elements = [first, *iterator]
+      self.assertEqual(g_pool.buffered_bytes(), 0)
+    values = [int(element[0]) for element in elements]
+    if deterministic:
+      self.assertEqual(values, list(range(20)))
+    else:
+      self.assertCountEqual(values, list(range(20)))
+
+  def test_limits_buffered_bytes_across_reset(self):
+    options = MultiprocessingOptions(num_workers=2, max_buffered_bytes=1500)
+    with gp.MultiProcessIterator(
+        KiloByteElementProducerFn(), options, 0
+    ) as iterator:
+      self.assertEqual([int(next(iterator)[0]) for _ in range(3)], [0, 1, 2])
+      time.sleep(1)
+      iterator.reset(KiloByteElementProducerFn(), 0)
+      grain_pool = iterator._grain_pool[0]
+      self.assertEqual(
+          [int(element[0]) for element in iterator], list(range(20))
+      )
+      self.assertEqual(grain_pool.buffered_bytes(), 0)
+
+  def test_autotune_keeps_output_and_checkpoints(self):
+    options = MultiprocessingOptions(
+        num_workers=2, per_worker_buffer_size=1, autotune=True
+    )
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(), options, 0
+    ) as iterator:
+      self.assertEqual([next(iterator) for _ in range(4)], [0, 1, 2, 3])
+      last_worker_index = iterator.get_last_worker_index()
+      iterator.reset(
+          _make_uniform_element_producer_fn(last_seen_index=3),
+          (last_worker_index + 1) % options.num_workers,
+      )
+      self.assertEqual(list(iterator), list(range(4, 10)))
+
+
+class BufferAutotunerTest(absltest.TestCase):
+
+  def _consume(
+      self,
+      autotuner: gp._BufferAutotuner,
+      num_elements: int,
+      wait_time: float,
+      element_nbytes: int = 0,
+  ) -> None:
+    for _ in range(num_elements):
+      self.assertTrue(autotuner.acquire(lambda: False))
+      autotuner.release(wait_time, element_nbytes)
+
+  def test_grows_while_consumer_waits(self):
+    autotuner = gp._BufferAutotuner(2, 1, 1 << 30)
+    self._consume(autotuner, gp._AUTOTUNE_WINDOW_SIZE, wait_time=1.0)
+    self.assertEqual(autotuner.per_worker_buffer_size, 2)
+    self.assertEqual(autotuner.limit, 4)
+    self._consume(autotuner, 10 * gp._AUTOTUNE_WINDOW_SIZE, wait_time=1.0)
+    self.assertEqual(autotuner.per_worker_buffer_size, 16)
+    self.assertEqual(autotuner.limit, 32)
+
+  def test_keeps_size_without_waiting(self):
+    autotuner = gp._BufferAutotuner(2, 1, 1 << 30)
+    self._consume(autotuner, 4 * gp._AUTOTUNE_WINDOW_SIZE, wait_time=0.0)
+    self.assertEqual(autotuner.per_worker_buffer_size, 1)
+
+  def test_shrinks_when_buffer_stays_full(self):
+    autotuner = gp._BufferAutotuner(2, 1, 1 << 30)
+    self._consume(autotuner, 10 * gp._AUTOTUNE_WINDOW_SIZE, wait_time=1.0)
+    self.assertEqual(autotuner.per_worker_buffer_size, 16)
+    # Fill the buffer and keep it full.
+    for _ in range(31):
+      self.assertTrue(autotuner.acquire(lambda: False))
+    self._consume(autotuner, gp._AUTOTUNE_WINDOW_SIZE, wait_time=0.0)
+    self.assertLess(autotuner.per_worker_buffer_size, 16)
+    self.assertGreaterEqual(autotuner.per_worker_buffer_size, 1)
+
+  def test_respects_memory_budget(self):
+    autotuner = gp._BufferAutotuner(2, 1, 8000)
+    self._consume(
+        autotuner,
+        10 * gp._AUTOTUNE_WINDOW_SIZE,
+        wait_time=1.0,
+        element_nbytes=200,
+    )
+    # Elements are buffered by the workers and in the reader queue.
+    self.assertEqual(autotuner.per_worker_buffer_size, 10)
+
+  def test_acquire_stops_when_full(self):
+    autotuner = gp._BufferAutotuner(1, 1, 1 << 30)
+    self.assertTrue(autotuner.acquire(lambda: False))
+    self.assertFalse(autotuner.acquire(lambda: True))
+
+
+class PersistentPoolTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.addCleanup(gp._persistent_pool.shutdown)
+
+  def _get_worker_pids(self, iterator: gp.MultiProcessIterator) -> list[int]:
+    return [p.pid for p in iterator._grain_pool[0].processes]
+
+  def test_reuses_idle_workers(self):
+    options = MultiprocessingOptions(num_workers=2, use_persistent_pool=True)
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(), options, 0
+    ) as iterator:
+      self.assertEqual(next(iterator), 0)
+      pids = self._get_worker_pids(iterator)
+      self.assertEqual(gp._persistent_pool.num_leased_workers, 2)
+      self.assertEqual(list(iterator), list(range(1, 10)))
+      # The workers are returned at the end of iteration.
+      self.assertEqual(gp._persistent_pool.num_leased_workers, 0)
+    self.assertEqual(gp._persistent_pool.num_leased_workers, 0)
+    self.assertEqual(gp._persistent_pool.num_idle_workers, 2)
+
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(5), options, 1
+    ) as iterator:
+      self.assertEqual(next(iterator), 7)
+      self.assertEqual(self._get_worker_pids(iterator), pids)
+      self.assertEqual(gp._persistent_pool.num_idle_workers, 0)
+      self.assertEqual(list(iterator), [6, 9, 8])
+
+  def test_respects_max_workers(self):
+    config.config.update("py_persistent_pool_max_workers", 3)
+    self.addCleanup(config.config.update, "py_persistent_pool_max_workers", 0)
+    options = MultiprocessingOptions(num_workers=2, use_persistent_pool=True)
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(), options, 0
+    ) as iterator:
+      self.assertEqual(list(iterator), list(range(10)))
+    self.assertEqual(gp._persistent_pool.num_idle_workers, 2)
+
+    # The idle workers have different options and are shut down to make room.
+    other_options = MultiprocessingOptions(
+        num_workers=2, per_worker_buffer_size=2, use_persistent_pool=True
+    )
+    with gp.MultiProcessIterator(
+        _make_uniform_element_producer_fn(), other_options, 0
+    ) as iterator:
+      self.assertEqual(next(iterator), 0)
+      self.assertEqual(gp._persistent_pool.num_idle_workers, 0)
+      # Leasing more workers than allowed fails.
+      with gp.MultiProcessIterator(
+          _make_uniform_element_producer_fn(), options, 0
+      ) as failing_iterator:
+        with self.assertRaisesRegex(ValueError, "Can't lease 2 workers"):
+          next(failing_iterator)
+      self.assertEqual(list(iterator), list(range(1, 10)))
+    self.assertEqual(gp._persistent_pool.num_leased_workers, 0)
+
+
 if __name__ == "__main__":
   absltest.main()
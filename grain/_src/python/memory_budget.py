@@ -0,0 +1,165 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Limits on the memory held by buffers of prefetched elements.
+
+Prefetching stages size their buffers in elements. With a byte budget a stage
+additionally stops producing elements once the elements it buffers take more
+than the budget. The size of an element is the size of its NumPy arrays
+(including arrays in shared memory) and strings, see
+`autotune.element_nbytes`.
+
+The bytes buffered by all budgeted stages of the process are reported by the
+`/grain/python/buffered_bytes` gauge, one value per kind of stage.
+"""
+
+from __future__ import annotations
+
+import collections
+from collections.abc import Callable
+import threading
+
+from grain._src.core import monitoring as grain_monitoring
+
+from grain._src.core import monitoring
+
+_buffered_bytes_metric = monitoring.Metric(
+    "/grain/python/buffered_bytes",
+    value_type=int,
+    metadata=monitoring.Metadata(
+        description=(
+            "Size in bytes of the elements held by the prefetch buffers with a"
+            " memory budget."
+        ),
+    ),
+    root=grain_monitoring.get_monitoring_root(),
+    fields=[("stage", str)],
+)
+
+# Maximum time to wait for memory before checking whether to stop.
+_WAIT_TIMEOUT_S = 0.1
+
+_buffered_bytes_lock = threading.Lock()
+_buffered_bytes: collections.Counter[str] = collections.Counter()
+
+
+def update_buffered_bytes(stage: str, delta: int) -> None:
+  """Adds `delta` to the bytes buffered by stages of kind `stage`."""
+  if not delta:
+    return
+  with _buffered_bytes_lock:
+    _buffered_bytes[stage] += delta
+    value = _buffered_bytes[stage]
+  _buffered_bytes_metric.Set(value, stage)
+
+
+def get_buffered_bytes(stage: str) -> int:
+  """Returns the bytes buffered by stages of kind `stage`."""
+  with _buffered_bytes_lock:
+    return _buffered_bytes[stage]
+
+
+class MemoryBudget:
+  """Limits the total size of the elements held by a buffer.
+
+  The producer acquires the size of an element before adding it to the buffer
+  and the consumer releases it after taking the element out. An element is
+  admitted if it fits into the remaining budget or if the buffer is empty, so
+  that an element larger than the budget doesn't stall the pipeline.
+  """
+
+  def __init__(self, stage: str, max_bytes: int | None):
+    """Creates the budget.
+
+    Args:
+      stage: Kind of the prefetching stage, used to report the gauge.
+      max_bytes: Maximum number of bytes to buffer or None for no limit.
+    """
+    if max_bytes is not None and max_bytes <= 0:
+      raise ValueError(f"Memory budget must be positive, got {max_bytes}.")
+    self._stage = stage
+    self._max_bytes = max_bytes
+    self._buffered = 0
+    self._closed = False
+    self._condition = threading.Condition()
+
+  @property
+  def max_bytes(self) -> int | None:
+    return self._max_bytes
+
+  @property
+  def buffered_bytes(self) -> int:
+    return self._buffered
+
+  def _fits(self, nbytes: int) -> bool:
+    return (
+        self._max_bytes is None
+        or self._buffered == 0
+        or self._buffered + nbytes <= self._max_bytes
+    )
+
+  def try_acquire(self, nbytes: int) -> bool:
+    """Acquires `nbytes` if they fit into the budget without waiting."""
+    with self._condition:
+      if self._closed or not self._fits(nbytes):
+        return False
+      self._buffered += nbytes
+    update_buffered_bytes(self._stage, nbytes)
+    return True
+
+  def acquire(self, nbytes: int, should_stop: Callable[[], bool]) -> bool:
+    """Waits until `nbytes` fit into the budget and acquires them.
+
+    Args:
+      nbytes: Size of the element to add to the buffer.
+      should_stop: Checked while waiting, the wait is abandoned once it returns
+        True.
+
+    Returns:
+      Whether the bytes were acquired. They are not if `should_stop` returned
+      True or the budget was closed.
+    """
+    with self._condition:
+      while not self._closed and not self._fits(nbytes):
+        if should_stop():
+          return False
+        self._condition.wait(_WAIT_TIMEOUT_S)
+      if self._closed or should_stop():
+        return False
+      self._buffered += nbytes
+    update_buffered_bytes(self._stage, nbytes)
+    return True
+
+  def release(self, nbytes: int) -> None:
+    """Releases `nbytes` previously acquired."""
+    with self._condition:
+      if self._closed:
+        return
+      self._buffered -= nbytes
+      self._condition.notify_all()
+    update_buffered_bytes(self._stage, -nbytes)
+
+  def close(self) -> None:
+    """Releases all bytes and makes further acquisitions fail."""
+    with self._condition:
+      if self._closed:
+        return
+      self._closed = True
+      buffered = self._buffered
+      self._buffered = 0
+      self._condition.notify_all()
+    update_buffered_bytes(self._stage, -buffered)
+
+  def __del__(self):
+    if hasattr(self, "_condition"):
+      self.close()
@@ -0,0 +1,87 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for memory budgets of prefetch buffers."""
+
+import threading
+
+from absl.testing import absltest
+from grain._src.python import memory_budget
+
+
+class MemoryBudgetTest(absltest.TestCase):
+
+  def test_acquire_and_release(self):
+    budget = memory_budget.MemoryBudget("test_acquire", 100)
+    self.assertTrue(budget.try_acquire(60))
+    self.assertTrue(budget.try_acquire(40))
+    self.assertFalse(budget.try_acquire(1))
+    self.assertEqual(budget.buffered_bytes, 100)
+    self.assertEqual(memory_budget.get_buffered_bytes("test_acquire"), 100)
+    budget.release(60)
+    self.assertTrue(budget.try_acquire(50))
+    self.assertEqual(memory_budget.get_buffered_bytes("test_acquire"), 90)
+
+  def test_admits_large_element_into_empty_buffer(self):
+    budget = memory_budget.MemoryBudget("test_large", 100)
+    self.assertTrue(budget.try_acquire(1000))
+    self.assertFalse(budget.try_acquire(1))
+
+  def test_unlimited(self):
+    budget = memory_budget.MemoryBudget("test_unlimited", None)
+    for _ in range(10):
+      self.assertTrue(budget.try_acquire(1 << 40))
+
+  def test_acquire_waits_for_release(self):
+    budget = memory_budget.MemoryBudget("test_wait", 100)
+    self.assertTrue(budget.try_acquire(100))
+    acquired = threading.Event()
+
+    def acquire():
+      if budget.acquire(50, lambda: False):
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    self.assertFalse(acquired.wait(0.2))
+    budget.release(100)
+    self.assertTrue(acquired.wait(5))
+    thread.join()
+    self.assertEqual(budget.buffered_bytes, 50)
+
+  def test_acquire_stops(self):
+    budget = memory_budget.MemoryBudget("test_stop", 100)
+    self.assertTrue(budget.try_acquire(100))
+    self.assertFalse(budget.acquire(50, lambda: True))
+
+  def test_close_releases_everything(self):
+    budget = memory_budget.MemoryBudget("test_close", 100)
+    self.assertTrue(budget.try_acquire(70))
+    budget.close()
+    self.assertEqual(memory_budget.get_buffered_bytes("test_close"), 0)
+    self.assertFalse(budget.try_acquire(1))
+    self.assertFalse(budget.acquire(1, lambda: False))
+
+  def test_deleted_budget_is_not_reported(self):
+    budget = memory_budget.MemoryBudget("test_delete", 100)
+    self.assertTrue(budget.try_acquire(70))
+    del budget
+    self.assertEqual(memory_budget.get_buffered_bytes("test_delete"), 0)
+
+  def test_rejects_non_positive_budget(self):
+    with self.assertRaisesRegex(ValueError, "must be positive"):
+      memory_budget.MemoryBudget("test_invalid", 0)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -32,6 +32,24 @@ class _SystemTerminated:
 
 SYSTEM_TERMINATED = _SystemTerminated()
 
+# Whether the current process is a Grain worker process.
+_is_worker_process = False
+
+
+def mark_as_worker_process() -> None:
+  """Marks the current process as a Grain worker process."""
+  global _is_worker_process
+  _is_worker_process = True
+
+
+def is_worker_process() -> bool:
+  """Returns whether the current process is a Grain worker process.
+
+  Outputs of worker processes are sent to the main process, so transformations
+  can allocate them in shared memory directly.
+  """
+  return _is_worker_process
+
 
 def add_element_to_queue(
     element: T,
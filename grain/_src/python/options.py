@@ -28,6 +28,12 @@ class ReadOptions:
     num_threads: Number of threads reading from the DataSource in parallel.
     prefetch_buffer_size: Size of the buffer for reading elements. This helps
       when reading from a distributed file system.
+    autotune: If True, `num_threads` and `prefetch_buffer_size` are only the
+      initial values. The number of threads and elements read ahead are then
+      tuned at runtime from the observed read latency, the rate at which the
+      elements are consumed and their size.
+    autotune_memory_budget: Maximum size in bytes of the elements read ahead
+      when `autotune` is enabled. Only NumPy arrays and strings are counted.
   """
 
   # The current default values where chosen by running a few selected
@@ -36,6 +42,26 @@ class ReadOptions:
   # 10 KiB on disk.
   num_threads: int = 16
   prefetch_buffer_size: int = 500
+  autotune: bool = False
+  autotune_memory_budget: int = 1 << 30
+
+
+# Upper bound on the number of consecutive records a single reader thread task
+# reads.
+_MAX_READ_CHUNK_SIZE = 64
+
+
+def read_chunk_size(read_options: ReadOptions) -> int:
+  """Returns the number of consecutive records each reader thread task reads."""
+  # Keep at least two chunks per thread in flight so that all threads stay busy
+  # while the consumer drains a chunk.
+  return max(
+      1,
+      min(
+          _MAX_READ_CHUNK_SIZE,
+          read_options.prefetch_buffer_size // (2 * read_options.num_threads),
+      ),
+  )
 
 
 @dataclasses.dataclass(slots=True)
@@ -53,8 +79,81 @@ class MultiprocessingOptions:
       batch.
     enable_profiling: If True, profiling info is logged. This is only available
       when num_workers >= 1.
+    shared_memory_arena_size: Size in bytes of the shared memory arena that
+      each worker allocates NumPy arrays from to pass them to the main process.
+      Arrays that don't fit get their own shared memory segment. The default
+      value of 0 disables the arena and every array gets its own segment.
+    shared_memory_channel_size: If positive, workers send elements to the main
+      process through a ring buffer in shared memory of this size in bytes
+      instead of a `multiprocessing.Queue`. The buffer is split into
+      `per_worker_buffer_size` equal slots, elements that don't fit into a slot
+      are passed through a separate shared memory segment. This reduces the
+      per-element overhead for pipelines producing many small elements.
+    deterministic: If True, elements are read from the workers in round-robin
+      order, making the output order deterministic. If False, the next element
+      is taken from any worker that has one ready, so that a slow worker
+      doesn't stall the pipeline. Checkpoints stay exact in both modes because
+      the state is tracked for each worker separately.
+    use_persistent_pool: If True, the worker processes are leased from a
+      process-wide pool shared by all pipelines and returned to it once the
+      iterator is deleted instead of being shut down. A pipeline with the same
+      options started later reuses the idle workers without spawning new
+      processes. Pipelines running at the same time don't share workers: each
+      leases `num_workers` workers, and the total number of leased and idle
+      workers is capped by the `grain_py_persistent_pool_max_workers` config
+      option. Idle workers are only reused by pipelines whose options are equal
+      in all fields.
+    start_method: Method used to start the worker processes, one of
+      `multiprocessing.get_all_start_methods()`. With "forkserver" workers are
+      forked from a server process that has already imported Grain and the
+      modules in `forkserver_preload`, which makes worker startup considerably
+      faster than with the default "spawn".
+    forkserver_preload: Names of modules the forkserver imports before forking
+      workers, e.g. ("numpy", "jax"). Only used with the "forkserver" start
+      method and only takes effect when the forkserver is started, i.e. for the
+      first pipeline using it in the process.
+    autotune: If True, `per_worker_buffer_size` is only the initial number of
+      elements each worker buffers and it is tuned at runtime. The main
+      process measures how long the consumer blocks waiting for elements and
+      grows the worker output queues and its own buffer of
+      `num_workers * per_worker_buffer_size` elements while it does, up to 16x
+      the initial size. The size shrinks back when the buffer stays full and
+      the buffers never hold more than `autotune_memory_budget` bytes of NumPy
+      arrays and strings. `num_workers` is not tuned: each worker iterates
+      over a fixed slice of the data, so the number of workers stays as
+      configured. The output and checkpoints are the same as without
+      autotuning.
+    autotune_memory_budget: Maximum size in bytes of the NumPy arrays and
+      strings buffered by the workers and in the main process when `autotune`
+      is enabled.
+    max_buffered_bytes: If set, limits the total size in bytes of the elements
+      buffered in the worker output queues and in the main process before they
+      are consumed. Since workers pass NumPy arrays through shared memory, this
+      also bounds the shared memory used by buffered elements. A worker with
+      no buffered elements can always produce one, so that elements larger
+      than the budget don't stall the pipeline. Unlike `per_worker_buffer_size`
+      the limit is shared by all workers.
+    record_state_interval_s: Time in seconds a worker of `mp_prefetch` spends
+      computing elements between two recordings of its iterator state. Only
+      the time spent in the worker's pipeline counts, not the time waiting
+      for the main process to consume the elements. Restoring a checkpoint
+      recomputes the elements produced since a worker last recorded its state,
+      so this bounds the work replayed per worker on restore. Smaller values
+      make restores faster but call `get_state` in the workers more often.
+      Workers of pipelines whose elements can be skipped without computing
+      them don't replay any work. If None, defaults to 3 seconds.
   """
 
   num_workers: int = 0
   per_worker_buffer_size: int = 1
   enable_profiling: bool = False
+  shared_memory_arena_size: int = 0
+  shared_memory_channel_size: int = 0
+  deterministic: bool = True
+  use_persistent_pool: bool = False
+  start_method: str = "spawn"
+  forkserver_preload: tuple[str, ...] = ()
+  autotune: bool = False
+  autotune_memory_budget: int = 1 << 30
+  max_buffered_bytes: int | None = None
+  record_state_interval_s: float | None = None
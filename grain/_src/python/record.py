@@ -13,6 +13,8 @@
 # limitations under the License.
 """Define record class used by various modules in the Grain Python Backend."""
 
+from __future__ import annotations
+
 import dataclasses
 from typing import Generic, Optional, TypeVar
 import numpy as np
@@ -46,6 +48,114 @@ class RecordMetadata:
         f"rng={self.rng})"
     )
 
+  @classmethod
+  def with_lazy_rng(
+      cls, index: int, record_key: Optional[int], rng_key: int
+  ) -> RecordMetadata:
+    """Returns metadata whose `rng` is created on first access.
+
+    The `rng` is `np.random.Generator(np.random.Philox(key=rng_key))` but is
+    only created if read (e.g. by a random transformation).
+
+    Args:
+      index: Global index of the record.
+      record_key: Key of the record in the data source.
+      rng_key: Philox key of the record RNG.
+    """
+    return _LazyRngRecordMetadata(index, record_key, None, rng_key)
+
+
+# Slot descriptor storing the `rng` field of `RecordMetadata`.
+_RECORD_METADATA_RNG = RecordMetadata.rng
+
+
+class _LazyRngRecordMetadata(RecordMetadata):
+  """`RecordMetadata` creating its `rng` from a Philox key on first access."""
+
+  __slots__ = ("_rng_key",)
+
+  def __init__(
+      self,
+      index: int,
+      record_key: Optional[int] = None,
+      rng: Optional[np.random.Generator] = None,
+      rng_key: Optional[int] = None,
+  ):
+    super().__init__(index, record_key, rng)
+    self._rng_key = rng_key
+
+  @property
+  def rng(self) -> Optional[np.random.Generator]:
+    rng = _RECORD_METADATA_RNG.__get__(self)
+    if rng is None and self._rng_key is not None:
+      rng = np.random.Generator(np.random.Philox(key=self._rng_key))
+      _RECORD_METADATA_RNG.__set__(self, rng)
+      self._rng_key = None
+    return rng
+
+  @rng.setter
+  def rng(self, rng: Optional[np.random.Generator]):
+    _RECORD_METADATA_RNG.__set__(self, rng)
+    self._rng_key = None
+
+  def remove_record_key(self):
+    if self.record_key is None:
+      return self
+    # Avoid materializing the RNG.
+    return _LazyRngRecordMetadata(
+        self.index, None, _RECORD_METADATA_RNG.__get__(self), self._rng_key
+    )
+
+  def __reduce__(self):
+    return (
+        _LazyRngRecordMetadata,
+        (
+            self.index,
+            self.record_key,
+            _RECORD_METADATA_RNG.__get__(self),
+            self._rng_key,
+        ),
+    )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RecordMetadataBatch:
+  """Metadata of multiple records stored as NumPy arrays.
+
+  Samplers return it from `get_batch()` to avoid creating a `RecordMetadata`
+  object per record until the record is actually read.
+
+  Attributes:
+    indices: `int64` array with the global indices of the records.
+    record_keys: `int64` array with the record keys of the records.
+    seeds: Array with the Philox keys of the per-record RNGs or None if the
+      records don't have RNGs. The keys are `uint64` or, if they don't fit,
+      Python integers in an `object` array.
+  """
+
+  indices: np.ndarray
+  record_keys: np.ndarray
+  seeds: Optional[np.ndarray] = None
+
+  def __len__(self) -> int:
+    return len(self.indices)
+
+  def to_metadata(self) -> list[RecordMetadata]:
+    """Returns a `RecordMetadata` for each record in the batch."""
+    indices = self.indices.tolist()
+    record_keys = self.record_keys.tolist()
+    if self.seeds is None:
+      return [
+          RecordMetadata(index=index, record_key=record_key)
+          for index, record_key in zip(indices, record_keys)
+      ]
+    return [
+        RecordMetadata.with_lazy_rng(index, record_key, seed)
+        for index, record_key, seed in zip(
+            indices, record_keys, self.seeds.tolist()
+        )
+    ]
+
 
 @dataclasses.dataclass(slots=True)
 class Record(Generic[T]):
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for record."""
 
+import pickle
+
 from grain._src.python import record
 import numpy as np
 from absl.testing import absltest
@@ -36,6 +38,54 @@ class RecordTest(absltest.TestCase):
         "RecordMetadata(index=0, record_key=0, rng=None",
     )
 
+  def test_lazy_rng_matches_philox(self):
+    for rng_key in (0, 42, 2**40 + 3, 2**64 + 5):
+      record_metadata = record.RecordMetadata.with_lazy_rng(
+          index=1, record_key=2, rng_key=rng_key
+      )
+      expected_rng = np.random.Generator(np.random.Philox(key=rng_key))
+      np.testing.assert_array_equal(
+          record_metadata.rng.integers(0, 2**62, size=9),
+          expected_rng.integers(0, 2**62, size=9),
+      )
+      self.assertEqual(record_metadata.rng.random(), expected_rng.random())
+
+  def test_lazy_rng_outlives_metadata(self):
+    record_metadata = record.RecordMetadata.with_lazy_rng(
+        index=1, record_key=2, rng_key=3
+    )
+    bit_generator = record_metadata.rng.bit_generator
+    state = bit_generator.state
+    del record_metadata
+    # Creating other RNGs doesn't modify a bit generator still in use.
+    for rng_key in range(10):
+      _ = record.RecordMetadata.with_lazy_rng(
+          index=1, record_key=2, rng_key=rng_key
+      ).rng
+    self.assertEqual(str(bit_generator.state), str(state))
+
+  def test_lazy_rng_is_not_created_until_accessed(self):
+    record_metadata = record.RecordMetadata.with_lazy_rng(
+        index=1, record_key=2, rng_key=3
+    )
+    record_metadata = record_metadata.remove_record_key()
+    record_metadata = pickle.loads(pickle.dumps(record_metadata))
+    self.assertIsNone(record._RECORD_METADATA_RNG.__get__(record_metadata))
+    self.assertIsNone(record_metadata.record_key)
+    self.assertEqual(
+        record_metadata.rng.random(),
+        np.random.Generator(np.random.Philox(key=3)).random(),
+    )
+
+  def test_lazy_rng_is_shared_after_access(self):
+    record_metadata = record.RecordMetadata.with_lazy_rng(
+        index=1, record_key=2, rng_key=3
+    )
+    rng = record_metadata.rng
+    self.assertIs(record_metadata.rng, rng)
+    self.assertIs(record_metadata.remove_record_key().rng, rng)
+    self.assertEqual(str(rng), "Generator(Philox)")
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -19,6 +19,7 @@ from grain._src.core import monitoring as grain_monitoring
 from grain._src.core import sharding
 from grain._src.python import record
 from grain._src.python.dataset import dataset
+from grain._src.python.dataset.transformations import shuffle as shuffle_dataset
 import numpy as np
 
 from grain._src.core import monitoring
@@ -35,12 +36,52 @@ _api_usage_counter = monitoring.Counter(
 
 
 class Sampler(Protocol):
-  """Interface for PyGrain-compatible sampler."""
+  """Interface for PyGrain-compatible sampler.
+
+  Samplers can optionally implement `get_batch(start, stop, step)` returning
+  a `record.RecordMetadataBatch` for the indices in `range(start, stop, step)`
+  that are within bounds. `DataLoader` uses it to compute metadata of many
+  records at once when available.
+  """
 
   def __getitem__(self, index: int) -> record.RecordMetadata:
     """Returns the RecordMetadata for a global index."""
 
 
+def _batch_indices(
+    start: int, stop: int, step: int, max_index: Optional[int]
+) -> np.ndarray:
+  """Returns indices of `range(start, stop, step)` below `max_index`."""
+  if start < 0:
+    raise IndexError(
+        f"RecordMetadata object index is out of bounds; Got index {start}."
+    )
+  if step <= 0:
+    raise ValueError(f"step must be positive, got {step}.")
+  if max_index is not None:
+    stop = min(stop, max_index)
+  return np.arange(start, max(start, stop), step, dtype=np.int64)
+
+
+def _batch_seeds(
+    seed: Optional[int], indices: np.ndarray
+) -> Optional[np.ndarray]:
+  """Returns Philox keys of the per-record RNGs or None without a seed.
+
+  The keys are `seed + index`, same as in `__getitem__`. They are computed as
+  `uint64` if none of them wraps around and as Python integers otherwise.
+
+  Args:
+    seed: Seed of the sampler.
+    indices: Increasing non-negative global indices of the records.
+  """
+  if seed is None:
+    return None
+  if seed >= 0 and (not indices.size or seed + int(indices[-1]) < 2**64):
+    return indices.astype(np.uint64) + np.uint64(seed)
+  return np.array([seed + index for index in indices.tolist()], dtype=object)
+
+
 class SequentialSampler:
   """Basic sampler implementation that provides records in order."""
 
@@ -78,10 +119,22 @@ class SequentialSampler:
           f"RecordMetadata object index is out of bounds; Got index {index},"
           f" allowed indices should be in [0, {self._max_index}]"
       )
-    rng = None
     if self._seed is not None:
-      rng = np.random.Generator(np.random.Philox(key=self._seed + index))
-    return record.RecordMetadata(index=index, record_key=index, rng=rng)
+      return record.RecordMetadata.with_lazy_rng(
+          index, index, rng_key=self._seed + index
+      )
+    return record.RecordMetadata(index=index, record_key=index)
+
+  def get_batch(
+      self, start: int, stop: int, step: int = 1
+  ) -> record.RecordMetadataBatch:
+    """Returns metadata for in-bounds indices of `range(start, stop, step)`."""
+    indices = _batch_indices(start, stop, step, self._max_index)
+    return record.RecordMetadataBatch(
+        indices=indices,
+        record_keys=indices,
+        seeds=_batch_seeds(self._seed, indices),
+    )
 
 
 class _ShardMapDataset(dataset.MapDataset):
@@ -106,6 +159,11 @@ class _ShardMapDataset(dataset.MapDataset):
     index = epoch * len(self._parent) + index_in_epoch + self._start
     return self._parent[index]
 
+  def parent_indices(self, indices: np.ndarray) -> np.ndarray:
+    """Vectorized version of the index mapping done by `__getitem__`."""
+    epochs, indices_in_epoch = np.divmod(indices, len(self))
+    return epochs * len(self._parent) + indices_in_epoch + self._start
+
 
 class IndexSampler:
   """Base index sampler for training on a single datasource.
@@ -155,15 +213,21 @@ class IndexSampler:
     self._max_index = None if num_epochs is None else num_epochs * num_records
 
     self._record_keys = dataset.MapDataset.range(num_records)
+    self._shard_dataset = None
     if not isinstance(shard_options, sharding.NoSharding):
-      self._record_keys = _ShardMapDataset(self._record_keys, shard_options)
+      self._shard_dataset = _ShardMapDataset(self._record_keys, shard_options)
+      self._record_keys = self._shard_dataset
       if self._max_index is not None and shard_options.drop_remainder:
         self._max_index = min(  # Account for no remainder
             self._max_index,
             len(self._record_keys) * shard_options.shard_count * num_epochs,
         )
+    self._shuffle_dataset = None
     if shuffle:
-      self._record_keys = self._record_keys.shuffle(seed=seed)
+      self._shuffle_dataset = shuffle_dataset.ShuffleMapDataset(
+          self._record_keys, seed=seed
+      )
+      self._record_keys = self._shuffle_dataset
     _api_usage_counter.Increment("IndexSampler")
 
   def __repr__(self) -> str:
@@ -181,11 +245,39 @@ class IndexSampler:
           f"RecordMetadata object index is out of bounds; Got index {index},"
           f" allowed indices should be in [0, {self._max_index}]"
       )
-    record_key = self._record_keys[int(index / self._shard_options.shard_count)]
-    rng = None
+    record_key = self._record_keys[index // self._shard_options.shard_count]
     if self._seed is not None:
-      rng = np.random.Generator(np.random.Philox(key=self._seed + index))
-    next_record = record.RecordMetadata(
-        index=index, record_key=record_key, rng=rng
+      return record.RecordMetadata.with_lazy_rng(
+          index, record_key, rng_key=self._seed + index
+      )
+    return record.RecordMetadata(index=index, record_key=record_key)
+
+  def get_batch(
+      self, start: int, stop: int, step: int = 1
+  ) -> record.RecordMetadataBatch:
+    """Returns metadata for in-bounds indices of `range(start, stop, step)`.
+
+    Produces the same record keys and RNG seeds as `__getitem__` but computes
+    them with vectorized shuffle and shard arithmetic.
+
+    Args:
+      start: First global index.
+      stop: Upper bound of the global indices (exclusive).
+      step: Difference between consecutive global indices.
+
+    Returns:
+      Metadata of the records. It has fewer than `len(range(start, stop, step))`
+      elements if the sampler ends before `stop`.
+    """
+    indices = _batch_indices(start, stop, step, self._max_index)
+    # Mirrors `self._record_keys`: range -> (shard) -> (shuffle).
+    positions = indices // self._shard_options.shard_count
+    if self._shuffle_dataset is not None:
+      positions = self._shuffle_dataset.parent_indices(positions)
+    if self._shard_dataset is not None:
+      positions = self._shard_dataset.parent_indices(positions)
+    return record.RecordMetadataBatch(
+        indices=indices,
+        record_keys=positions % self._num_records,
+        seeds=_batch_seeds(self._seed, indices),
     )
-    return next_record
@@ -36,6 +36,31 @@ def _get_all_metadata(
   return metadata
 
 
+def _assert_batch_matches_getitem(
+    test_case: absltest.TestCase,
+    sampler: samplers.Sampler,
+    start: int,
+    stop: int,
+    step: int,
+):
+  """Checks that `get_batch` agrees with `__getitem__` on in-bounds indices."""
+  expected_metadata = []
+  for i in range(start, stop, step):
+    try:
+      expected_metadata.append(sampler[i])
+    except IndexError:
+      break
+  actual_metadata = sampler.get_batch(start, stop, step).to_metadata()
+  test_case.assertEqual(
+      _remove_rngs(actual_metadata), _remove_rngs(expected_metadata)
+  )
+  for actual, expected in zip(actual_metadata, expected_metadata):
+    if expected.rng is None:
+      test_case.assertIsNone(actual.rng)
+    else:
+      test_case.assertEqual(actual.rng.random(), expected.rng.random())
+
+
 def _remove_rngs(
     metadata: Sequence[record.RecordMetadata],
 ) -> Sequence[record.RecordMetadata]:
@@ -85,6 +110,19 @@ class SequentialSamplerTest(parameterized.TestCase):
     ]
     self.assertEqual(actual_metadata, expected_metadata)
 
+  # The last seed makes `seed + index` exceed the `uint64` range.
+  @parameterized.parameters(None, 3, 2**64 - 5)
+  def test_get_batch_matches_getitem(self, seed):
+    sampler = samplers.SequentialSampler(
+        num_records=20,
+        shard_options=sharding.ShardOptions(
+            shard_index=0, shard_count=3, drop_remainder=True
+        ),
+        seed=seed,
+    )
+    _assert_batch_matches_getitem(self, sampler, 0, 30, 1)
+    _assert_batch_matches_getitem(self, sampler, 2, 30, 4)
+
   def test_sampler_sharding(self):
     shard_options = sharding.ShardOptions(shard_index=0, shard_count=2)
     sampler = samplers.SequentialSampler(
@@ -127,7 +165,7 @@ class SequentialSamplerTest(parameterized.TestCase):
     self.assertEqual(actual_metadata, expected_metadata)
 
 
-class IndexSamplerTest(absltest.TestCase):
+class IndexSamplerTest(parameterized.TestCase):
 
   def assertRngsAreUnique(self, actual: Sequence[record.RecordMetadata]):
     actual_floats = [metadata.rng.random() for metadata in actual]
@@ -682,5 +720,40 @@ class IndexSamplerTest(absltest.TestCase):
     )
 
 
+  @parameterized.product(
+      shuffle=[False, True],
+      shard_options=[
+          sharding.NoSharding(),
+          sharding.ShardOptions(shard_index=1, shard_count=3),
+          sharding.ShardOptions(
+              shard_index=2, shard_count=3, drop_remainder=True
+          ),
+      ],
+      num_epochs=[None, 3],
+      seed=[None, 7],
+  )
+  def test_get_batch_matches_getitem(
+      self, shuffle, shard_options, num_epochs, seed
+  ):
+    if shuffle and seed is None:
+      self.skipTest('Shuffling requires a seed.')
+    sampler = samplers.IndexSampler(
+        num_records=23,
+        shard_options=shard_options,
+        shuffle=shuffle,
+        num_epochs=num_epochs,
+        seed=seed,
+    )
+    _assert_batch_matches_getitem(self, sampler, 0, 100, 1)
+    _assert_batch_matches_getitem(self, sampler, 4, 150, 6)
+
+  def test_get_batch_out_of_bounds(self):
+    sampler = samplers.IndexSampler(
+        num_records=5, shard_options=sharding.NoSharding(), num_epochs=1
+    )
+    self.assertEmpty(sampler.get_batch(5, 10))
+    with self.assertRaises(IndexError):
+      sampler.get_batch(-1, 10)
+
 if __name__ == '__main__':
   absltest.main()
@@ -11,7 +11,16 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Shared memory array."""
+"""Shared memory array.
+
+By default every `SharedMemoryArray` is backed by its own POSIX shared memory
+segment. Processes can alternatively enable a `SharedMemoryArena`, in which case
+arrays are sub-allocated from a few large pre-mapped segments ("slabs"). The
+process that receives an arena array marks its region as free when the array is
+deleted by resetting a flag stored in the slab in front of the region. The
+allocating process reclaims the freed regions lazily. This avoids `shm_open`,
+`ftruncate`, `mmap` and `unlink` calls for every array.
+"""
 from __future__ import annotations
 
 import dataclasses
@@ -20,25 +29,180 @@ import mmap
 from multiprocessing import pool
 from multiprocessing import shared_memory
 import threading
-from typing import Any, Iterable
+from typing import Any, Iterable, Sequence
 
+from absl import logging
+from grain._src.core import monitoring as grain_monitoring
 import numpy as np
 import numpy.typing as npt
 
+from grain._src.core import monitoring
+
+_arena_fallback_counter = monitoring.Counter(
+    "/grain/python/shared_memory_array/arena_fallback",
+    metadata=monitoring.Metadata(
+        description=(
+            "Number of arrays allocated in their own shared memory segment"
+            " because the shared memory arena was full."
+        )
+    ),
+    root=grain_monitoring.get_monitoring_root(),
+)
+
+# Alignment of arena regions in bytes. Each region is preceded by a header of
+# this size whose first byte indicates whether the region is in use.
+_ARENA_ALIGNMENT = 64
+_REGION_FREE = 0
+_REGION_IN_USE = 1
+
+# Slabs attached by this process, by name. Slabs stay mapped for the lifetime of
+# the arrays referring to them, which hold a reference to the `SharedMemory`.
+_attached_slabs: dict[str, shared_memory.SharedMemory] = {}
+_attached_slabs_lock = threading.Lock()
+
+
+def _attach_slab(name: str) -> shared_memory.SharedMemory:
+  """Returns the mapped slab with the given name, mapping it if needed."""
+  slab = _attached_slabs.get(name)
+  if slab is None:
+    with _attached_slabs_lock:
+      slab = _attached_slabs.get(name)
+      if slab is None:
+        slab = shared_memory.SharedMemory(name)
+        _attached_slabs[name] = slab
+  return slab
+
+
+def _release_region(slab: shared_memory.SharedMemory, offset: int) -> None:
+  """Marks the arena region starting at `offset` as free."""
+  slab.buf[offset - _ARENA_ALIGNMENT] = _REGION_FREE
+
 
 @dataclasses.dataclass(slots=True, frozen=True)
 class SharedMemoryArrayMetadata:
+  """Describes a `SharedMemoryArray` for sending it to another process.
+
+  Attributes:
+    name: Name of the shared memory segment. For arena arrays it is the name of
+      the slab.
+    shape: Shape of the array.
+    dtype: Dtype of the array.
+    offset: Offset of the array within the slab for arena arrays or None if the
+      array owns the whole segment.
+  """
+
   name: str
   shape: Iterable[int]
   dtype: npt.DTypeLike
+  offset: int | None = None
 
   def close_and_unlink_shm(self) -> None:
-    """Closes and unlinks the shared memory referred to by this instance."""
+    """Closes and unlinks the shared memory referred to by this instance.
+
+    Arena regions are returned to the arena instead.
+    """
+    if self.offset is not None:
+      _release_region(_attach_slab(self.name), self.offset)
+      return
     shm = shared_memory.SharedMemory(self.name)
     shm.close()
     shm.unlink()
 
 
+class _Slab:
+  """First-fit allocator over a single slab of shared memory."""
+
+  def __init__(self, shm: shared_memory.SharedMemory):
+    self.shm = shm
+    self._size = shm.size
+    # (offset, size) of the allocated regions sorted by offset, including
+    # headers.
+    self._regions: list[tuple[int, int]] = []
+
+  def _reclaim(self) -> None:
+    # Regions can be freed in any order, e.g. while the consumer holds on to
+    # some of the arrays, so all of them are checked.
+    buf = self.shm.buf
+    self._regions = [
+        region for region in self._regions if buf[region[0]] != _REGION_FREE
+    ]
+
+  def allocate(self, size: int) -> int | None:
+    """Returns the offset of the region header or None if there's no space."""
+    self._reclaim()
+    start = 0
+    for index, (offset, region_size) in enumerate(self._regions):
+      if offset - start >= size:
+        break
+      start = offset + region_size
+    else:
+      index = len(self._regions)
+      if self._size - start < size:
+        return None
+    self.shm.buf[start] = _REGION_IN_USE
+    self._regions.insert(index, (start, size))
+    return start
+
+
+class SharedMemoryArena:
+  """Sub-allocates `SharedMemoryArray`s from pre-mapped slabs.
+
+  The slabs are created and unlinked by the process owning the arena (usually
+  the consumer, see `GrainPool`). The allocating process attaches to them by
+  name with `SharedMemoryArena.attach()` and `SharedMemoryArray.enable_arena()`.
+  Arrays that don't fit into any slab get their own segment.
+  """
+
+  def __init__(self, slabs: Sequence[shared_memory.SharedMemory]):
+    self._slabs = [_Slab(slab) for slab in slabs]
+    self._lock = threading.Lock()
+
+  @classmethod
+  def create(cls, size: int, num_slabs: int) -> SharedMemoryArena:
+    """Creates an arena with `num_slabs` new slabs of `size` bytes in total."""
+    slab_size = max(
+        _ARENA_ALIGNMENT, -(-size // num_slabs // mmap.PAGESIZE) * mmap.PAGESIZE
+    )
+    slabs = []
+    for _ in range(num_slabs):
+      slab = shared_memory.SharedMemory(create=True, size=slab_size)
+      with _attached_slabs_lock:
+        _attached_slabs[slab.name] = slab
+      slabs.append(slab)
+    return cls(slabs)
+
+  @classmethod
+  def attach(cls, slab_names: Sequence[str]) -> SharedMemoryArena:
+    """Attaches to the slabs of an arena created by another process."""
+    return cls([_attach_slab(name) for name in slab_names])
+
+  @property
+  def slab_names(self) -> list[str]:
+    return [slab.shm.name for slab in self._slabs]
+
+  def allocate(
+      self, nbytes: int
+  ) -> tuple[shared_memory.SharedMemory, int] | None:
+    """Returns a slab and an offset of a free region of at least `nbytes`."""
+    size = _ARENA_ALIGNMENT + -(-nbytes // _ARENA_ALIGNMENT) * _ARENA_ALIGNMENT
+    with self._lock:
+      for slab in self._slabs:
+        offset = slab.allocate(size)
+        if offset is not None:
+          return slab.shm, offset + _ARENA_ALIGNMENT
+    return None
+
+  def unlink(self) -> None:
+    """Unlinks the slabs. Existing mappings stay valid until released."""
+    for slab in self._slabs:
+      with _attached_slabs_lock:
+        _attached_slabs.pop(slab.shm.name, None)
+      try:
+        slab.shm.unlink()
+      except FileNotFoundError:
+        pass
+
+
 def close_with_semaphore(
     shm: shared_memory.SharedMemory, semaphore: threading.Semaphore
 ) -> None:
@@ -60,6 +224,8 @@ class SharedMemoryArray(np.ndarray):
 
   _unlink_thread_pool: pool.ThreadPool | None = None
   _unlink_semaphore: threading.Semaphore | None = None
+  # Arena to allocate new arrays from in this process, if enabled.
+  _arena: SharedMemoryArena | None = None
 
   def __new__(
       cls,
@@ -68,6 +234,21 @@ class SharedMemoryArray(np.ndarray):
   ):
     # See https://numpy.org/doc/stable/user/basics.subclassing.html
     size = math.prod(shape) * np.dtype(dtype).itemsize
+    arena = SharedMemoryArray._arena
+    if arena is not None:
+      allocation = arena.allocate(size)
+      if allocation is not None:
+        slab, offset = allocation
+        return cls.from_shared_memory(slab, shape, dtype, offset=offset)
+      _arena_fallback_counter.Increment()
+      logging.log_first_n(
+          logging.WARNING,
+          "Shared memory arena is full, allocating a %d bytes array in its own"
+          " segment. Consider increasing"
+          " `MultiprocessingOptions.shared_memory_arena_size`.",
+          1,
+          size,
+      )
     shm = shared_memory.SharedMemory(create=True, size=size)
     return cls.from_shared_memory(shm, shape, dtype)
 
@@ -75,8 +256,10 @@ class SharedMemoryArray(np.ndarray):
     # This follows the `numpy.memmap` implementation
     if hasattr(obj, "shm") and np.may_share_memory(self, obj):
       self.shm = obj.shm
+      self._offset = getattr(obj, "_offset", None)
     else:
       self.shm = None
+      self._offset = None
     self._unlink_on_del = getattr(obj, "_unlink_on_del", False)
 
   def __array_wrap__(self, obj, context=None):  # pylint: disable=unused-argument
@@ -91,6 +274,13 @@ class SharedMemoryArray(np.ndarray):
   def from_metadata(
       cls, metadata: SharedMemoryArrayMetadata
   ) -> SharedMemoryArray:
+    if metadata.offset is not None:
+      return cls.from_shared_memory(
+          _attach_slab(metadata.name),
+          metadata.shape,
+          metadata.dtype,
+          offset=metadata.offset,
+      )
     shm = shared_memory.SharedMemory(metadata.name)
     return cls.from_shared_memory(shm, metadata.shape, metadata.dtype)
 
@@ -99,7 +289,7 @@ class SharedMemoryArray(np.ndarray):
     shm = self.shm
     assert isinstance(shm, shared_memory.SharedMemory)
     return SharedMemoryArrayMetadata(
-        name=shm.name, shape=self.shape, dtype=self.dtype
+        name=shm.name, shape=self.shape, dtype=self.dtype, offset=self._offset
     )
 
   @classmethod
@@ -108,17 +298,41 @@ class SharedMemoryArray(np.ndarray):
       shm: shared_memory.SharedMemory,
       shape: Any,
       dtype: npt.DTypeLike,
+      *,
+      offset: int | None = None,
   ) -> SharedMemoryArray:
-    obj = super().__new__(cls, shape, dtype, buffer=shm.buf)
+    """Creates an array backed by `shm`.
+
+    Args:
+      shm: Shared memory segment or arena slab backing the array.
+      shape: Shape of the array.
+      dtype: Dtype of the array.
+      offset: Offset of the array in an arena slab or None if the array owns
+        the whole segment.
+
+    Returns:
+      The array.
+    """
+    obj = super().__new__(
+        cls, shape, dtype, buffer=shm.buf, offset=offset or 0
+    )
     obj.shm = shm
+    obj._offset = offset
     obj._unlink_on_del = False
     return obj
 
   def __reduce_ex__(self, protocol):
     # For out-of-band pickling we don't need a PickleBuffer because the
     # `SharedMemory` class automatically pickles itself using only its name
+    if self._offset is not None:
+      return SharedMemoryArray.from_metadata, (self.metadata,)
     return self.from_shared_memory, (self.shm, self.shape, self.dtype)
 
+  @classmethod
+  def enable_arena(cls, arena: SharedMemoryArena | None) -> None:
+    """Allocates new arrays in this process from `arena` (None disables)."""
+    SharedMemoryArray._arena = arena
+
   @classmethod
   def enable_async_del(cls, num_threads: int = 1) -> None:
     if not SharedMemoryArray._unlink_thread_pool:
@@ -129,10 +343,30 @@ class SharedMemoryArray(np.ndarray):
     """Mark this object responsible for unlinking the shared memory."""
     self._unlink_on_del = True
 
+  def export_metadata(self) -> SharedMemoryArrayMetadata | None:
+    """Returns metadata for passing the shared memory to another process.
+
+    The receiver of the metadata becomes responsible for unlinking the shared
+    memory, this object will no longer unlink it on deletion.
+
+    Returns:
+      The metadata or None if this object is a view or doesn't own shared
+      memory. Such arrays need to be copied to be shared.
+    """
+    if self.shm is None or not isinstance(self.base, mmap.mmap):
+      return None
+    self._unlink_on_del = False
+    return self.metadata
+
   def __del__(self) -> None:
     # Ensure that this array is not a view before closing shared memory
     if not isinstance(self.base, mmap.mmap):
       return
+    if self._offset is not None:
+      # The slab is shared with other arrays, only the region is released.
+      if self._unlink_on_del:
+        _release_region(self.shm, self._offset)
+      return
     thread_pool = SharedMemoryArray._unlink_thread_pool
     semaphore = SharedMemoryArray._unlink_semaphore
     shm = self.shm
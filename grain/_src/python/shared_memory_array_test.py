@@ -18,6 +18,7 @@ from absl.testing import parameterized
 import multiprocessing
 from grain._src.python import record
 from grain._src.python.operations import BatchOperation
+from grain._src.python.shared_memory_array import SharedMemoryArena
 from grain._src.python.shared_memory_array import SharedMemoryArray
 from grain._src.python.shared_memory_array import SharedMemoryArrayMetadata
 import jax
@@ -75,5 +76,51 @@ class SharedMemoryArrayTest(parameterized.TestCase):
       _ = shared_memory.SharedMemory(name=shm_metadata.name, create=False)
 
 
+class SharedMemoryArenaTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.arena = SharedMemoryArena.create(size=4096, num_slabs=1)
+    SharedMemoryArray.enable_arena(self.arena)
+
+  def tearDown(self):
+    SharedMemoryArray.enable_arena(None)
+    self.arena.unlink()
+    super().tearDown()
+
+  def test_allocates_from_arena(self):
+    arr = SharedMemoryArray((2, 3), np.int32)
+    arr[:] = np.arange(6).reshape(2, 3)
+    metadata = arr.metadata
+    self.assertEqual(metadata.name, self.arena.slab_names[0])
+    self.assertIsNotNone(metadata.offset)
+    opened = SharedMemoryArray.from_metadata(metadata)
+    np.testing.assert_array_equal(opened, np.arange(6).reshape(2, 3))
+
+  def test_reuses_released_regions(self):
+    metadata = SharedMemoryArray((16,), np.int64).metadata
+    opened = SharedMemoryArray.from_metadata(metadata)
+    opened.unlink_on_del()
+    del opened
+    self.assertEqual(SharedMemoryArray((16,), np.int64).metadata, metadata)
+
+  def test_reuses_regions_released_out_of_order(self):
+    arrays = [SharedMemoryArray((64,), np.int64) for _ in range(4)]
+    metadata = [arr.metadata for arr in arrays]
+    # The first array is held, the ones after it are released.
+    for m in metadata[1:]:
+      opened = SharedMemoryArray.from_metadata(m)
+      opened.unlink_on_del()
+      del opened
+    reused = [SharedMemoryArray((64,), np.int64).metadata for _ in range(3)]
+    self.assertEqual(reused, metadata[1:])
+
+  def test_falls_back_to_own_segment_when_full(self):
+    metadata = SharedMemoryArray((8192,), np.int8).metadata
+    self.assertIsNone(metadata.offset)
+    self.assertNotIn(metadata.name, self.arena.slab_names)
+    metadata.close_and_unlink_shm()
+
+
 if __name__ == "__main__":
   absltest.main()
@@ -0,0 +1,212 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Single-producer single-consumer channel backed by shared memory.
+
+`SharedMemoryChannel` is a drop-in replacement for the `multiprocessing.Queue`
+that a Grain worker process uses to send elements to the main process. Elements
+are pickled directly into a ring of fixed-size slots in shared memory. Unlike
+`multiprocessing.Queue` there is no feeder thread and no pipe: the producer
+copies an element into the next free slot and the consumer unpickles it from
+there. A pair of semaphores tracks free and filled slots, waking up a blocked
+producer or consumer without polling.
+
+Elements that don't fit into a slot are written to a separate shared memory
+segment whose name is passed through the slot instead.
+"""
+
+from __future__ import annotations
+
+from multiprocessing import context
+from multiprocessing import shared_memory
+import pickle
+import queue
+import struct
+from typing import Any
+
+# Header of the channel holding the positions of the consumer and the producer.
+# Each position is only written by one side.
+_HEADER_SIZE = 64
+_POSITION = struct.Struct("<q")
+_CONSUMER_POSITION_OFFSET = 0
+_PRODUCER_POSITION_OFFSET = 8
+# Header of each slot holding the size of the pickled element. Negative sizes
+# indicate that the slot holds the name of a separate segment with the element.
+_SLOT_HEADER = struct.Struct("<q")
+
+
+class SharedMemoryChannel:
+  """Passes elements between a single producer and a single consumer process.
+
+  Implements the subset of `multiprocessing.Queue` interface used by
+  `GrainPool`. The channel must be created by the parent process and passed to
+  the producer as a `multiprocessing.Process` argument.
+  """
+
+  def __init__(self, ctx: context.BaseContext, maxsize: int, size: int):
+    """Creates the channel.
+
+    Args:
+      ctx: Context to create semaphores in.
+      maxsize: Maximum number of elements in the channel.
+      size: Total size of the slots in bytes.
+    """
+    if maxsize <= 0:
+      raise ValueError(f"maxsize must be positive, got {maxsize}.")
+    slot_size = size // maxsize
+    if slot_size <= _SLOT_HEADER.size:
+      raise ValueError(
+          f"Shared memory channel size {size} is too small for {maxsize} "
+          "elements."
+      )
+    self._maxsize = maxsize
+    self._slot_size = slot_size
+    self._shm = shared_memory.SharedMemory(
+        create=True, size=_HEADER_SIZE + maxsize * slot_size
+    )
+    self._filled_slots = ctx.Semaphore(0)
+    self._free_slots = ctx.Semaphore(maxsize)
+    self._attach()
+
+  def _attach(self) -> None:
+    self._buf = self._shm.buf
+    self._slots = [
+        self._buf[start : start + self._slot_size]
+        for start in range(
+            _HEADER_SIZE,
+            _HEADER_SIZE + self._maxsize * self._slot_size,
+            self._slot_size,
+        )
+    ]
+
+  def __getstate__(self):
+    return {
+        "maxsize": self._maxsize,
+        "slot_size": self._slot_size,
+        "name": self._shm.name,
+        "filled_slots": self._filled_slots,
+        "free_slots": self._free_slots,
+    }
+
+  def __setstate__(self, state):
+    self._maxsize = state["maxsize"]
+    self._slot_size = state["slot_size"]
+    self._shm = shared_memory.SharedMemory(state["name"])
+    self._filled_slots = state["filled_slots"]
+    self._free_slots = state["free_slots"]
+    self._attach()
+
+  def __del__(self):
+    # Release the views so that the shared memory can be closed.
+    for slot in getattr(self, "_slots", ()):
+      slot.release()
+    if hasattr(self, "_buf"):
+      self._buf.release()
+
+  def _position(self, offset: int) -> int:
+    return _POSITION.unpack_from(self._buf, offset)[0]
+
+  def _set_position(self, offset: int, position: int) -> None:
+    _POSITION.pack_into(self._buf, offset, position)
+
+  def put(self, obj: Any, timeout: float | None = None) -> None:
+    """Puts `obj` into the channel, raises `queue.Full` on timeout."""
+    # Pickle before taking a slot so that a failure doesn't leak the slot.
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if not self._free_slots.acquire(timeout=timeout):
+      raise queue.Full
+    try:
+      position = self._position(_PRODUCER_POSITION_OFFSET)
+      slot = self._slots[position % self._maxsize]
+      size = len(data)
+      if _SLOT_HEADER.size + size <= self._slot_size:
+        slot[_SLOT_HEADER.size : _SLOT_HEADER.size + size] = data
+      else:
+        overflow = shared_memory.SharedMemory(create=True, size=size)
+        overflow.buf[:size] = data
+        name = overflow.name.encode()
+        overflow.close()
+        size = -len(name)
+        slot[_SLOT_HEADER.size : _SLOT_HEADER.size + len(name)] = name
+      _SLOT_HEADER.pack_into(slot, 0, size)
+    except BaseException:
+      self._free_slots.release()
+      raise
+    self._set_position(_PRODUCER_POSITION_OFFSET, position + 1)
+    self._filled_slots.release()
+
+  def _overflow_name(self, slot: memoryview) -> str | None:
+    """Returns the name of the segment holding the element in `slot`, if any."""
+    (size,) = _SLOT_HEADER.unpack_from(slot)
+    if size >= 0:
+      return None
+    return bytes(slot[_SLOT_HEADER.size : _SLOT_HEADER.size - size]).decode()
+
+  def get(self, block: bool = True, timeout: float | None = None) -> Any:
+    """Gets the next element, raises `queue.Empty` on timeout."""
+    if not self._filled_slots.acquire(block, timeout):
+      raise queue.Empty
+    position = self._position(_CONSUMER_POSITION_OFFSET)
+    slot = self._slots[position % self._maxsize]
+    try:
+      name = self._overflow_name(slot)
+      if name is None:
+        (size,) = _SLOT_HEADER.unpack_from(slot)
+        return pickle.loads(slot[_SLOT_HEADER.size : _SLOT_HEADER.size + size])
+      overflow = shared_memory.SharedMemory(name)
+      try:
+        return pickle.loads(overflow.buf)
+      finally:
+        overflow.close()
+        overflow.unlink()
+    finally:
+      self._set_position(_CONSUMER_POSITION_OFFSET, position + 1)
+      self._free_slots.release()
+
+  def get_nowait(self) -> Any:
+    return self.get(block=False)
+
+  def empty(self) -> bool:
+    return self._position(_CONSUMER_POSITION_OFFSET) >= self._position(
+        _PRODUCER_POSITION_OFFSET
+    )
+
+  def cancel_join_thread(self) -> None:
+    """No-op, the channel has no feeder thread."""
+
+  def close(self) -> None:
+    """No-op, the shared memory is released in `unlink()`."""
+
+  def unlink(self) -> None:
+    """Unlinks the shared memory. Must be called by the creating process.
+
+    Also unlinks the separate segments of the elements that were put into the
+    channel but not consumed. The producer must have stopped.
+    """
+    for position in range(
+        self._position(_CONSUMER_POSITION_OFFSET),
+        self._position(_PRODUCER_POSITION_OFFSET),
+    ):
+      name = self._overflow_name(self._slots[position % self._maxsize])
+      if name is None:
+        continue
+      try:
+        overflow = shared_memory.SharedMemory(name)
+      except FileNotFoundError:
+        continue
+      overflow.close()
+      overflow.unlink()
+    try:
+      self._shm.unlink()
+    except FileNotFoundError:
+      pass
@@ -0,0 +1,86 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares throughput of `SharedMemoryChannel` and `multiprocessing.Queue`.
+
+A child process sends small elements to the main process through each of the
+channels, mirroring how `GrainPool` workers send elements.
+
+Usage:
+  python -m grain._src.python.shared_memory_channel_benchmark \
+      --num_elements=100000 --element_size=64
+"""
+
+import time
+from typing import Any
+
+from absl import app
+from absl import flags
+import multiprocessing as mp
+from grain._src.python import shared_memory_channel
+
+_NUM_ELEMENTS = flags.DEFINE_integer(
+    "num_elements", 100_000, "Number of elements to send."
+)
+_ELEMENT_SIZE = flags.DEFINE_integer(
+    "element_size", 64, "Size of the bytes payload of each element."
+)
+_BUFFER_SIZE = flags.DEFINE_integer(
+    "buffer_size", 16, "Maximum number of elements in flight."
+)
+_CHANNEL_SIZE = flags.DEFINE_integer(
+    "channel_size", 1 << 20, "Size of the shared memory channel in bytes."
+)
+
+
+def _produce(channel: Any, num_elements: int, element_size: int) -> None:
+  payload = b"x" * element_size
+  for i in range(num_elements):
+    channel.put({"index": i, "data": payload})
+
+
+def _run(name: str, channel: Any, ctx: Any) -> None:
+  """Measures the time to receive all elements from a child process."""
+  num_elements = _NUM_ELEMENTS.value
+  process = ctx.Process(
+      target=_produce, args=(channel, num_elements, _ELEMENT_SIZE.value)
+  )
+  process.start()
+  # Don't count the process startup.
+  channel.get()
+  start = time.perf_counter()
+  for _ in range(num_elements - 1):
+    channel.get()
+  elapsed = time.perf_counter() - start
+  process.join()
+  print(
+      f"{name:>24}: {(num_elements - 1) / elapsed:12.0f} elements/s,"
+      f" {elapsed / (num_elements - 1) * 1e6:8.2f} us/element"
+  )
+
+
+def main(argv):
+  del argv
+  ctx = mp.get_context("spawn")
+  _run("multiprocessing.Queue", ctx.Queue(_BUFFER_SIZE.value), ctx)
+  channel = shared_memory_channel.SharedMemoryChannel(
+      ctx, _BUFFER_SIZE.value, _CHANNEL_SIZE.value
+  )
+  try:
+    _run("SharedMemoryChannel", channel, ctx)
+  finally:
+    channel.unlink()
+
+
+if __name__ == "__main__":
+  app.run(main)
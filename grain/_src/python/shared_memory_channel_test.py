@@ -0,0 +1,116 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for shared memory channel."""
+
+import queue
+
+from absl.testing import absltest
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from grain._src.python import shared_memory_channel
+
+
+def _produce(channel: shared_memory_channel.SharedMemoryChannel, count: int):
+  for i in range(count):
+    channel.put({"index": i, "data": b"x" * i})
+
+
+class SharedMemoryChannelTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.ctx = mp.get_context("spawn")
+
+  def _make_channel(self, maxsize: int, size: int):
+    channel = shared_memory_channel.SharedMemoryChannel(self.ctx, maxsize, size)
+    self.addCleanup(channel.unlink)
+    return channel
+
+  def test_put_and_get(self):
+    channel = self._make_channel(maxsize=2, size=1024)
+    self.assertTrue(channel.empty())
+    channel.put(1)
+    channel.put({"a": [2, 3]})
+    self.assertFalse(channel.empty())
+    self.assertEqual(channel.get(), 1)
+    self.assertEqual(channel.get_nowait(), {"a": [2, 3]})
+    self.assertTrue(channel.empty())
+
+  def test_put_raises_when_full(self):
+    channel = self._make_channel(maxsize=1, size=1024)
+    channel.put(1)
+    with self.assertRaises(queue.Full):
+      channel.put(2, timeout=0.01)
+
+  def test_get_raises_when_empty(self):
+    channel = self._make_channel(maxsize=1, size=1024)
+    with self.assertRaises(queue.Empty):
+      channel.get(timeout=0.01)
+    with self.assertRaises(queue.Empty):
+      channel.get_nowait()
+
+  def test_element_larger_than_slot(self):
+    channel = self._make_channel(maxsize=2, size=128)
+    element = b"x" * 10_000
+    channel.put(element)
+    channel.put(1)
+    self.assertEqual(channel.get(), element)
+    self.assertEqual(channel.get(), 1)
+
+  def test_put_releases_slot_when_pickling_fails(self):
+    channel = self._make_channel(maxsize=1, size=1024)
+    for _ in range(2):
+      with self.assertRaises(Exception):
+        channel.put(lambda: None, timeout=0.01)
+    channel.put(1, timeout=0.01)
+    self.assertEqual(channel.get(), 1)
+
+  def test_unlink_removes_unconsumed_overflow_segments(self):
+    channel = shared_memory_channel.SharedMemoryChannel(
+        self.ctx, maxsize=2, size=128
+    )
+    channel.put(b"x" * 10_000)
+    name = channel._overflow_name(channel._slots[0])
+    self.assertIsNotNone(name)
+    channel.unlink()
+    with self.assertRaises(FileNotFoundError):
+      shared_memory.SharedMemory(name)
+
+  def test_wraps_around(self):
+    channel = self._make_channel(maxsize=3, size=1024)
+    for i in range(10):
+      channel.put(i)
+      channel.put(-i)
+      self.assertEqual(channel.get(), i)
+      self.assertEqual(channel.get(), -i)
+
+  def test_fails_with_too_small_size(self):
+    with self.assertRaisesRegex(ValueError, "too small"):
+      shared_memory_channel.SharedMemoryChannel(self.ctx, 4, 16)
+
+  def test_passes_elements_between_processes(self):
+    channel = self._make_channel(maxsize=4, size=512)
+    count = 100
+    process = self.ctx.Process(target=_produce, args=(channel, count))
+    process.start()
+    actual = [channel.get(timeout=10) for _ in range(count)]
+    process.join()
+    self.assertEqual(
+        actual, [{"index": i, "data": b"x" * i} for i in range(count)]
+    )
+    self.assertEqual(process.exitcode, 0)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -0,0 +1,133 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures encoding iterator states of deep pipelines as JSON.
+
+The pipeline interleaves `--num_shards` `MapDataset.to_iter_dataset()`
+pipelines, each with `--depth` maps with a filter every third map, packs the
+interleaved examples with `FirstFitPackIterDataset` and prefetches them with
+`--num_workers` multiprocessing workers. The workers record their state with
+every element and the iterator produces `--num_steps` elements first, so that
+the state includes the states of the nested iterators.
+
+The state is encoded as indented JSON, which older checkpoints use, and as
+compact JSON, which `PyGrainCheckpointHandler` writes.
+
+Usage:
+  python -m grain._src.python.state_serialization_benchmark \
+      --depth=30 --num_workers=16
+"""
+
+import json
+import time
+from typing import Any, Callable
+
+from absl import app
+from absl import flags
+from grain._src.python import options
+from grain._src.python.dataset import dataset
+from grain._src.python.dataset.transformations import interleave
+from grain._src.python.dataset.transformations import packing
+import numpy as np
+
+_DEPTH = flags.DEFINE_integer(
+    "depth", 30, "Number of transformations in each interleaved pipeline."
+)
+_NUM_SHARDS = flags.DEFINE_integer(
+    "num_shards", 8, "Number of interleaved pipelines."
+)
+_NUM_WORKERS = flags.DEFINE_integer(
+    "num_workers", 16, "Number of multiprocessing workers."
+)
+_NUM_STEPS = flags.DEFINE_integer(
+    "num_steps", 100, "Number of elements produced before the measurement."
+)
+_NUM_ITERATIONS = flags.DEFINE_integer(
+    "num_iterations", 100, "Number of measured calls."
+)
+
+_SEQUENCE_LENGTH = 64
+
+
+def _add_one(x: int) -> int:
+  return x + 1
+
+
+def _is_not_multiple_of_four(x: int) -> bool:
+  return x % 4 != 0
+
+
+def _make_example(x: int) -> dict[str, np.ndarray]:
+  return {"tokens": np.full(x % 16 + 1, x, dtype=np.int32)}
+
+
+def _make_shard(shard_index: int) -> dataset.IterDataset[int]:
+  ds = dataset.MapDataset.range(
+      shard_index, 1_000_000, _NUM_SHARDS.value
+  ).to_iter_dataset()
+  for i in range(_DEPTH.value):
+    ds = ds.filter(_is_not_multiple_of_four) if i % 3 == 2 else ds.map(_add_one)
+  return ds
+
+
+def _measure(fn: Callable[[], Any]) -> float:
+  """Returns the average time of `fn` in milliseconds."""
+  fn()
+  start = time.perf_counter()
+  for _ in range(_NUM_ITERATIONS.value):
+    fn()
+  return (time.perf_counter() - start) / _NUM_ITERATIONS.value * 1e3
+
+
+def main(argv):
+  del argv
+  shards = [_make_shard(i) for i in range(_NUM_SHARDS.value)]
+  ds = interleave.InterleaveIterDataset(shards, cycle_length=_NUM_SHARDS.value)
+  ds = packing.FirstFitPackIterDataset(
+      ds.map(_make_example),
+      length_struct={"tokens": _SEQUENCE_LENGTH},
+      num_packing_bins=4,
+  )
+  ds = ds.mp_prefetch(
+      options.MultiprocessingOptions(
+          _NUM_WORKERS.value, record_state_interval_s=0
+      )
+  )
+  ds_iter = ds.__iter__()
+  for _ in range(_NUM_STEPS.value):
+    next(ds_iter)
+  state = ds_iter.get_state()
+  print(
+      f"depth={_DEPTH.value}, num_shards={_NUM_SHARDS.value},"
+      f" num_workers={_NUM_WORKERS.value}, get_state:"
+      f" {_measure(ds_iter.get_state):.3f} ms"
+  )
+
+  encodings = {
+      "JSON (indent=4)": lambda s: json.dumps(s, indent=4),
+      "JSON (compact)": json.dumps,
+  }
+  for name, encode in encodings.items():
+    encoded = encode(state)
+    encode_time = _measure(lambda: encode(state))  # pylint: disable=cell-var-from-loop
+    decode_time = _measure(lambda: json.loads(encoded))  # pylint: disable=cell-var-from-loop
+    print(
+        f"{name:>16}: {len(encoded):9d} bytes, encode {encode_time:8.3f} ms,"
+        f" decode {decode_time:8.3f} ms"
+    )
+  ds_iter.set_state(json.loads(json.dumps(state)))
+  next(ds_iter)
+
+
+if __name__ == "__main__":
+  app.run(main)
@@ -60,7 +60,7 @@ from ._src.python.operations import (
     RandomMapOperation,
 )
 from ._src.python.options import ReadOptions, MultiprocessingOptions
-from ._src.python.record import (Record, RecordMetadata)
+from ._src.python.record import (Record, RecordMetadata, RecordMetadataBatch)
 from ._src.python.samplers import (
     IndexSampler,
     Sampler,
@@ -33,9 +33,13 @@ del epy
 from ._src.python.dataset.dataset import (
     apply_transformations,
     DatasetOptions,
+    get_execution_summary,
     WithOptionsIterDataset,
 )
-from ._src.python.dataset.stats import ExecutionTrackingMode
+from ._src.python.dataset.stats import (
+    ExecutionSummary,
+    ExecutionTrackingMode,
+)
 from ._src.python.dataset.transformations.flatmap import (
     FlatMapMapDataset,
     FlatMapIterDataset,
@@ -57,4 +61,7 @@ from ._src.core.transforms import (
     MapWithIndexTransform,
 )
 from ._src.python.experimental.example_packing.packing import PackAndBatchOperation
-from ._src.python.experimental.index_shuffle.python.index_shuffle_module import index_shuffle
+from ._src.python.experimental.index_shuffle.python.index_shuffle_module import (
+    index_shuffle,
+    IndexShuffler,
+)